@@ -1,134 +1,187 @@
-from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour, OneShotBehaviour
-from spade.message import Message
 import asyncio
+import time
+import protocol
+from Agents.SimulationAgent import SimulationAgent
 from building import Building
+from dispatch import Dispatcher
+from transport import OCCUPANTS_GROUP
 
+BROADCAST_BATCH = 64  # Occupant messages sent concurrently per batch
+# Emergencies handled on site: a report without a room only announces them, the
+# incident is opened by the report that locates it
+ON_SITE = ("Fire", "Earthquake", "Security Threat")
 
-class BMSAgent(Agent):
-    def __init__(self, jid, password, num_occupants, role, building: Building):
+
+class BMSAgent(SimulationAgent):
+    def __init__(self, jid, password, num_occupants, role, building: Building, occupant_jids=None, responders=None):
         super().__init__(jid, password)
         self.building = building
         self.num_occupants = num_occupants  # Number of occupants to be notified
+        # Occupants to notify; defaults to the historical occupant1..N@localhost naming
+        self.occupant_jids = occupant_jids or [f"occupant{i}@localhost" for i in range(1, num_occupants + 1)]
         self.emergency_type = None
         self.location = None
+        # Responders available to the BMS and the incidents they are handling
+        self.dispatcher = Dispatcher(building, responders or []) if building is not None else None
 
     class ReceiveEmergencyMessages(CyclicBehaviour):
         async def run(self):
-            """Receives messages from EmergencyAgent and processes them."""
-            message = await self.receive(timeout=1)  # Wait for messages
-            if message and "Emergency:" in message.body:
-                # Process the emergency type and location
-                emergency_data = message.body.split(",")
-                self.agent.emergency_type = emergency_data[0].split(":")[1]
-                print(f"BMSAgent: Received emergency: {self.agent.emergency_type}")
-                
-                self.agent.location = None
-                if len(emergency_data) > 1:
-                    location_data = emergency_data[1].split(":")[1].split(",")
-                    self.agent.location = {
-                        "row": int(location_data[0]),
-                        "col": int(location_data[1]),
-                        "floor": int(location_data[2]),
-                    }
-                    print(f"BMSAgent: Location received: {self.agent.location}")
-                
-                # Trigger the behavior to handle the emergency
-                self.agent.add_behaviour(self.agent.HandleEmergency())
+            """Receives messages from EmergencyAgent and the responders and processes them by kind."""
+            message = await self.agent.next_message(self)  # Sleeps until a message arrives
+            if message:
+                await protocol.dispatch({
+                    protocol.EMERGENCY_REPORT: self.emergency_reported,
+                    protocol.EMERGENCY_RESOLVED: self.emergency_resolved,
+                    protocol.RESPONDER_RELEASED: self.responder_released,
+                }, message, "BMSAgent")
+
+        async def emergency_reported(self, payload):
+            self.agent.emergency_type = payload.emergency
+            self.agent.location = payload.room  # (floor, row, col) or None
+            print(f"BMSAgent: Received emergency: {self.agent.emergency_type}")
+            if self.agent.location:
+                print(f"BMSAgent: Location received: {self.agent.location}")
+            # Trigger the behavior to handle the emergency; it keeps its own copy of the report
+            self.agent.add_behaviour(self.agent.HandleEmergency(payload))
+
+        async def emergency_resolved(self, payload):
+            where = f" at {payload.room}" if payload.room else ""
+            print(f"BMSAgent: {payload.emergency}{where} resolved.")
+            room = protocol.room_at(self.agent.building, payload.room) if payload.room else None
+            released = self.agent.dispatcher.close(payload.emergency, room)
+            # The responders are free for the queued incidents; those left idle are recalled
+            await self.agent.redispatch(self, released)
+
+        async def responder_released(self, payload):
+            """A responder cannot reach its incident: the incident goes back to the queue."""
+            room = protocol.room_at(self.agent.building, payload.room) if payload.room else None
+            incident = self.agent.dispatcher.find(payload.emergency, room)
+            if incident is None:
+                return
+            print(f"BMSAgent: responder cannot reach {incident}, dispatching again.")
+            self.agent.dispatcher.release(incident)
+            await self.agent.redispatch(self)
 
     class NotifyOccupants(OneShotBehaviour):
-        def __init__(self, message_body):
-            super().__init__()
-            self.message_body = message_body
-
-        async def run(self):
-            """Notifies all occupants about the emergency."""
-            print(f"BMSAgent: Notifying occupants: {self.message_body}")
-            for i in range(1, self.agent.num_occupants + 1):
-                occupant_jid = f"occupant{i}@localhost"
-                occupant_message = Message(to=occupant_jid)
-                occupant_message.body = self.message_body
-                await self.send(occupant_message)
-                print(f"BMSAgent: Message sent to {occupant_jid}")
-
-    class NotifyResponder(OneShotBehaviour):
-        def __init__(self, responder_jid, responder_message):
+        def __init__(self, kind, emergency, room=None):
             super().__init__()
-            self.responder_jid = responder_jid
-            self.responder_message = responder_message
+            self.kind = kind  # protocol.EVACUATION_ALERT or protocol.NOTICE
+            self.emergency = emergency
+            self.room = room
 
         async def run(self):
-            """Sends a message to the relevant responder."""
-            message = Message(to=self.responder_jid)
-            message.body = self.responder_message
-            await self.send(message)
-            print(f"BMSAgent: Message sent to {self.responder_jid}: {message.body}")
+            """
+            Notifies all occupants about the emergency: a single message to the occupants'
+            group address when the transport has one, otherwise concurrent batches of
+            individual messages. Every message carries the alert time, from which the
+            occupants measure their notification latency.
+            """
+            alert_time = time.time()
+            transport = self.agent.transport
+            if transport is not None and transport.has_group(OCCUPANTS_GROUP):
+                await self.send(self.alert(OCCUPANTS_GROUP, alert_time))
+            else:
+                jids = self.agent.occupant_jids
+                for start in range(0, len(jids), BROADCAST_BATCH):
+                    batch = [self.alert(jid, alert_time) for jid in jids[start:start + BROADCAST_BATCH]]
+                    if transport is not None:
+                        await transport.send_many(batch)  # One call per batch, no task per message
+                    else:
+                        await asyncio.gather(*(self.send(message) for message in batch))  # Sends overlap on the XMPP stream
+            action = "evacuate" if self.kind == protocol.EVACUATION_ALERT else "stay informed"
+            print(f"BMSAgent: {len(self.agent.occupant_jids)} occupants told to {action}: {self.emergency}")
+
+        def alert(self, to, alert_time):
+            return protocol.make_message(to, self.kind, self.emergency, self.room, alert_time, sender=str(self.agent.jid))
 
     class HandleEmergency(OneShotBehaviour):
+        def __init__(self, payload):
+            super().__init__()
+            self.payload = payload  # The report, as later reports overwrite the agent's emergency_type/location
+
         async def run(self):
-            """Handles the current emergency."""
-            emergency_type = self.agent.emergency_type
-            location=self.agent.location
+            """Handles the reported emergency, unless an incident for it is already open."""
+            emergency_type = self.payload.emergency
+            location = self.payload.room
+            if self.agent.incident_open(emergency_type, location):
+                print(f"BMSAgent: {emergency_type} already being handled, occupants not alerted again.")
+                return
 
             if emergency_type == "Fire":
                 print("BMSAgent: Managing fire.")
                 await self.agent.unlock_doors()
                 await self.agent.lock_elevator()
-                fire_message = (
-                    f"Fire detected. Evacuate immediately. Location: {location}" 
-                    if location 
-                    else "Fire detected. Evacuate immediately."
-                )
-                self.agent.add_behaviour(self.agent.NotifyOccupants(fire_message))
-                fireman_jid = "fireman@localhost"
-                fireman_message = f"Emergency:{emergency_type},Location:{location['row']},{location['col']},{location['floor']}"
-                self.agent.add_behaviour(self.agent.NotifyResponder(fireman_jid, fireman_message))
+                self.agent.add_behaviour(self.agent.NotifyOccupants(protocol.EVACUATION_ALERT, emergency_type, location))
+                await self.agent.open_incident(self, emergency_type, location)
 
             elif emergency_type == "Earthquake":
                 print("BMSAgent: Managing earthquake.")
                 await self.agent.unlock_doors()
                 await self.agent.lock_elevator()
-                earthquake_message = (
-                    f"Earthquake detected. Evacuate immediately. Location: {location}" 
-                    if location 
-                    else "Earthquake detected. Evacuate immediately."
-                )
-                self.agent.add_behaviour(self.agent.NotifyOccupants(earthquake_message))
-                responder_jid = "earthquake_responder@localhost"
-                responder_message = f"Emergency:{emergency_type},Location:{location['row']},{location['col']},{location['floor']}"
-                self.agent.add_behaviour(self.agent.NotifyResponder(responder_jid, responder_message))
+                self.agent.add_behaviour(self.agent.NotifyOccupants(protocol.EVACUATION_ALERT, emergency_type, location))
+                await self.agent.open_incident(self, emergency_type, location)
 
             elif emergency_type == "Gas Leak":
                 print("BMSAgent: Managing gas leak.")
                 await self.agent.unlock_doors()
-                gas_message = "Gas leak detected. Evacuate immediately."
-                self.agent.add_behaviour(self.agent.NotifyOccupants(gas_message))
-                responder_jid = "gas_responder@localhost"
-                responder_message = f"Emergency:{emergency_type}"
-                self.agent.add_behaviour(self.agent.NotifyResponder(responder_jid, responder_message))
+                self.agent.add_behaviour(self.agent.NotifyOccupants(protocol.EVACUATION_ALERT, emergency_type))
+                await self.agent.open_incident(self, emergency_type)
 
             elif emergency_type == "Security Threat":
                 print("BMSAgent: Managing security threat.")
                 await self.agent.unlock_doors()
-                security_message = (
-                    f"Security threat detected. Evacuate immediately. Location: {location}" 
-                    if location 
-                    else "Security threat detected. Evacuate immediately."
-                )
-                self.agent.add_behaviour(self.agent.NotifyOccupants(security_message))
-                responder_jid = "cop@localhost"
-                responder_message = f"Emergency:{emergency_type},Location:{location['row']},{location['col']},{location['floor']}"
-                self.agent.add_behaviour(self.agent.NotifyResponder(responder_jid, responder_message))
+                self.agent.add_behaviour(self.agent.NotifyOccupants(protocol.EVACUATION_ALERT, emergency_type, location))
+                await self.agent.open_incident(self, emergency_type, location)
 
             elif emergency_type == "Informatic Attack":
                 await self.agent.unlock_doors()
                 await self.agent.lock_elevator()
                 print("BMSAgent: Managing informatic attack.")
-                informatic_message = "Informatic attack ongoing. Systems compromised."
-                self.agent.add_behaviour(self.agent.NotifyOccupants(informatic_message))
-                responder_jid = "it_responder@localhost"
-                responder_message = f"Emergency:{emergency_type}"
-                self.agent.add_behaviour(self.agent.NotifyResponder(responder_jid, responder_message))
+                # Sistemas comprometidos, mas sem ordem de evacuação
+                self.agent.add_behaviour(self.agent.NotifyOccupants(protocol.NOTICE, emergency_type))
+                await self.agent.open_incident(self, emergency_type)
+
+    def incident_open(self, emergency, location=None):
+        """Whether an incident of that kind is already open at `location`."""
+        if self.dispatcher is None:
+            return False
+        room = protocol.room_at(self.building, location) if location else None
+        return self.dispatcher.find(emergency, room) is not None
+
+    async def open_incident(self, behaviour, emergency, location=None):
+        """Queues an incident, unless the same one is open, and re-solves which responder goes where."""
+        if location is None and emergency in ON_SITE:
+            return
+        if self.incident_open(emergency, location):
+            return
+        room = protocol.room_at(self.building, location) if location else None
+        self.dispatcher.open(emergency, room)
+        await self.redispatch(behaviour)
+
+    async def redispatch(self, behaviour, released=None):
+        """
+        Re-solves the responder assignment and sends, through `behaviour`, a dispatch to
+        every responder whose incident changed and a recall to those left without one,
+        `released` responders (responder -> incident they held) included.
+        """
+        previous = {**self.dispatcher.assignment, **(released or {})}
+        changes = self.dispatcher.solve()
+        changes += [(responder, None) for responder in released or () if responder not in self.dispatcher.assignment]
+        for responder, incident in changes:
+            if incident is None:
+                recalled = previous[responder]
+                await behaviour.send(protocol.make_message(
+                    responder.jid, protocol.RESPONDER_RECALLED, recalled.emergency, protocol.room_ref(recalled.room), time.time()))
+                action = "released from" if released and responder in released else "recalled from"
+                print(f"BMSAgent: {responder.jid} {action} {recalled}")
+            else:
+                await behaviour.send(protocol.make_message(
+                    responder.jid, protocol.RESPONDER_DISPATCH, incident.emergency, protocol.room_ref(incident.room), time.time()))
+                print(f"BMSAgent: {responder.jid} dispatched to {incident}")
+        waiting = len(self.dispatcher.incidents) - len(self.dispatcher.assignment)
+        if waiting:
+            print(f"BMSAgent: {waiting} incident(s) waiting for a free responder.")
 
     async def lock_elevator(self):
         """Locks the elevators."""
@@ -1,88 +1,102 @@
-from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
-from spade.message import Message
 import asyncio
 import random
-from asyncio import Queue
+import time
+import protocol
+from Agents.SimulationAgent import SimulationAgent
 
+# Probabilidade de cada tipo de emergência ser a inicial
+EMERGENCY_WEIGHTS = {
+    "Fire": 0.35,
+    "Earthquake": 0.25,
+    "Gas Leak": 0.2,
+    "Security Threat": 0.1,
+    "Informatic Attack": 0.1,
+}
+# Emergências aleatórias (fogo, ataque informático ou sismo) por segundo simulado: 3% a cada 5 s
+EVENT_RATE = 0.03 / 5
 
-class EmergencyAgent(Agent):
-    def __init__(self, jid, password, building):
+
+class EmergencyAgent(SimulationAgent):
+    def __init__(self, jid, password, building, emergency_weights=None, seed=None):
         super().__init__(jid, password)
         self.building = building  # Referência ao edifício
+        self.emergency_weights = emergency_weights or EMERGENCY_WEIGHTS
+        self.random = random.Random(seed)  # Cenário reprodutível com a mesma seed
         self.emergency_type = None
+        self.next_event_at = None  # Instante simulado da próxima emergência aleatória
         self.hacked_systems = []  # Rastreamento de sistemas afetados por ataques informáticos
 
     class EmergencyBehaviour(CyclicBehaviour):
         async def run(self):
-            """Gerencia emergências e condições dinâmicas."""
-            await asyncio.sleep(5)  # Atraso para permitir inicialização
-            if not self.agent.emergency_type:
+            """
+            Gerencia emergências e condições dinâmicas. Em vez de acordar a intervalos fixos,
+            dorme até à próxima ignição agendada, à próxima emergência aleatória ou a uma
+            mudança no edifício feita por outro agente, o que acontecer primeiro.
+            """
+            agent = self.agent
+            if not agent.emergency_type:
+                await agent.idle(self, asyncio.sleep(5))  # Atraso para permitir inicialização
                 # Inicia uma emergência
-                self.agent.emergency_type = self.start_emergency()
-                print(f"Emergency initiated: {self.agent.emergency_type}")
+                agent.emergency_type = await self.start_emergency()
+                print(f"Emergency initiated: {agent.emergency_type}")
+                agent.next_event_at = agent.simulation_time() + agent.random.expovariate(EVENT_RATE)
+
+            fire_spread = agent.building.fire_spread
+            wake_at = min(agent.next_event_at, fire_spread.next_ignition())
+            await agent.idle(self, agent.building.wait_for_change(max(0.0, wake_at - agent.simulation_time())))
+
+            # Propaga os incêndios agendados até ao instante atual da simulação
+            now = agent.simulation_time()
+            burning = fire_spread.advance(now)
+            if burning:
+                rooms = ", ".join(f"({room.row}, {room.col}, Floor {room.floor})" for room in burning)
+                print(f"Fire spread to {len(burning)} room(s): {rooms}")
 
             # Atualiza condições de emergência dinâmicas
-            rn = random.random()
-            if rn < 0.01:
-                self.start_fire()
-            elif rn < 0.02:
-                self.update_informatic_attack()
-            elif rn < 0.03:
-                self.start_earthquake()
-
-        def start_emergency(self):
+            if now >= agent.next_event_at:
+                agent.next_event_at = now + agent.random.expovariate(EVENT_RATE)
+                rn = agent.random.random()
+                if rn < 1 / 3:
+                    await self.start_fire()
+                elif rn < 2 / 3:
+                    await self.update_informatic_attack()
+                else:
+                    await self.start_earthquake()
+
+        async def start_emergency(self):
             """Inicia uma emergência selecionando um tipo aleatório."""
-            emergencies = {
-                "Fire": 0.35,
-                "Earthquake": 0.25,
-                "Gas Leak": 0.2,
-                "Security Threat": 0.1,
-                "Informatic Attack": 0.1,
-            }
-            self.emergency_type = random.choices(list(emergencies.keys()), weights=emergencies.values(), k=1)[0]
-            self.send_emergency_to_bms(self.emergency_type)
+            emergencies = self.agent.emergency_weights
+            self.emergency_type = self.agent.random.choices(list(emergencies.keys()), weights=emergencies.values(), k=1)[0]
 
+            # Cada emergência é reportada ao BMS uma só vez: com a sala, quando a tem
+            reported = False
             if self.emergency_type == "Fire":
-                self.start_fire()
+                reported = await self.start_fire()
             elif self.emergency_type == "Earthquake":
-                self.start_earthquake()
+                reported = await self.start_earthquake()
             elif self.emergency_type == "Gas Leak":
                 pass  # Apenas evacuar
             elif self.emergency_type == "Security Threat":
-                self.start_security_threat()
+                reported = await self.start_security_threat()
             elif self.emergency_type == "Informatic Attack":
-                self.start_informatic_attack()
+                reported = await self.start_informatic_attack()
+            if not reported:
+                await self.send_emergency_to_bms(self.emergency_type)
             return self.emergency_type
         
-        async def send_emergency_to_bms(self, emergency_type, fire_room=None, earthquake_room=None, security_room=None):
-            """
-            Enfileira uma mensagem para envio ao BMSAgent.
-            """
-            msg = Message(to="bms@localhost")  # Envia diretamente ao BMSAgent
-            if emergency_type == "Fire" and fire_room:
-                # Inclui as coordenadas da sala no caso de incêndio
-                msg.body = f"Emergency:{emergency_type},Location:{fire_room.row},{fire_room.col},{fire_room.floor}"
-                print(f"EmergencyAgent: Mensagem enfileirada para BMSAgent sobre incêndio na sala ({fire_room.row}, {fire_room.col}, Floor {fire_room.floor}).")
-            elif emergency_type == "Earthquake" and earthquake_room:
-                msg.body = f"Emergency:{emergency_type},Location:{earthquake_room.row},{earthquake_room.col},{earthquake_room.floor}"
-                print(f"EmergencyAgent: Mensagem enfileirada para BMSAgent sobre terremoto na sala ({earthquake_room.row}, {earthquake_room.col}, Floor {earthquake_room.floor}).")
-            elif emergency_type == "Security Threat" and security_room:
-                msg.body = f"Emergency:{emergency_type},Location:{security_room.row},{security_room.col},{security_room.floor}"
-                print(f"EmergencyAgent: Mensagem enfileirada para BMSAgent sobre ameaça de segurança na sala ({security_room.row}, {security_room.col}, Floor {security_room.floor}).")
-            else:
-                msg.body = f"Emergency:{emergency_type}"
-                print(f"EmergencyAgent: Mensagem enfileirada para BMSAgent sobre emergência: {emergency_type}.")
-            
-            # Adiciona a mensagem na fila
+        async def send_emergency_to_bms(self, emergency_type, room=None):
+            """Envia ao BMSAgent um relatório da emergência, com a sala afetada quando existe."""
+            msg = protocol.make_message("bms@localhost", protocol.EMERGENCY_REPORT, emergency_type, protocol.room_ref(room), time.time())
             await self.send(msg)
-            print(f"EmergencyAgent: Mensagem enviada ao BMSAgent: {msg.body}")
+            where = f" na sala ({room.row}, {room.col}, Floor {room.floor})" if room else ""
+            print(f"EmergencyAgent: Mensagem enviada ao BMSAgent sobre {emergency_type}{where}.")
 
 
         async def start_informatic_attack(self):
             """Inicia um ataque informático em sistemas aleatórios do edifício."""
             systems = ["doors", "communication", "elevators"]
-            self.agent.hacked_systems = random.sample(systems, k=random.randint(1, len(systems)))
+            self.agent.hacked_systems = self.agent.random.sample(systems, k=self.agent.random.randint(1, len(systems)))
             await self.send_emergency_to_bms("Informatic Attack")
             for system in self.agent.hacked_systems:
                 if system == "doors":
@@ -92,10 +106,11 @@ class EmergencyAgent(Agent):
                 elif system == "communication":
                     self.agent.building.lock_communications = True
             print(f"Informatic attack targets: {self.agent.hacked_systems}")
+            return True
 
         async def update_informatic_attack(self):
             """Simula efeitos contínuos de ataques informáticos."""
-            rn = random.random()
+            rn = self.agent.random.random()
             if rn < 0.33:
                 self.agent.building.lock_doors = True
             elif rn < 0.66:
@@ -103,32 +118,35 @@ class EmergencyAgent(Agent):
             else:
                 self.agent.building.lock_elevators = True
 
-        async def start_fire(self):
-            """Inicia um incêndio utilizando métodos do `building.py`."""
-            unoccupied_rooms = self.agent.get_unoccupied_rooms()
-            if unoccupied_rooms:
-                fire_room = random.choice(unoccupied_rooms)
-                fire_room.fires()  # Chama o método do building.py
-                await self.send_emergency_to_bms("Fire", fire_room)
-                print(f"Fire started in room ({fire_room.row}, {fire_room.col}, Floor {fire_room.floor})")
+        async def start_fire(self, count=1):
+            """Inicia um ou vários incêndios simultâneos; a propagação fica a cargo do `FireSpread` do edifício."""
+            fire_rooms = self.agent.building.occupancy.free_rooms().sample(count, self.agent.random)
+            if fire_rooms:
+                self.agent.building.fire_spread.ignite_many(fire_rooms, self.agent.simulation_time())
+                for fire_room in fire_rooms:
+                    await self.send_emergency_to_bms("Fire", fire_room)
+                    print(f"Fire started in room ({fire_room.row}, {fire_room.col}, Floor {fire_room.floor})")
+            return bool(fire_rooms)
 
         async def start_earthquake(self):
             """Simula um terremoto utilizando métodos do `building.py`."""
-            unoccupied_rooms = self.agent.get_unoccupied_rooms()
-            if unoccupied_rooms:
-                earthquake_room = random.choice(unoccupied_rooms)
-                earthquake_room.earthquake()  # Chama o método do building.py
+            free_rooms = self.agent.building.occupancy.free_rooms()
+            if free_rooms:
+                earthquake_room = free_rooms.choice(self.agent.random)
+                earthquake_room.earthquake(self.agent.random)  # Chama o método do building.py
                 await self.send_emergency_to_bms("Earthquake", earthquake_room)
             print("Earthquake damage applied to all rooms.")
+            return bool(free_rooms)
 
         async def start_security_threat(self):
             """Simula uma ameaça de segurança em áreas específicas."""
-            unoccupied_rooms = self.agent.get_unoccupied_rooms()
-            if unoccupied_rooms:
-                security_room = random.choice(unoccupied_rooms)
+            free_rooms = self.agent.building.occupancy.free_rooms()
+            if free_rooms:
+                security_room = free_rooms.choice(self.agent.random)
                 security_room.security_threath()
                 await self.send_emergency_to_bms("Security Threat", security_room)
                 print("Security threat initiated.")
+            return bool(free_rooms)
 
     def get_unoccupied_rooms(self, room_type=None):
         """
@@ -137,12 +155,14 @@ class EmergencyAgent(Agent):
         """
         return [
             room
-            for floor in self.building.layout
-            for row in floor
-            for room in row
-            if room and not room.is_occupied and (room_type is None or room.room_type == room_type)
+            for room in self.building.occupancy.free_rooms()
+            if room_type is None or room.room_type == room_type
         ]
 
+    def simulation_time(self):
+        """Segundos de simulação, lidos do relógio partilhado pelo edifício."""
+        return self.building.clock.now()
+
     async def setup(self):
         """Configura os comportamentos do agente."""
         print("EmergencyAgent iniciado.")
@@ -1,121 +1,125 @@
-from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
-from spade.message import Message
 import asyncio
-from building import Room, Building
+import time
+import protocol
+from Agents.SimulationAgent import SimulationAgent
+from building import Building
+from dispatch import ROLE_EMERGENCIES
 
-
-class EmergencyResponderAgent(Agent):
-    def __init__(self, jid, password, role, building: Building):
+class EmergencyResponderAgent(SimulationAgent):
+    def __init__(self, jid, password, role, building: Building, start_room=None):
         super().__init__(jid, password)
         self.role = role  # "cop", "fireman", "earthquake_responder", "gas_responder", "it_responder"
         self.building = building  # Referência ao edifício
-        self.location = self.building.layout[0][0][0] # Começa no primeiro andar, primeira sala
-        self.pace=0.5
         self.type="Responder"
+        self._location = None
+        self.location = start_room or self.building.layout[0][0][0] # Por omissão, primeiro andar, primeira sala
+        self.pace=0.5
+        self.assignment = None  # Payload do RESPONDER_DISPATCH em curso
+        self.orders = asyncio.Event()  # Assinalado a cada nova ordem do BMS
+
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, room):
+        # Mantém o índice de ocupação do edifício atualizado a cada movimento
+        self.building.occupancy.move(self, self._location, room)
+        self._location = room
 
     class EmergencyBehaviour(CyclicBehaviour):
         async def run(self):
-            txt = await self.receive(timeout=0.3)
+            txt = await self.agent.next_message(self)
             if txt:
-                if txt.body.startswith("Fire") and self.agent.role == 'fireman':
-                    _, room_coords = txt.body.split("Room:")
-                    target_floor, target_row, target_col = map(int, room_coords.split(","))
-                    target_room = self.agent.building.layout[target_floor][target_row][target_col]
-                    print(f"{self.agent.role} responder is responding to fire in Room: {target_floor},{target_row},{target_col}.")
-                    await self.navigate_to_room(target_room)
-                    print(f"{self.agent.role} Fire at Room: {target_floor},{target_row},{target_col} extinguished.")
-                    await self.send_resolution_status("Fire", target_room)
+                await protocol.dispatch({
+                    protocol.RESPONDER_DISPATCH: self.dispatched,
+                    protocol.RESPONDER_RECALLED: self.recalled,
+                }, txt, f"{self.agent.role} responder")
 
-                elif txt.body.startswith("Earthquake") and self.agent.role == 'fireman':
-                    _, room_coords = txt.body.split("Room:")
-                    target_floor, target_row, target_col = map(int, room_coords.split(","))
-                    target_room = self.agent.building.layout[target_floor][target_row][target_col]
-                    print(f"{self.agent.role.capitalize()} responder is responding to Earthquake")
-                    await self.navigate_to_room(target_room)
-                    print(f"{self.agent.role.capitalize()} Everyone at the room is safe")
-                    await self.send_resolution_status("Earthquake", target_room)
+        async def dispatched(self, payload):
+            """O BMS atribuiu (ou reatribuiu) uma emergência a este responder."""
+            if payload.emergency not in ROLE_EMERGENCIES.get(self.agent.role, ()):
+                return
+            self.agent.assignment = payload
+            self.agent.orders.set()
 
-                elif txt.body.startswith("Security Threat") and self.agent.role == 'cop':
-                    _, room_coords = txt.body.split("Room:")
-                    target_floor, target_row, target_col = map(int, room_coords.split(","))
-                    target_room = self.agent.building.layout[target_floor][target_row][target_col]
-                    print(f"{self.agent.role} responder is responding to security threat in Room: {target_floor},{target_row},{target_col}.")
-                    await self.navigate_to_room(target_room)
-                    print(f"{self.agent.role} Security threat in Room: {target_floor},{target_row},{target_col} resolved.")
-                    await self.send_resolution_status("Security Threat", target_room)
+        async def recalled(self, payload):
+            """A emergência passou para outro responder, mais próximo."""
+            if self.agent.assignment is not None and self.agent.assignment.room == payload.room:
+                print(f"{self.agent.role.capitalize()} responder recalled from {payload.emergency.lower()}.")
+                self.agent.assignment = None
 
-                # Additional conditions for gas leaks or informatic attacks could be handled similarly
-                elif txt.body.startswith("Gas Leak") and self.agent.role == 'gas_responder':
-                    print(f"{self.agent.role.capitalize()} responder is addressing gas leak.")
-                    await self.send_resolution_status("Gas Leak", None)
+    class RespondBehaviour(CyclicBehaviour):
+        async def run(self):
+            """
+            Um passo em direção à emergência atribuída. As ordens podem mudar a meio do
+            caminho: o destino é lido de novo a cada sala.
+            """
+            assignment = self.agent.assignment
+            if assignment is None:
+                self.agent.orders.clear()
+                await self.agent.idle(self, self.agent.orders.wait())
+                return
+            emergency = assignment.emergency
+            target_room = protocol.room_at(self.agent.building, assignment.room) if assignment.room else None
+            if target_room is None:
+                print(f"{self.agent.role.capitalize()} responder is addressing {emergency.lower()}.")
+                await self.resolve(emergency, None)
+                return
+            if self.agent.location != target_room:
+                if not self.go_to_next_room(target_room):
+                    print(f"{self.agent.role.capitalize()} responder cannot reach Room ({target_room.row}, {target_room.col}, Floor {target_room.floor}).")
+                    self.agent.assignment = None
+                    # O BMS liberta-o e passa a emergência a quem lá consiga chegar
+                    await self.send(protocol.make_message(
+                        "bms@localhost", protocol.RESPONDER_RELEASED, emergency, assignment.room, time.time()))
+                    return
+                await self.agent.idle(self, asyncio.sleep(self.agent.pace))
+                return
+            where = f"Room: {target_room.floor},{target_room.row},{target_room.col}"
+            self.agent.location.fire = False #apaga o fogo ou faz uma passagem noq foi destruido
+            self.agent.location.unavailable = False
+            if emergency == "Fire":
+                print(f"{self.agent.role} Fire at {where} extinguished.")
+            elif emergency == "Earthquake":
+                print(f"{self.agent.role.capitalize()} Everyone at the room is safe")
+            else:
+                print(f"{self.agent.role} {emergency} in {where} resolved.")
+            await self.resolve(emergency, target_room)
 
-                elif txt.body.startswith("Informatic Attack") and self.agent.role == 'it_responder':
-                    print(f"{self.agent.role.capitalize()} responder is addressing informatic attack.")
-                    await self.send_resolution_status("Informatic Attack", None)
+        async def resolve(self, emergency, room):
+            self.agent.assignment = None
+            await self.send_resolution_status(emergency, room)
 
         async def send_resolution_status(self, emergency_type, room=None):
             """Envio de mensagem ao BMS indicando que a emergência foi resolvida."""
-            msg = Message(to="bms@localhost")
-            if emergency_type in ["Fire", "Earthquake", "Security Threat"]:
-                if room:
-                    msg.body = f"Emergency:{emergency_type} resolved, Location: {room.row},{room.col},{room.floor}"
-                    print(f"EmergencyResponder: Mensagem enviada ao BMS sobre {emergency_type} resolvido na sala ({room.row},{room.col},{room.floor}).")
-            else:
-                msg.body = f"Emergency:{emergency_type} resolved"
-                print(f"EmergencyResponder: Mensagem enviada ao BMS sobre {emergency_type} resolvido.")
-            
+            msg = protocol.make_message("bms@localhost", protocol.EMERGENCY_RESOLVED, emergency_type, protocol.room_ref(room), time.time())
             await self.send(msg)
-            
-        async def navigate_to_room(self, target_room):
-            """Navega até uma sala específica no mesmo andar."""
-            while self.agent.location != target_room:
-                self.go_to_next_room(target_room)
-                await asyncio.sleep(self.agent.pace)
-            self.agent.location.fire = False #apaga o fogo ou faz uma passagem noq foi destruido
-            self.agent.location.unavailable = False  
+            where = f" na sala ({room.row},{room.col},{room.floor})" if room else ""
+            print(f"EmergencyResponder: Mensagem enviada ao BMS sobre {emergency_type} resolvido{where}.")
 
         def go_to_next_room(self, target_room):
-            target_row, target_col, target_floor = target_room.row, target_room.col, target_room.floor
-            room=self.agent.location
-            connections = [
-                (connection.row, connection.col, connection.floor)
-                for connection in room.connections
-                if not connection.fire and not connection.unvailable
-            ]
-            connections.append([
-                (connection.row, connection.col, connection.floor)
-                for connection in room.elevators
-                if not connection.fire and not connection.unvailable and not self.agent.building.lock_elevators
-            ])
-            connections.append([
-                (connection.row, connection.col, connection.floor)
-                for connection in room.staircases
-                if not connection.fire and not connection.unvailable
-            ])
-            connections.append([
-                (connection.row, connection.col, connection.floor)
-                for connection in room.emergency_staircases
-                if not connection.fire and not connection.unvailable and not self.agent.building.lock_doors
-            ])
-            
-            if not connections:
-                print(f"{self.agent.agent_name}: Não há saídas disponíveis no edifício.")
+            # Responders cross burning or damaged rooms, so hazards are ignored in their field
+            field = self.agent.building.distance_field_to(target_room, ignore_hazards=True)
+            next_room = field.next_room(self.agent.location)
+            if next_room is None:
                 return False
-            
-            for connection in connections:
-                connection.fire=False #fix the fires or damaged paths that are on their path
-                connection.unavailable=False
-            
-            nearest_connection = min(
-                connections,
-                key=lambda pos: abs(pos.row - target_row) + abs(pos.col - target_col) + abs(pos.floor - target_floor)
-            )
-            
-            self.agent.location=nearest_connection
+            if not next_room.is_passable():
+                next_room.fire = False #fix the fires or damaged paths that are on their path
+                next_room.unavailable = False
+            self.agent.location = next_room
             return True
             
 
     async def setup(self):
         print(f"{self.role.capitalize()} responder agent started...")
         self.add_behaviour(self.EmergencyBehaviour())
+        # Só o EmergencyBehaviour lê mensagens; o RespondBehaviour segue as ordens que ele guarda
+        self.add_behaviour(self.RespondBehaviour(), protocol.NoMessages())
+
+    async def _async_stop(self):
+        await super()._async_stop()
+        # Sai do índice de ocupação; `location` fica na última sala para o dispatcher
+        if self in self.building.occupancy.agents_in_room(self._location):
+            self.building.occupancy.move(self, self._location, None)
@@ -1,134 +1,168 @@
-from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
-from spade.message import Message
 import asyncio
-import random
 import time
-from building import Room, Building
+import protocol
+from Agents.SimulationAgent import SimulationAgent
+from building import Building, EXIT_TYPES
+from transport import OCCUPANTS_GROUP
 
+ROUTE_RECHECK = 1.0  # Segundos máximos na fila sem reavaliar a rota, que muda com as outras filas
 
-class OccupantAgent(Agent):
-    def __init__(self, jid, password, agent_name, condition, building: Building):
+
+class OccupantAgent(SimulationAgent):
+    def __init__(self, jid, password, agent_name, condition, building: Building, crowd=None, start_room=None):
         super().__init__(jid, password)
         self.agent_name = agent_name
         self.condition = condition  # "disabled" ou "functional"
         self.building = building  # Referência ao edifício
-        self.evacuated = False
+        self.crowd = crowd  # CrowdEngine opcional: a posição e o estado ficam numa linha das suas tabelas
+        self.crowd_row = None
+        self._evacuated = False
         self.pace = 2 if condition == "disabled" else 1
         self.finish_time = None
-        self.location = self.random_initial_location() # Define a localização inicial
-        self.location.is_occupied = True
+        self.alert_latency = None  # Segundos entre o alerta do BMS e a sua receção
         self.type="Occupant"
+        self.inside = True  # Conta no índice de ocupação até sair do edifício ou parar
+        self._location = None
+        self.location = start_room or self.random_initial_location() # Define a localização inicial
+
+    @property
+    def location(self):
+        if self.crowd_row is not None:
+            return self.crowd.room(self.crowd.position[self.crowd_row])
+        return self._location
+
+    @location.setter
+    def location(self, room):
+        # Mantém o índice de ocupação do edifício atualizado a cada movimento
+        self.building.occupancy.move(self, self.location, room)
+        if self.crowd is None:
+            self._location = room
+        elif self.crowd_row is None:
+            # Linha inativa: quem move o ocupante é este agente, não o `tick` do motor
+            self.crowd_row = self.crowd.add(self.crowd.room_index(room), self.pace, active=False)[0]
+        else:
+            self.crowd.place(self.crowd_row, self.crowd.room_index(room))
+
+    @property
+    def evacuated(self):
+        if self.crowd_row is not None:
+            return bool(self.crowd.evacuated[self.crowd_row])
+        return self._evacuated
+
+    @evacuated.setter
+    def evacuated(self, value):
+        if value != self.evacuated:
+            self.metrics.gauge("occupants_evacuated", "Occupants out of the building.").inc(1 if value else -1)
+        self._evacuated = value
+        if self.crowd_row is not None:
+            self.crowd.evacuated[self.crowd_row] = value
+
+    def leave_building(self):
+        """Sai do índice de ocupação e da fila onde esperava; `location` fica na última sala."""
+        if self.inside:
+            self.inside = False
+            self.building.flow_control().leave(self)
+            self.building.occupancy.move(self, self.location, None)
         
     def random_initial_location(self):
-        # Gera uma localização inicial aleatória em um corredor (`H`).
-        available_rooms = [
-            room
-            for floor in self.building.layout
-            for row in floor
-            for room in row
-            if room
-        ]
-        if not available_rooms:
+        # Sorteia, em O(1), uma sala livre do edifício.
+        free_rooms = self.building.occupancy.free_rooms()
+        if not free_rooms:
             raise ValueError("Não há lugares disponíveis no edifício para posicionar os agentes.")
-        return random.choice(available_rooms)
+        return free_rooms.choice(self.building.random)
 
     class MessageHandlingBehaviour(CyclicBehaviour):
         async def run(self):
-            """Recebe e processa mensagens."""
-            message = await self.receive(timeout=5)
+            """Recebe e processa mensagens, conforme o seu tipo."""
+            message = await self.agent.next_message(self)
             if message:
-                if "Emergency" in message.body:
-                    print(f"{self.agent.agent_name}: Emergency alert received.")
-                    await self.handle_emergency_message(message.body)
-                elif "Elevator Unlocked" in message.body:
-                    print(f"{self.agent.agent_name}: Received elevator availability confirmation.")
-                elif "Elevator Locked" in message.body:
-                    print(f"{self.agent.agent_name}: Received elevator unavailability confirmation.")
-    
-        async def handle_emergency_message(self, message_body):
-            """Processa uma mensagem de emergência e inicia o processo de evacuação."""
-            if "Room:" in message_body:
-                _, room_coords = message_body.split("Room:")
-                target_floor, target_row, target_col = map(int, room_coords.split(","))
-                print(f"{self.agent.agent_name}: Emergency reported near Room ({target_row}, {target_col}, Floor {target_floor}).")
-                await self.go_to_exit()
+                await protocol.dispatch({
+                    protocol.EVACUATION_ALERT: self.handle_emergency_message,
+                    protocol.NOTICE: self.handle_notice,
+                    protocol.ELEVATORS_UNLOCKED: self.handle_elevators,
+                    protocol.ELEVATORS_LOCKED: self.handle_elevators,
+                }, message, self.agent.agent_name)
+
+        async def handle_emergency_message(self, payload):
+            """Processa um alerta de evacuação e inicia o processo de evacuação."""
+            print(f"{self.agent.agent_name}: Emergency alert received.")
+            if self.agent.alert_latency is None:
+                self.agent.alert_latency = time.time() - payload.sent_at
+            if self.agent.evacuated:
+                return  # Já saiu do edifício num alerta anterior
+            if payload.room:
+                target_floor, target_row, target_col = payload.room
+                print(f"{self.agent.agent_name}: {payload.emergency} reported near Room ({target_row}, {target_col}, Floor {target_floor}).")
+            await self.go_to_exit()
+
+        async def handle_notice(self, payload):
+            print(f"{self.agent.agent_name}: {payload.emergency} notice received, no evacuation ordered.")
+
+        async def handle_elevators(self, payload):
+            if payload.kind == protocol.ELEVATORS_UNLOCKED:
+                print(f"{self.agent.agent_name}: Received elevator availability confirmation.")
             else:
-                print(f"{self.agent_name}: Mensagem de emergência mal formatada ou ausente.")
+                print(f"{self.agent.agent_name}: Received elevator unavailability confirmation.")
 
         async def go_to_exit(self):
-            """Navega até a saída mais próxima."""
-            exits = [
-                (room.row, room.col, room.floor)
-                for floor in self.agent.building.layout
-                for row in floor
-                for room in row
-                if room and room.room_type == "E" or "N"
-            ]
-            if not exits:
-                print(f"{self.agent.agent_name}: Não há saídas disponíveis no edifício.")
-                return
-            nearest_exit = min(
-                exits,
-                key=lambda pos: abs(pos[0] - self.agent.location.row) + abs(pos[1] - self.agent.location.col) + abs(pos[2] - self.agent.location.floor)
-            )
-            target_floor, target_row, target_col = nearest_exit[2], nearest_exit[0], nearest_exit[1]
-            target_room = self.agent.building.layout[target_floor][target_row][target_col]
-            print(f"{self.agent_name} está indo para a saída mais próxima em ({target_row}, {target_col}, andar {target_floor}).")
-            if await self.navigate_to_room(target_room):
-                print(f"{self.agent_name} alcançou a saída em ({target_room.row}, {target_room.col}, andar {target_floor}).")
-                self.agent.evacuated = True
-                self.agent.finish_time = time.time()
-            else:
-                asyncio.wait(100) #wait till emergency responders arrive
-                self.go_to_exit()
-
-        async def navigate_to_room(self, target_room):
-            """Navega até uma sala específica no mesmo andar."""
-            while self.agent.location != target_room:
-                if not self.go_to_next_room(target_room):
-                    print(f"{self.agent.agent_name} está preso e não consegue alcançar o destino ({target_room.row}, {target_room.col}). Vai ter de esperar que os emergency responders cheguem")
+            """Navega até a saída mais próxima seguindo as rotas de evacuação do edifício."""
+            building = self.agent.building
+            while True:
+                distance = building.exit_distance(self.agent.location)
+                if distance is None:
+                    print(f"{self.agent.agent_name}: Não há saídas alcançáveis a partir da sala atual.")
+                else:
+                    print(f"{self.agent.agent_name} está indo para a saída mais próxima, a {distance} salas de distância.")
+                if distance is not None and await self.navigate_to_exit():
+                    break
+                # Preso: acorda quando um responder apaga um fogo ou liberta uma sala, e tenta de novo
+                await self.agent.idle(self, building.wait_for_change())
+            room = self.agent.location
+            print(f"{self.agent.agent_name} alcançou a saída em ({room.row}, {room.col}, andar {room.floor}).")
+            self.agent.evacuated = True
+            self.agent.leave_building()
+            self.agent.finish_time = building.clock.now()  # Segundos simulados
+            self.agent.metrics.histogram("evacuation_time_seconds", "Simulated seconds until each occupant got out.",
+                                         low=0.1, high=1e4).observe(self.agent.finish_time)
+
+        async def navigate_to_exit(self):
+            """Avança sala a sala até chegar a uma saída (`N` ou `E`), respeitando as filas de cada ligação."""
+            while self.agent.location.room_type not in EXIT_TYPES:
+                step = self.go_to_next_room()
+                if step is None:
+                    print(f"{self.agent.agent_name} está preso e não consegue alcançar uma saída. Vai ter de esperar que os emergency responders cheguem")
                     return False
-                await asyncio.sleep(self.agent.pace)
+                if step:
+                    await self.agent.idle(self, asyncio.sleep(self.agent.pace))
+                else:  # Na fila: acorda quando chega a sua vez de passar
+                    flow = self.agent.building.flow_control()
+                    await self.agent.idle(self, flow.wait_turn(self.agent, ROUTE_RECHECK))
             return True
 
-        def go_to_next_room(self, target_room):
-            target_row, target_col, target_floor = target_room.row, target_room.col, target_room.floor
-            room=self.agent.location
-            connections = [
-                (connection.row, connection.col, connection.floor)
-                for connection in room.connections
-                if not connection.fire and not connection.unvailable
-            ]
-            connections.append([
-                (connection.row, connection.col, connection.floor)
-                for connection in room.elevators
-                if not connection.fire and not connection.unvailable and not self.agent.building.lock_elevators
-            ])
-            connections.append([
-                (connection.row, connection.col, connection.floor)
-                for connection in room.staircases
-                if not connection.fire and not connection.unvailable
-            ])
-            connections.append([
-                (connection.row, connection.col, connection.floor)
-                for connection in room.emergency_staircases
-                if not connection.fire and not connection.unvailable and not self.agent.building.lock_doors
-            ])
-            
-            if not connections:
-                print(f"{self.agent.agent_name}: Não há saídas disponíveis no edifício.")
+        def go_to_next_room(self):
+            """
+            Um passo: consulta o próximo salto na tabela de rotas partilhada pelo edifício.
+            Devolve True se avançou, False se ficou na fila da ligação e None se está preso.
+            """
+            building = self.agent.building
+            flow = building.flow_control()
+            next_room = building.next_room_to_exit(self.agent.location, flow.congestion(self.agent))
+            if next_room is None:
+                flow.leave(self.agent)
+                return None
+            if not flow.request(self.agent, self.agent.location, next_room, building.clock.now()):
                 return False
-            
-            nearest_connection = min(
-                connections,
-                key=lambda pos: abs(pos.row - target_row) + abs(pos.col - target_col) + abs(pos.floor - target_floor)
-            )
-            
-            self.agent.location=nearest_connection
+            self.agent.location = next_room
             return True
             
 
     async def setup(self):
         print(f"{self.agent_name} está iniciando na sala ({self.location.row}, {self.location.col}, andar {self.location.floor})...")
         self.add_behaviour(self.MessageHandlingBehaviour())
+        if self.transport is not None:
+            self.transport.join(OCCUPANTS_GROUP, self.jid)  # Recebe os alertas gerais do BMS
+
+    async def _async_stop(self):
+        await super()._async_stop()
+        self.leave_building()  # Quem ficou no edifício deixa de contar nas salas
@@ -0,0 +1,92 @@
+import time
+
+from spade.agent import Agent
+
+import protocol
+from metrics import MetricsRegistry
+
+
+class SimulationAgent(Agent):
+    """
+    Common base of the simulation's agents. Messages go through `transport`: with the
+    default (None) that is SPADE's own path, in-process delivery or the XMPP server.
+    With a transport such as `InMemoryTransport` the agent skips the XMPP login
+    entirely: `setup` and the behaviours run as usual and `send`/`receive` keep their
+    semantics, but messages only travel through the transport.
+
+    Behaviours that only react to messages wait in `next_message`, which sleeps until
+    one arrives rather than waking up on a timeout to poll an empty queue.
+
+    Every agent feeds `metrics`: message delivery latency and the queue depth left
+    behind in `next_message`, and the duration of each behaviour tick (one `run`
+    call, minus the time idle in `next_message` and in any other wait made through
+    `idle`: sleeps, building changes, orders).
+    """
+
+    transport = None  # Set once by main before the agents are started
+    metrics = MetricsRegistry()  # Replaced by main for each run
+
+    async def _async_start(self, auto_register=True):
+        if self.transport is None:
+            return await super()._async_start(auto_register)
+        self.transport.register(self)
+        self.container = self.transport  # Behaviour.send hands messages to the agent's container
+        await self.setup()
+        self._alive.set()
+        for behaviour in self.behaviours:
+            if not behaviour.is_running:
+                behaviour.set_agent(self)
+                behaviour.start()
+
+    def add_behaviour(self, behaviour, template=None):
+        super().add_behaviour(behaviour, template)
+        ticks = self.metrics.histogram("behaviour_tick_seconds", "Duration of one behaviour run, without idle waits.",
+                                       behaviour=type(behaviour).__name__)
+        run = behaviour._run
+
+        async def timed_run():
+            behaviour.idle = 0.0
+            start = time.perf_counter()
+            await run()
+            ticks.observe(time.perf_counter() - start - behaviour.idle)
+
+        behaviour._run = timed_run
+
+    @staticmethod
+    async def idle(behaviour, awaitable):
+        """Awaits `awaitable` as idle time of `behaviour`, left out of its tick duration."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            behaviour.idle = getattr(behaviour, "idle", 0.0) + time.perf_counter() - start
+
+    @classmethod
+    async def next_message(cls, behaviour):
+        """The next message of `behaviour`, however long it takes; None once the agent stops."""
+        message = await cls.idle(behaviour, behaviour.queue.get())
+        if message is not None:
+            metrics = behaviour.agent.metrics
+            metrics.counter("messages_received_total", "Messages taken from the agents' queues.").inc()
+            metrics.histogram("message_queue_depth", "Messages still queued when a behaviour takes one.",
+                              low=0.5, high=1e5).observe(behaviour.queue.qsize())
+            try:
+                sent_at = protocol.read(message).sent_at
+            except ValueError:
+                sent_at = 0.0
+            if sent_at:
+                metrics.histogram("message_latency_seconds", "Time from a message being sent to its receiver taking it.",
+                                  high=1e2).observe(time.time() - sent_at)
+        return message
+
+    async def _async_stop(self):
+        if self.transport is None:
+            await super()._async_stop()
+        else:
+            for behaviour in self.behaviours:
+                behaviour.kill()
+            self.transport.unregister(self.jid)
+            self._alive.clear()
+        for behaviour in self.behaviours:
+            if behaviour.queue is not None:
+                behaviour.queue.put_nowait(None)  # Wakes a killed behaviour blocked in `next_message`
@@ -0,0 +1,87 @@
+"""
+BMS alert fan-out to N occupants: the old one-await-per-occupant loop vs
+`BMSAgent.NotifyOccupants` with concurrent batches and with the occupants' group
+address, all over the in-memory transport. Reports alert-to-recipient latency.
+
+    python benchmarks/bench_broadcast.py
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from spade.behaviour import CyclicBehaviour, OneShotBehaviour
+from spade.container import Container
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import protocol  # noqa: E402
+from Agents.BMSAgent import BMSAgent  # noqa: E402
+from Agents.SimulationAgent import SimulationAgent  # noqa: E402
+from transport import InMemoryTransport, OCCUPANTS_GROUP  # noqa: E402
+
+COUNTS = [100, 1000, 5000]
+
+
+class Listener(SimulationAgent):
+    """Stand-in occupant that records when the alert reached it."""
+
+    class Listen(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=10)
+            if msg:
+                self.agent.latency = time.time() - protocol.read(msg).sent_at
+                self.agent.received.set()
+
+    async def setup(self):
+        self.latency = None
+        self.received = asyncio.Event()
+        self.add_behaviour(self.Listen())
+
+
+class SequentialNotify(OneShotBehaviour):
+    """The previous NotifyOccupants: one awaited send (and print) per occupant."""
+
+    async def run(self):
+        alert_time = time.time()
+        for jid in self.agent.occupant_jids:
+            await self.send(protocol.make_message(jid, protocol.EVACUATION_ALERT, "Fire", None, alert_time))
+            print(f"BMSAgent: Message sent to {jid}")
+
+
+async def run(count, mode):
+    transport = InMemoryTransport()
+    SimulationAgent.transport = transport
+    Container().reset()
+    listeners = [Listener(f"visitor{i}@localhost", "isiapassword") for i in range(count)]
+    for listener in listeners:
+        await listener.start()
+        if mode == "group":
+            transport.join(OCCUPANTS_GROUP, listener.jid)
+    bms = BMSAgent("bms@localhost", "isiapassword", count, "BMS Agent", building=None,
+                   occupant_jids=[str(listener.jid) for listener in listeners])
+    await bms.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bms.add_behaviour(SequentialNotify() if mode == "sequential" else bms.NotifyOccupants(protocol.EVACUATION_ALERT, "Fire"))
+        await asyncio.gather(*(listener.received.wait() for listener in listeners))
+    latencies = np.array([listener.latency for listener in listeners]) * 1000
+    await bms.stop()
+    for listener in listeners:
+        await listener.stop()
+    return latencies
+
+
+def main():
+    print(f"{'occupants':>9} {'mode':>10} {'p50 ms':>8} {'p99 ms':>8} {'last ms':>8}")
+    for count in COUNTS:
+        for mode in ("sequential", "batched", "group"):
+            latencies = asyncio.run(run(count, mode))
+            print(f"{count:>9} {mode:>10} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} "
+                  f"{latencies.max():>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Memory and traversal benchmark: object-graph Building vs CompactBuilding.
+
+    python benchmarks/bench_compact_building.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import Building  # noqa: E402
+from compact_building import CompactBuilding  # noqa: E402
+
+OBJECT_SIZES = [(3, 20, 20), (5, 50, 50), (10, 100, 100)]
+COMPACT_ONLY_SIZES = [(50, 200, 200)]
+
+
+def timed(function, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compact_nbytes(compact):
+    return sum(
+        array.nbytes
+        for array in (compact.room_types, compact.fire, compact.unavailable, compact.is_occupied,
+                      compact.indptr, compact.indices, compact.link_kinds)
+    )
+
+
+def main():
+    print(f"{'size':>14} {'mode':>8} {'memory MB':>10} {'exit field s':>13}")
+    for floors, rows, cols in OBJECT_SIZES:
+        tracemalloc.start()
+        building = Building(floors, rows, cols)
+        building.predecessors()
+        object_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        building.lock_doors = False
+        object_time = timed(lambda: building.build_distance_field(building.exits()))
+
+        compact = CompactBuilding.from_building(building)
+        compact.reverse_adjacency()
+        compact_time = timed(lambda: compact.build_distance_field(compact.exits()))
+        size = f"{floors}x{rows}x{cols}"
+        print(f"{size:>14} {'object':>8} {object_memory / 1e6:>10.1f} {object_time:>13.4f}")
+        print(f"{size:>14} {'compact':>8} {compact_nbytes(compact) / 1e6:>10.1f} {compact_time:>13.4f}")
+
+    for floors, rows, cols in COMPACT_ONLY_SIZES:
+        compact = CompactBuilding(floors, rows, cols)
+        compact.lock_doors = False
+        compact.reverse_adjacency()
+        compact_time = timed(lambda: compact.build_distance_field(compact.exits()), repeat=1)
+        size = f"{floors}x{rows}x{cols}"
+        print(f"{size:>14} {'compact':>8} {compact_nbytes(compact) / 1e6:>10.1f} {compact_time:>13.4f}")
+
+
+if __name__ == "__main__":
+    main()
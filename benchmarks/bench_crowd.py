@@ -0,0 +1,53 @@
+"""
+Vectorised crowd stepping (CrowdEngine) with 100k occupants: time per tick with and
+without room capacities / link throughput limits, with a fire started after 10
+simulated seconds to force a route rebuild.
+
+    python benchmarks/bench_crowd.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+from crowd import CrowdEngine  # noqa: E402
+
+SIZE = (3, 100, 100)
+OCCUPANTS = 100_000
+DT = 0.5
+MAX_TICKS = 1000
+
+
+def run(limits):
+    building = create_building(*SIZE, seed=1, compact=True)
+    crowd = CrowdEngine(building, limits=limits)
+    rng = np.random.default_rng(1)
+    crowd.add(rng.integers(0, crowd.size, OCCUPANTS), np.where(rng.random(OCCUPANTS) < 0.84, 1.0, 2.0))
+    crowd.next_edge()  # Initial table, built once before the first tick
+
+    tick_times = []
+    while crowd.remaining() and len(tick_times) < MAX_TICKS:
+        if len(tick_times) == 20:
+            building.room(int(rng.integers(crowd.size))).fires()
+        started = time.perf_counter()
+        crowd.tick(DT)
+        tick_times.append((time.perf_counter() - started) * 1000)
+    return crowd, np.array(tick_times)
+
+
+def main():
+    print(f"{OCCUPANTS} occupants, {SIZE[0]}x{SIZE[1]}x{SIZE[2]} compact building, ticks of {DT}s")
+    print(f"{'limits':>7} {'ticks':>6} {'mean ms':>8} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'evacuated':>10} {'last out s':>11}")
+    for limits in (False, True):
+        crowd, tick_times = run(limits)
+        print(f"{str(limits):>7} {len(tick_times):>6} {tick_times.mean():>8.2f} {np.percentile(tick_times, 50):>7.2f} "
+              f"{np.percentile(tick_times, 99):>7.2f} {tick_times.max():>7.2f} {int(crowd.evacuated.sum()):>10} "
+              f"{np.nanmax(crowd.finish_time):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
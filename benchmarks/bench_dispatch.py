@@ -0,0 +1,82 @@
+"""
+Responder dispatch with `dispatch.Dispatcher` for growing pools of responders and
+incidents on a 4x25x25 building:
+
+- first solve: travel-time columns (one BFS per incident room) plus the assignment;
+- re-solve: after one more incident opens and every responder moved a room;
+- total travel time of the optimal assignment vs. a greedy nearest-free-responder
+  pass over the incidents in arrival order.
+
+    python benchmarks/bench_dispatch.py
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+from dispatch import Dispatcher  # noqa: E402
+
+COUNTS = [(20, 20), (100, 100), (300, 300), (500, 300)]
+EMERGENCIES = ("Fire", "Fire", "Earthquake", "Security Threat")  # The ones handled on site
+ROLES = ("fireman", "fireman", "earthquake_responder", "cop")
+
+
+class Responder:
+    """Stand-in for an EmergencyResponderAgent: what the dispatcher reads from one."""
+
+    def __init__(self, jid, role, location):
+        self.jid = jid
+        self.role = role
+        self.pace = 0.5
+        self.location = location
+
+
+def greedy_cost(cost):
+    """Each incident, oldest first, takes the nearest responder still free."""
+    free = np.ones(cost.shape[0], dtype=bool)
+    total = 0.0
+    for j in range(cost.shape[1]):
+        column = np.where(free, cost[:, j], np.inf)
+        i = int(np.argmin(column))
+        if np.isfinite(column[i]):
+            free[i] = False
+            total += column[i]
+    return total
+
+
+def main():
+    building = create_building(4, 25, 25, seed=1)
+    rooms = list(building.rooms())
+    rng = random.Random(1)
+    print(f"{'responders':>10} {'incidents':>9} {'first solve ms':>15} {'re-solve ms':>12} {'optimal s':>10} {'greedy s':>9}")
+    for responder_count, incident_count in COUNTS:
+        responders = [Responder(f"responder{i}@localhost", ROLES[i % len(ROLES)], rng.choice(rooms))
+                      for i in range(responder_count)]
+        dispatcher = Dispatcher(building, responders)
+        for _ in range(incident_count):
+            dispatcher.open(rng.choice(EMERGENCIES), rng.choice(rooms))
+        start = time.perf_counter()
+        dispatcher.solve()
+        first = (time.perf_counter() - start) * 1000
+
+        cost = dispatcher.costs()
+        optimal = sum(cost[responders.index(responder), dispatcher.incidents.index(incident)]
+                      for responder, incident in dispatcher.assignment.items())
+        greedy = greedy_cost(cost)
+
+        dispatcher.open(rng.choice(EMERGENCIES), rng.choice(rooms))
+        for responder in responders:
+            responder.location = rng.choice(responder.location.connections or [responder.location])
+        start = time.perf_counter()
+        dispatcher.solve()
+        again = (time.perf_counter() - start) * 1000
+        print(f"{responder_count:>10} {incident_count:>9} {first:>15.1f} {again:>12.1f} {optimal:>10.1f} {greedy:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Generation benchmark for the vectorised type-grid path, the object-graph Building
+and the array-only CompactBuilding, with the resulting type distribution.
+
+    python benchmarks/bench_generation.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import Building, HALLWAY, STORE, RESTROOM  # noqa: E402
+from compact_building import CompactBuilding  # noqa: E402
+
+SIZES = [(10, 10, 10), (10, 32, 32), (20, 100, 100)]
+
+
+def timed(function, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    print(f"{'size':>12} {'types ms':>9} {'Building ms':>12} {'Compact ms':>11} {'H/S/R after repair':>20}")
+    for floors, rows, cols in SIZES:
+        generator = Building.__new__(Building)
+        generator.floors, generator.rows, generator.cols = floors, rows, cols
+        generator.rng = np.random.default_rng(0)
+        types_time, room_types = timed(generator.generate_room_types)
+        building_time, _ = timed(lambda: Building(floors, rows, cols), repeat=1)
+        compact_time, _ = timed(lambda: CompactBuilding(floors, rows, cols))
+        shares = "/".join(f"{np.mean(room_types == code):.2f}" for code in (HALLWAY, STORE, RESTROOM))
+        size = f"{floors}x{rows}x{cols}"
+        print(
+            f"{size:>12} {types_time * 1e3:>9.1f} {building_time * 1e3:>12.1f}"
+            f" {compact_time * 1e3:>11.1f} {shares:>20}"
+        )
+
+
+if __name__ == "__main__":
+    main()
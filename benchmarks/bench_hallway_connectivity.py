@@ -0,0 +1,58 @@
+"""
+Benchmark for Building.ensure_hallway_connectivity on random floors from 10x10 to 500x500.
+
+    python benchmarks/bench_hallway_connectivity.py
+"""
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import Building, HALLWAY, STORE, RESTROOM  # noqa: E402
+
+SIZES = [10, 50, 100, 200, 500]
+
+
+def random_floor(rng, rows, cols):
+    samples = rng.random((rows, cols))
+    return np.select([samples < 0.6, samples < 0.9], [HALLWAY, STORE], RESTROOM).astype(np.uint8)
+
+
+def hallway_components(floor_types):
+    rows, cols = floor_types.shape
+    unvisited = set(zip(*np.nonzero(floor_types == HALLWAY)))
+    components = 0
+    while unvisited:
+        components += 1
+        queue = deque([unvisited.pop()])
+        while queue:
+            r, c = queue.popleft()
+            for neighbour in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if neighbour in unvisited:
+                    unvisited.remove(neighbour)
+                    queue.append(neighbour)
+    return components
+
+
+def main():
+    building = Building.__new__(Building)
+    rng = np.random.default_rng(0)
+    print(f"{'floor':>9} {'components':>11} {'carved':>7} {'seconds':>9}")
+    for size in SIZES:
+        floor_types = random_floor(rng, size, size)
+        components = hallway_components(floor_types)
+        hallways = np.count_nonzero(floor_types == HALLWAY)
+        start = time.perf_counter()
+        building.ensure_hallway_connectivity(floor_types)
+        elapsed = time.perf_counter() - start
+        carved = np.count_nonzero(floor_types == HALLWAY) - hallways
+        assert hallway_components(floor_types) == 1
+        print(f"{size:>4}x{size:<4} {components:>11} {carved:>7} {elapsed:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
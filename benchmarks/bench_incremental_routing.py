@@ -0,0 +1,81 @@
+"""
+Incremental exit routing (IncrementalRouter) vs full recomputation of the exit
+distance field after every hazard event.
+
+    python benchmarks/bench_incremental_routing.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import Building  # noqa: E402
+
+SIZES = [(3, 20, 20), (5, 50, 50), (10, 60, 60)]
+EVENTS = 300
+
+
+def hazard_events(building, count, seed):
+    """Fires, earthquakes, threats, responder clean-ups and BMS lock flips, in a fixed order."""
+    rng = random.Random(seed)
+    rooms = list(building.rooms())
+    events = []
+    for _ in range(count):
+        roll = rng.random()
+        room = rng.choice(rooms)
+        if roll < 0.45:
+            events.append((room, "fire", True))
+        elif roll < 0.7:
+            events.append((room, "unavailable", True))
+        elif roll < 0.95:
+            events.append((room, "fire", False))
+        else:
+            events.append((None, "lock_elevators", rng.random() < 0.5))
+    return events
+
+
+def apply(building, event):
+    room, flag, value = event
+    setattr(room if room is not None else building, flag, value)
+
+
+def reset(building):
+    for room in building.rooms():
+        room.fire = False
+        room.unavailable = False
+    building.lock_elevators = False
+
+
+def run(building, events, incremental):
+    reset(building)
+    probe = random.Random(2).sample(list(building.rooms()), 200)  # Rooms holding an agent
+    if incremental:
+        building.exit_router().distance(probe[0])
+    start = time.perf_counter()
+    for event in events:
+        apply(building, event)
+        if incremental:
+            distances = [building.exit_distance(room) for room in probe]
+        else:
+            field = building.exit_distance_field()
+            distances = [field.distance(room) for room in probe]
+    return time.perf_counter() - start, distances
+
+
+def main():
+    print(f"{'size':>10} {'events':>7} {'full s':>9} {'incremental s':>14} {'speed-up':>9}")
+    for size in SIZES:
+        building = Building(*size)
+        building.lock_doors = False
+        events = hazard_events(building, EVENTS, seed=1)
+        full_time, full = run(building, events, incremental=False)
+        incremental_time, incremental = run(building, events, incremental=True)
+        assert full == incremental
+        label = "x".join(map(str, size))
+        print(f"{label:>10} {EVENTS:>7} {full_time:>9.3f} {incremental_time:>14.3f} {full_time / incremental_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Frame time and CPU use of `PygameInterface` on a 100x100 floor with 2000 occupants,
+5% of them moving and one room catching fire per frame: the previous full redraw
+(fill, every room with its label re-rendered, sidebar, `display.flip`) vs. cached
+floor surfaces with dirty-cell updates, both drawing from `viewer.Snapshot`s. CPU is measured while `run`-style frames are
+capped at `interface.FPS`. Uses SDL's dummy video driver, so no window opens.
+
+    python benchmarks/bench_interface.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame  # noqa: E402
+
+import interface  # noqa: E402
+from building import create_building  # noqa: E402
+from viewer import SnapshotPublisher  # noqa: E402
+
+FLOORS, ROWS, COLS = 2, 100, 100
+OCCUPANTS = 2000
+MOVING = 0.05  # Share of the occupants stepping into a neighbouring room every frame
+FRAMES = 200
+CAPPED_SECONDS = 3.0
+
+
+class Occupant:
+    type = "Occupant"
+
+    def __init__(self, building, room):
+        self.building = building
+        self.location = None
+        self.move(room)
+
+    def move(self, room):
+        self.building.occupancy.move(self, self.location, room)
+        self.location = room
+
+
+class FullRedrawInterface(interface.PygameInterface):
+    """The previous renderer: every frame redraws and re-labels every room, then flips."""
+
+    def update(self, snapshot):
+        floor = self.current_floor
+        self.screen.fill(interface.COLORS["background"])
+        room_types = self.layout.room_types[floor]
+        for cell in interface.cells(room_types != ""):
+            rect = self.cell_rect(cell)
+            color = (interface.COLORS["fire"] if snapshot.fire[floor][cell] else
+                     interface.COLORS["occupied"] if cell in snapshot.cells[floor] else
+                     interface.ROOM_COLORS[str(room_types[cell])])
+            pygame.draw.rect(self.screen, color, rect)
+            pygame.draw.rect(self.screen, (0, 0, 0), rect, 1)
+            text_surface = self.font.render(str(room_types[cell]), True, interface.COLORS["text"])
+            self.screen.blit(text_surface, (rect.x + self.cell // 4, rect.y + self.cell // 4))
+        for (row, col), (occupants, responders) in snapshot.cells[floor].items():
+            for index in range(occupants + responders):
+                pygame.draw.circle(self.screen, interface.COLORS["agent_occupant"],
+                                   (col * self.cell + self.cell // 2 + (index % 3 - 1) * self.cell // 6,
+                                    row * self.cell + self.cell // 2 + (index // 3 - 1) * self.cell // 6),
+                                   max(1, self.cell // 8))
+        sidebar_rect = pygame.Rect(interface.WINDOW_WIDTH - interface.SIDEBAR_WIDTH, 0, interface.SIDEBAR_WIDTH,
+                                   interface.WINDOW_HEIGHT)
+        pygame.draw.rect(self.screen, interface.COLORS["sidebar"], sidebar_rect)
+        for i in range(self.layout.floors):
+            text_surface = self.font.render(f"Floor {i} ({snapshot.floor_counts[i]})", True, interface.COLORS["text"])
+            self.screen.blit(text_surface, (sidebar_rect.x + 30, 25 + i * 50))
+        pygame.display.flip()
+
+
+def scenario():
+    building = create_building(FLOORS, ROWS, COLS, seed=1)
+    rng = random.Random(1)
+    rooms = [room for room in building.rooms() if room.floor == 0]
+    occupants = [Occupant(building, room) for room in rng.sample(rooms, OCCUPANTS)]
+    return building, occupants, rooms, rng
+
+
+def step(occupants, rooms, rng):
+    for occupant in rng.sample(occupants, int(len(occupants) * MOVING)):
+        neighbours = occupant.location.connections
+        if neighbours:
+            occupant.move(rng.choice(neighbours))
+    rng.choice(rooms).fire = True
+
+
+async def measure(renderer):
+    # Snapshots read the simulation clock, which lives on a running event loop
+    building, occupants, rooms, rng = scenario()
+    publisher = SnapshotPublisher(building)
+    view = renderer(publisher.layout)
+    view.update(publisher.snapshot())  # First frame: builds the floor surface
+    times = []
+    for _ in range(FRAMES):
+        step(occupants, rooms, rng)
+        snapshot = publisher.snapshot()
+        start = time.perf_counter()
+        view.update(snapshot)
+        times.append((time.perf_counter() - start) * 1000)
+    clock = pygame.time.Clock()
+    frames, cpu, wall = 0, time.process_time(), time.perf_counter()
+    while time.perf_counter() - wall < CAPPED_SECONDS:
+        pygame.event.pump()
+        step(occupants, rooms, rng)
+        view.update(publisher.snapshot())
+        clock.tick(interface.FPS)
+        frames += 1
+    wall = time.perf_counter() - wall
+    cpu = (time.process_time() - cpu) / wall * 100
+    pygame.quit()
+    return np.array(times), frames / wall, cpu
+
+
+def main():
+    print(f"{ROWS}x{COLS} floor, {OCCUPANTS} occupants, {interface.FPS} FPS cap")
+    print(f"{'renderer':>12} {'frame p50 ms':>13} {'frame p95 ms':>13} {'capped FPS':>11} {'CPU %':>6}")
+    for name, renderer in (("full redraw", FullRedrawInterface), ("dirty cells", interface.PygameInterface)):
+        times, fps, cpu = asyncio.run(measure(renderer))
+        print(f"{name:>12} {np.percentile(times, 50):>13.2f} {np.percentile(times, 95):>13.2f} {fps:>11.1f} {cpu:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
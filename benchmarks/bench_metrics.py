@@ -0,0 +1,71 @@
+"""
+Cost of `metrics.Histogram`, with a million latency-like observations: time per
+`observe`, memory, percentile read and JSON/Prometheus export, against keeping every
+value in a list and sorting it for percentiles. Also reports the percentile error
+of the fixed buckets.
+
+    python benchmarks/bench_metrics.py
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry  # noqa: E402
+
+OBSERVATIONS = 1_000_000
+
+
+def main():
+    values = np.random.default_rng(1).lognormal(mean=-6, sigma=1.5, size=OBSERVATIONS).tolist()  # Seconds, ~2.5 ms median
+    registry = MetricsRegistry()
+
+    histogram = registry.histogram("latency_seconds", "Benchmark latencies.")
+    start = time.perf_counter()
+    for value in values:
+        histogram.observe(value)
+    observe = (time.perf_counter() - start) / OBSERVATIONS * 1e9
+    stored = []
+    start = time.perf_counter()
+    for value in values:
+        stored.append(value)
+    append = (time.perf_counter() - start) / OBSERVATIONS * 1e9
+
+    # Memory in a second pass, tracemalloc slows every allocation down
+    tracemalloc.start()
+    MetricsRegistry().histogram("latency_seconds").observe(values[0])
+    histogram_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    tracemalloc.start()
+    list(values)
+    list_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    estimates = [histogram.percentile(q) for q in (50, 90, 99)]
+    histogram_read = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    exact = np.percentile(stored, (50, 90, 99))
+    list_read = (time.perf_counter() - start) * 1000
+
+    print(f"{OBSERVATIONS} observations")
+    print(f"{'storage':>10} {'update ns':>10} {'memory KB':>10} {'p50/p90/p99 ms':>15}")
+    print(f"{'histogram':>10} {observe:>10.0f} {histogram_memory / 1024:>10.1f} {histogram_read:>15.3f}")
+    print(f"{'list':>10} {append:>10.0f} {list_memory / 1024:>10.1f} {list_read:>15.3f}")
+    errors = ", ".join(f"p{q} {abs(e / x - 1) * 100:.1f}%" for q, e, x in zip((50, 90, 99), estimates, exact))
+    print(f"percentile error: {errors}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("metrics.json", "metrics.prom"):
+            start = time.perf_counter()
+            registry.export(os.path.join(directory, name))
+            print(f"export {name}: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
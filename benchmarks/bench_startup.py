@@ -0,0 +1,46 @@
+"""
+Startup-time regression check: `python -c "import main"` must be quick and silent,
+i.e. importing the package must not generate a building or print anything.
+
+    python benchmarks/bench_startup.py [--runs 10] [--max-seconds 2.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {module}"], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return time.perf_counter() - start, result.stdout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float, default=2.0, help="Fail if the median exceeds this.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in ("building", "main"):
+        timings, outputs = zip(*(import_time(module) for _ in range(args.runs)))
+        median = statistics.median(timings)
+        print(f"import {module:<9} median {median * 1e3:7.1f} ms   min {min(timings) * 1e3:7.1f} ms")
+        if any(outputs):
+            print(f"  FAIL: importing {module} printed output:\n{outputs[0]}")
+            failed = True
+        if median > args.max_seconds:
+            print(f"  FAIL: median above {args.max_seconds:.2f} s")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Size and cost of `tracing` traces: 1000 agents on a 2x50x50 building for one
+simulated hour (virtual clock), half of them stepping into a neighbouring room every
+second and a room catching fire every 10 s. Reports the trace size, compressed and
+not, against a plain per-second dump of every position, the recording overhead per
+event, and the latency of opening the trace and of seeking to random times.
+
+    python benchmarks/bench_trace.py
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+from clock import run_virtual  # noqa: E402
+from tracing import TraceReader, TraceRecorder  # noqa: E402
+
+FLOORS, ROWS, COLS = 2, 50, 50
+AGENTS = 1000
+MOVING = 0.5
+HOURS = 1
+SEEKS = 200
+
+
+class Occupant:
+    type = "Occupant"
+
+    def __init__(self, building, number, room):
+        self.jid = f"occupant{number}@localhost"
+        self.building = building
+        self.location = None
+        self.move(room)
+
+    def move(self, room):
+        self.building.occupancy.move(self, self.location, room)
+        self.location = room
+
+
+async def simulate(path, compress):
+    building = create_building(FLOORS, ROWS, COLS, seed=1)
+    building.clock.start()
+    rng = random.Random(1)
+    rooms = list(building.rooms())
+    agents = [Occupant(building, i, room) for i, room in enumerate(rng.sample(rooms, AGENTS))]
+    recorder = TraceRecorder(building, path, compress=compress) if path else None
+    moves, start = 0, time.process_time()
+    for second in range(HOURS * 3600):
+        for agent in rng.sample(agents, int(AGENTS * MOVING)):
+            neighbours = agent.location.connections
+            if neighbours:
+                agent.move(rng.choice(neighbours))
+                moves += 1
+        if second % 10 == 0:
+            room = rng.choice(rooms)
+            room.fire = not room.fire
+        await asyncio.sleep(1)
+    if recorder is not None:
+        recorder.close()
+    return time.process_time() - start, moves
+
+
+def main():
+    print(f"{AGENTS} agents, {FLOORS}x{ROWS}x{COLS} building, {HOURS} simulated hour(s)")
+    with tempfile.TemporaryDirectory() as directory:
+        baseline, moves = run_virtual(simulate(None, False))
+        dump = AGENTS * HOURS * 3600 * 8  # Agent id and cell, 4 bytes each, every agent every second
+        print(f"{moves} moves; per-second position dump: {dump / 1e6:.1f} MB")
+        print(f"{'trace':>12} {'size MB':>8} {'bytes/event':>12} {'record us/event':>16}")
+        paths = {}
+        for name, compress in (("raw", False), ("compressed", True)):
+            paths[name] = os.path.join(directory, f"{name}.trace")
+            cpu, _ = run_virtual(simulate(paths[name], compress))
+            size = os.path.getsize(paths[name])
+            print(f"{name:>12} {size / 1e6:>8.2f} {size / moves:>12.2f} {(cpu - baseline) / moves * 1e6:>16.2f}")
+
+        start = time.perf_counter()
+        trace = TraceReader(paths["compressed"])
+        opened = (time.perf_counter() - start) * 1000
+        rng = random.Random(2)
+        seeks = []
+        for _ in range(SEEKS):
+            trace.cached = None  # Every seek lands in a chunk that is not decoded yet
+            start = time.perf_counter()
+            trace.snapshot(rng.uniform(trace.start, trace.end))
+            seeks.append((time.perf_counter() - start) * 1000)
+        trace.close()
+        print(f"open: {opened:.1f} ms for {len(trace.chunks)} chunks; seek + snapshot: "
+              f"p50 {np.percentile(seeks, 50):.2f} ms, p99 {np.percentile(seeks, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
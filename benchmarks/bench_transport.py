@@ -0,0 +1,127 @@
+"""
+Message round-trip latency and one-way throughput between two agents, over the
+in-memory transport, over SPADE's in-process container delivery and, with --xmpp
+and a server on localhost (e.g. `spade run`), over XMPP.
+
+    python benchmarks/bench_transport.py [--xmpp]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+from spade.behaviour import CyclicBehaviour, OneShotBehaviour
+from spade.container import Container
+from spade.message import Message
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agents.SimulationAgent import SimulationAgent  # noqa: E402
+from transport import InMemoryTransport  # noqa: E402
+
+ROUND_TRIPS = 2000
+BURST = 20000
+
+
+class ContainerTransport(InMemoryTransport):
+    """No XMPP login, but messages take SPADE's container path (`Agent.dispatch`)."""
+
+    async def send(self, msg, behaviour=None):
+        await Container().send(msg, behaviour)
+
+
+class EchoAgent(SimulationAgent):
+    class Echo(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=10)
+            if msg and msg.body == "ping":
+                await self.send(Message(to=str(msg.sender), body="pong"))
+            elif msg:
+                self.agent.received += 1
+                if self.agent.received == BURST:
+                    self.agent.done.set()
+
+    async def setup(self):
+        self.received = 0
+        self.done = asyncio.Event()
+        self.add_behaviour(self.Echo())
+
+
+class DriverAgent(SimulationAgent):
+    class Drive(OneShotBehaviour):
+        async def run(self):
+            agent = self.agent
+            for _ in range(ROUND_TRIPS):
+                started = time.perf_counter()
+                await self.send(Message(to=agent.peer, body="ping"))
+                if await self.receive(timeout=10) is None:
+                    agent.burst_time = None  # Nothing came back: give up on this transport
+                    return
+                agent.round_trips.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            for i in range(BURST):
+                await self.send(Message(to=agent.peer, body="data"))
+                if i % 100 == 0:
+                    await asyncio.sleep(0)  # Let the receiver drain, as real senders do
+            try:
+                await asyncio.wait_for(agent.echo.done.wait(), timeout=60)
+            except asyncio.TimeoutError:
+                agent.burst_time = None
+                return
+            agent.burst_time = time.perf_counter() - started
+
+    async def setup(self):
+        self.round_trips = []
+        self.add_behaviour(self.Drive())
+
+
+async def run(transport, server):
+    SimulationAgent.transport = transport
+    Container().reset()
+    echo = EchoAgent(f"echo@{server}", "isiapassword")
+    driver = DriverAgent(f"driver@{server}", "isiapassword")
+    driver.peer, driver.echo = str(echo.jid), echo
+    await echo.start()
+    if transport is None:
+        # Out of the container, so messages really go through the XMPP server
+        Container().unregister(echo.jid)
+        Container().unregister(driver.jid)
+    await driver.start()
+    while driver.is_alive() and not hasattr(driver, "burst_time"):
+        await asyncio.sleep(0.1)
+    await driver.stop()
+    await echo.stop()
+    if driver.burst_time is None:
+        return None
+    return np.array(driver.round_trips) * 1e6, BURST / driver.burst_time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xmpp", action="store_true", help="Also measure the XMPP path (needs a server).")
+    parser.add_argument("--server", default="localhost")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    modes = [("in-memory", InMemoryTransport()), ("spade container", ContainerTransport())]
+    if args.xmpp:
+        modes.append(("xmpp", None))
+    print(f"{ROUND_TRIPS} round trips, then a burst of {BURST} one-way messages")
+    print(f"{'transport':>16} {'rtt p50 us':>11} {'rtt p99 us':>11} {'msgs/s':>10}")
+    for name, transport in modes:
+        result = asyncio.run(run(transport, args.server))
+        if result is None:
+            print(f"{name:>16} messages were not delivered")
+            continue
+        latencies, throughput = result
+        print(f"{name:>16} {np.percentile(latencies, 50):>11.1f} {np.percentile(latencies, 99):>11.1f} {throughput:>10.0f}")
+    if not args.xmpp:
+        print("xmpp: skipped, run with --xmpp against a server to compare.")
+
+
+if __name__ == "__main__":
+    main()
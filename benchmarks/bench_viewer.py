@@ -0,0 +1,115 @@
+"""
+Event-loop lag of a real-time simulation with no interface, with `PygameInterface`
+drawing on the agents' event loop (the previous set-up) and with `viewer.Viewer`
+drawing in its own process. The building is 2x100x100 with 2000 occupants, 5% of
+them moving every 50 ms; lag is how late a 5 ms `asyncio.sleep` wakes up, i.e. how
+long a ready agent can wait for the loop. Uses SDL's dummy video driver, so no
+window opens.
+
+    python benchmarks/bench_viewer.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Inherited by the viewer process
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+from viewer import FPS, SnapshotPublisher, Viewer  # noqa: E402
+
+FLOORS, ROWS, COLS = 2, 100, 100
+OCCUPANTS = 2000
+MOVING = 0.05
+STEP = 0.05  # Seconds between occupant moves
+PROBE = 0.005  # Sleep of the lag probe
+SECONDS = 5.0
+
+
+class Occupant:
+    type = "Occupant"
+
+    def __init__(self, building, room):
+        self.building = building
+        self.location = None
+        self.move(room)
+
+    def move(self, room):
+        self.building.occupancy.move(self, self.location, room)
+        self.location = room
+
+
+async def simulate(occupants, rooms, rng):
+    while True:
+        for occupant in rng.sample(occupants, int(len(occupants) * MOVING)):
+            neighbours = occupant.location.connections
+            if neighbours:
+                occupant.move(rng.choice(neighbours))
+        rng.choice(rooms).fire = True
+        await asyncio.sleep(STEP)
+
+
+async def draw_in_loop(building):
+    """The previous set-up: the renderer shares the agents' event loop."""
+    import pygame
+
+    from interface import PygameInterface
+
+    publisher = SnapshotPublisher(building)
+    view = PygameInterface(publisher.layout)
+    try:
+        while True:
+            pygame.event.pump()
+            view.update(publisher.snapshot())
+            await asyncio.sleep(1 / FPS)
+    finally:
+        pygame.quit()
+
+
+async def measure(mode):
+    building = create_building(FLOORS, ROWS, COLS, seed=1)
+    building.clock.start()
+    rng = random.Random(1)
+    rooms = [room for room in building.rooms() if room.floor == 0]
+    occupants = [Occupant(building, room) for room in rng.sample(rooms, OCCUPANTS)]
+    tasks = [asyncio.ensure_future(simulate(occupants, rooms, rng))]
+    viewer = None
+    if mode == "in-loop renderer":
+        tasks.append(asyncio.ensure_future(draw_in_loop(building)))
+    elif mode == "viewer process":
+        viewer = Viewer(building)
+        viewer.start()
+        await asyncio.sleep(2)  # Lets the viewer process import pygame and open its window
+    lags = []
+    cpu, end = time.process_time(), time.perf_counter() + SECONDS
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE)
+        lags.append((time.perf_counter() - start - PROBE) * 1000)
+    cpu = (time.process_time() - cpu) / SECONDS * 100
+    if viewer is not None:
+        viewer.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    frames = (viewer.published, viewer.dropped) if viewer is not None else None
+    return np.array(lags), cpu, frames
+
+
+def main():
+    print(f"{FLOORS}x{ROWS}x{COLS} building, {OCCUPANTS} occupants, {FPS} snapshots/s, {SECONDS:.0f} s per mode")
+    print(f"{'mode':>17} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11} {'loop CPU %':>11} {'frames sent/dropped':>20}")
+    for mode in ("no interface", "in-loop renderer", "viewer process"):
+        lags, cpu, frames = asyncio.run(measure(mode))
+        frames = f"{frames[0]}/{frames[1]}" if frames else "-"
+        print(f"{mode:>17} {np.percentile(lags, 50):>11.2f} {np.percentile(lags, 99):>11.2f} {lags.max():>11.2f} "
+              f"{cpu:>11.1f} {frames:>20}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Event-loop wakeups of idle agents and how fast they react, over the in-memory transport:
+
+- idle: N occupants, the BMS and two responders with no emergency for a few
+  wall-clock seconds; loop iterations and CPU time spent doing nothing.
+- alert: emergency report to the BMS until every occupant has its evacuation alert.
+- rescue: an occupant trapped by fire in every neighbouring room; simulated seconds
+  between the fire being put out and the occupant starting to move (virtual clock).
+
+    python benchmarks/bench_wakeups.py
+"""
+import asyncio
+import contextlib
+import io
+import os
+import selectors
+import sys
+import time
+
+from spade.container import Container
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import protocol  # noqa: E402
+from Agents.BMSAgent import BMSAgent  # noqa: E402
+from Agents.EmergencyResponderAgent import EmergencyResponderAgent  # noqa: E402
+from Agents.OccupantAgent import OccupantAgent  # noqa: E402
+from Agents.SimulationAgent import SimulationAgent  # noqa: E402
+from building import create_building, EXIT_TYPES  # noqa: E402
+from clock import run_virtual  # noqa: E402
+from transport import InMemoryTransport  # noqa: E402
+
+COUNTS = [100, 1000]
+IDLE_SECONDS = 3.0
+CLEARED_AFTER = 5.0  # Simulated seconds the rescue occupant stays trapped
+
+
+class CountingSelector(selectors.DefaultSelector):
+    """Counts the event loop's iterations (one select per iteration)."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def select(self, timeout=None):
+        self.calls += 1
+        return super().select(timeout)
+
+
+async def start_agents(count):
+    SimulationAgent.transport = InMemoryTransport()
+    Container().reset()
+    building = create_building(4, 25, 25, seed=1)
+    building.clock.start()
+    occupants = [OccupantAgent(f"occupant{i}@localhost", "isiapassword", f"Agent {i}", "functional", building)
+                 for i in range(1, count + 1)]
+    bms = BMSAgent("bms@localhost", "isiapassword", count, "BMS Agent", building,
+                   occupant_jids=[str(agent.jid) for agent in occupants])
+    responders = [EmergencyResponderAgent(f"{role}@localhost", "isiapassword", role, building) for role in ("cop", "fireman")]
+    agents = occupants + [bms] + responders
+    for agent in agents:
+        await agent.start()
+    return building, occupants, agents
+
+
+async def idle_and_alert(count, selector):
+    with contextlib.redirect_stdout(io.StringIO()):
+        building, occupants, agents = await start_agents(count)
+        await asyncio.sleep(0.5)  # Let every behaviour reach its first wait
+        calls, cpu, wall = selector.calls, time.process_time(), time.perf_counter()
+        await asyncio.sleep(IDLE_SECONDS)
+        wall = time.perf_counter() - wall
+        idle = ((selector.calls - calls) / wall, (time.process_time() - cpu) / wall * 100)
+
+        sent_at = time.time()
+        report = protocol.make_message("bms@localhost", protocol.EMERGENCY_REPORT, "Gas Leak", None, sent_at)
+        await SimulationAgent.transport.send(report)
+        while any(agent.alert_latency is None for agent in occupants):
+            await asyncio.sleep(0.001)
+        reached = sorted(agent.alert_latency * 1000 for agent in occupants)  # From the BMS alert
+        reaction = (time.time() - sent_at) * 1000
+        for agent in agents:
+            await agent.stop()
+    return idle, reaction, reached[len(reached) // 2]
+
+
+def run_idle_and_alert(count):
+    selector = CountingSelector()
+    loop = asyncio.SelectorEventLoop(selector)
+    try:
+        return loop.run_until_complete(idle_and_alert(count, selector))
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+
+async def rescue():
+    with contextlib.redirect_stdout(io.StringIO()):
+        building, (occupant,), agents = await start_agents(1)
+        room = next(room for room in building.rooms()
+                    if room.room_type not in EXIT_TYPES and room.connections and not building.occupancy.agents_in_room(room))
+        occupant.location = room
+        around = {linked for links in (room.connections, room.staircases, room.emergency_staircases, room.elevators)
+                  for linked in links}
+        for linked in around:
+            linked.fire = True
+        await SimulationAgent.transport.send(protocol.make_message(occupant.jid, protocol.EVACUATION_ALERT, "Fire"))
+        await asyncio.sleep(CLEARED_AFTER)
+        cleared_at = building.clock.now()
+        for linked in around:
+            linked.fire = False
+        while occupant.location is room:
+            await asyncio.sleep(0.01)
+        moved_after = building.clock.now() - cleared_at
+        for agent in agents:
+            await agent.stop()
+    return moved_after
+
+
+def main():
+    print(f"{'occupants':>9} {'idle wakeups/s':>15} {'idle CPU %':>11} {'report->all alerted ms':>23} {'BMS->occupant p50 ms':>21}")
+    for count in COUNTS:
+        (wakeups, cpu), reaction, median = run_idle_and_alert(count)
+        print(f"{count:>9} {wakeups:>15.0f} {cpu:>11.1f} {reaction:>23.2f} {median:>21.2f}")
+    print(f"trapped occupant moves {run_virtual(rescue()):.2f} simulated s after the fire is put out")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Reproducible benchmark suite: building construction at three sizes, hallway
+repair, one occupant routing step, fire spread, the free-room query, the BMS alert
+fan-out and a whole headless evacuation, all with fixed seeds. `--scale` multiplies
+the rows, columns and agent counts. `run` writes the timings to a JSON file,
+`compare` checks a run against a baseline and fails on regressions: a case whose
+best time grew by more than `--threshold` and is slower than every baseline run,
+so that a slow-down within the baseline's own run-to-run spread is reported as
+noise rather than failing the check.
+
+    python benchmarks/suite.py run --output baseline.json
+    python benchmarks/suite.py run --output current.json
+    python benchmarks/suite.py compare baseline.json current.json --threshold 0.1
+
+Timings only compare on the same machine and scale; `compare` refuses mixed scales.
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+from spade.container import Container
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as simulation  # noqa: E402
+from Agents.BMSAgent import BMSAgent  # noqa: E402
+from Agents.EmergencyAgent import EmergencyAgent  # noqa: E402
+from Agents.OccupantAgent import OccupantAgent  # noqa: E402
+from Agents.SimulationAgent import SimulationAgent  # noqa: E402
+from bench_broadcast import Listener  # noqa: E402
+from bench_hallway_connectivity import random_floor  # noqa: E402
+from building import Building, create_building  # noqa: E402
+from clock import run_virtual  # noqa: E402
+import protocol  # noqa: E402
+from transport import InMemoryTransport, OCCUPANTS_GROUP  # noqa: E402
+
+SEED = 1
+BUILDING_SIZES = {"small": (3, 10, 10), "medium": (4, 30, 30), "large": (4, 60, 60)}
+SPREAD_PROBABILITY = 0.7  # The default 5% dies out after a few rooms
+REPEAT = 5
+THRESHOLD = 0.10
+
+CASES = {}  # name -> setup(scale), returning (params, repetition); a repetition returns its timed seconds
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def scaled(value, scale):
+    return max(1, round(value * scale))
+
+
+def building_size(name, scale):
+    floors, rows, cols = BUILDING_SIZES[name]
+    return floors, scaled(rows, scale), scaled(cols, scale)
+
+
+def construction(size_name):
+    def setup(scale):
+        size = building_size(size_name, scale)
+
+        def repetition():
+            start = time.perf_counter()
+            create_building(*size, seed=SEED)
+            return time.perf_counter() - start
+        return {"size": size, "operations": 1}, repetition
+    return setup
+
+
+for size_name in BUILDING_SIZES:
+    case(f"building_construction_{size_name}")(construction(size_name))
+
+
+@case("hallway_connectivity")
+def hallway_connectivity(scale):
+    side = scaled(200, scale)
+    floor = random_floor(np.random.default_rng(SEED), side, side)
+    building = Building.__new__(Building)
+
+    def repetition():
+        floor_types = floor.copy()
+        start = time.perf_counter()
+        building.ensure_hallway_connectivity(floor_types)
+        return time.perf_counter() - start
+    return {"size": (side, side), "operations": 1}, repetition
+
+
+@case("occupant_step")
+def occupant_step(scale):
+    """`go_to_next_room` of every occupant, round after round, on a fresh building each time."""
+    size, occupants, rounds = building_size("medium", scale), scaled(500, scale), 20
+
+    async def steps():
+        building = create_building(*size, seed=SEED)
+        building.clock.start()
+        building.random.seed(SEED)
+        behaviours = []
+        for i in range(occupants):
+            agent = OccupantAgent(f"occupant{i}@localhost", "isiapassword", f"Agent {i}", "functional", building)
+            behaviour = agent.MessageHandlingBehaviour()
+            behaviour.set_agent(agent)
+            behaviours.append(behaviour)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for behaviour in behaviours:
+                behaviour.go_to_next_room()
+        return time.perf_counter() - start
+
+    def repetition():
+        return asyncio.run(steps())
+    return {"size": size, "occupants": occupants, "operations": occupants * rounds}, repetition
+
+
+@case("fire_spread")
+def fire_spread(scale):
+    """
+    Three fires spreading for 10 simulated minutes, one `advance` per second, with a
+    spread probability high enough (SPREAD_PROBABILITY) for them to reach most rooms.
+    """
+    size, seconds = building_size("medium", scale), 600
+
+    def repetition():
+        building = create_building(*size, seed=SEED)
+        building.fire_spread.spread_probability = SPREAD_PROBABILITY
+        rng = random.Random(SEED)
+        start = time.perf_counter()
+        for room in rng.sample(list(building.rooms()), 3):
+            room.fires()
+        for second in range(1, seconds + 1):
+            building.fire_spread.advance(second)
+        return time.perf_counter() - start
+    return {"size": size, "operations": seconds}, repetition
+
+
+@case("unoccupied_rooms")
+def unoccupied_rooms(scale):
+    """EmergencyAgent.get_unoccupied_rooms for hallways, with a room in ten occupied."""
+    size, queries = building_size("medium", scale), 100
+
+    def repetition():
+        building = create_building(*size, seed=SEED)
+        building.random.seed(SEED)
+        rooms = list(building.rooms())
+        for i, room in enumerate(random.Random(SEED).sample(rooms, len(rooms) // 10)):
+            building.occupancy.move(f"agent{i}", None, room)
+        agent = EmergencyAgent("emergency@localhost", "isiapassword", building, None, SEED)
+        start = time.perf_counter()
+        for _ in range(queries):
+            agent.get_unoccupied_rooms("H")
+        return time.perf_counter() - start
+    return {"size": size, "operations": queries}, repetition
+
+
+@case("notify_fanout")
+def notify_fanout(scale):
+    """BMSAgent.NotifyOccupants to the occupants' group, until every occupant has the alert."""
+    count = scaled(1000, scale)
+
+    async def fanout():
+        transport = SimulationAgent.transport = InMemoryTransport()
+        Container().reset()
+        listeners = [Listener(f"visitor{i}@localhost", "isiapassword") for i in range(count)]
+        for listener in listeners:
+            await listener.start()
+            transport.join(OCCUPANTS_GROUP, listener.jid)
+        bms = BMSAgent("bms@localhost", "isiapassword", count, "BMS Agent", building=None,
+                       occupant_jids=[str(listener.jid) for listener in listeners])
+        with contextlib.redirect_stdout(io.StringIO()):
+            await bms.start()
+            start = time.perf_counter()
+            bms.add_behaviour(bms.NotifyOccupants(protocol.EVACUATION_ALERT, "Fire"))
+            await asyncio.gather(*(listener.received.wait() for listener in listeners))
+            elapsed = time.perf_counter() - start
+            await bms.stop()
+            for listener in listeners:
+                await listener.stop()
+        return elapsed
+
+    def repetition():
+        return asyncio.run(fanout())
+    return {"occupants": count, "operations": count}, repetition
+
+
+@case("headless_evacuation")
+def headless_evacuation(scale):
+    """A whole `main.main` headless run on the virtual clock."""
+    size, occupants = building_size("medium", scale), scaled(100, scale)
+
+    def repetition():
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run_virtual(simulation.main(*size, seed=SEED, headless=True, num_occupants=occupants))
+            return time.perf_counter() - start
+    return {"size": size, "occupants": occupants, "operations": 1}, repetition
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scale=1.0, repeat=REPEAT, only=None):
+    """Runs the cases (those whose name contains `only`), one untimed warm-up and `repeat` timed runs each."""
+    results = {}
+    print(f"{'case':>32} {'best s':>9} {'median s':>9} {'us/op':>10}")
+    for name, setup in CASES.items():
+        if only and only not in name:
+            continue
+        params, repetition = setup(scale)
+        repetition()
+        seconds = []
+        for _ in range(repeat):
+            gc.collect()  # Garbage of the previous repetition is not collected on this one's clock
+            seconds.append(repetition())
+        best = min(seconds)
+        results[name] = {"params": params, "seconds": seconds, "min": best, "median": statistics.median(seconds)}
+        print(f"{name:>32} {best:>9.4f} {results[name]['median']:>9.4f} {best / params['operations'] * 1e6:>10.2f}")
+    return {
+        "meta": {"scale": scale, "repeat": repeat, "seed": SEED, "commit": git_commit(),
+                 "python": platform.python_version(), "numpy": np.__version__, "machine": platform.platform(),
+                 "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """Prints each case's change in best time; returns the names of the cases that regressed."""
+    if baseline["meta"]["scale"] != current["meta"]["scale"]:
+        raise ValueError(f"Scales differ: baseline {baseline['meta']['scale']}, current {current['meta']['scale']}.")
+    regressions = []
+    print(f"{'case':>32} {'baseline s':>11} {'current s':>10} {'change':>8}")
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        before, after = baseline["results"].get(name), current["results"].get(name)
+        if before is None or after is None:
+            print(f"{name:>32} {'only in ' + ('current' if before is None else 'baseline'):>31}")
+            continue
+        change = after["min"] / before["min"] - 1
+        verdict = "faster" if change < -threshold else ""
+        if change > threshold:
+            verdict = "REGRESSION" if after["min"] > max(before["seconds"]) else "noise"
+        if verdict == "REGRESSION":
+            regressions.append(name)
+        print(f"{name:>32} {before['min']:>11.4f} {after['min']:>10.4f} {change:>+8.1%} {verdict}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark suite of the evacuation simulation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Time every case and write the results as JSON.")
+    run.add_argument("--output", required=True)
+    run.add_argument("--scale", type=float, default=1.0, help="Multiplies the rows, columns and agent counts.")
+    run.add_argument("--repeat", type=int, default=REPEAT)
+    run.add_argument("--only", default=None, help="Only the cases whose name contains this.")
+    check = commands.add_parser("compare", help="Compare a run with a baseline; exit status 1 on regressions.")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed slow-down, 0.1 = 10%%.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "run":
+        results = run_suite(args.scale, args.repeat, args.only)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,78 @@
+import asyncio
 import random
 from collections import deque
 
+import numpy as np
+
+from clock import SimulationClock
+from fire_spread import FireSpread
+from routing import IncrementalRouter
+
+EXIT_TYPES = ("N", "E")
+ROOM_TYPES = ("H", "S", "R", "N", "E")  # Position in the tuple is the compact type code
+LINK_KINDS = ("connection", "staircase", "emergency_staircase", "elevator")
+HALLWAY, STORE, RESTROOM, NORMAL_EXIT, EMERGENCY_EXIT = range(len(ROOM_TYPES))
 
 class Room:
-    def __init__(self, room_type, row, col, floor):
+    def __init__(self, room_type, row, col, floor, building=None):
         self.room_type = room_type  # H (Hallway), S (Store), R (Restroom)
         self.row = row
         self.col = col
         self.floor = floor
+        self.building = building  # Notified through `room_changed` when a hazard flag flips
         self.connections = []  # Rooms that agents can travel through from this one
         self.elevators = []  # Elevator connections to other floors
         self.staircases = [] # Staircase connections to other floors
         self.emergency_staircases = []
-        self.fire = False
-        self.unavailable = False #for earthquakes or security threath, for example
+        self._fire = False
+        self._unavailable = False #for earthquakes or security threath, for example
         self.is_occupied = False 
 
+    @property
+    def fire(self):
+        return self._fire
+
+    @fire.setter
+    def fire(self, value):
+        if value != self._fire:
+            self._fire = value
+            self.hazard_changed()
+
+    @property
+    def unavailable(self):
+        return self._unavailable
+
+    @unavailable.setter
+    def unavailable(self, value):
+        if value != self._unavailable:
+            self._unavailable = value
+            self.hazard_changed()
+
+    def hazard_changed(self):
+        if self.building is not None:
+            self.building.room_changed(self)
+
+    def is_passable(self):
+        """A room can be entered unless it is burning or blocked."""
+        return not self.fire and not self.unavailable
+
     def security_threath(self):
         self.unavailable=True
             
-    def earthquake(self):
-        if random.random( ) < 0.5: #50% of getting damaged because there are earthquakes stronger than others
-            self.unvailable = True
+    def earthquake(self, rng=random):
+        if rng.random() < 0.5: #50% of getting damaged because there are earthquakes stronger than others
+            self.unavailable = True
             
     def fires(self):
-        self.fire = True
-        for connection in self.connections:
-            if random.random() < 0.05: #5% chance of fire in each connection
-                connection.fires()
+        # Spread to the connections is scheduled over time by the building's FireSpread
+        if self.building is not None:
+            try:
+                now = self.building.clock.now()
+            except RuntimeError:
+                now = None  # No event loop (benchmarks): the time of the last `advance`
+            self.building.fire_spread.ignite(self, now)
+        else:
+            self.fire = True
                 
     def connection(self, to_room):
         self.connections.append(to_room)
@@ -40,168 +85,354 @@ class Room:
             self.emergency_staircases.append(to_room)
         else:
             self.staircases.append(to_room)
-    
+
+
+class DistanceField:
+    """
+    Hop distances from every room to the nearest of a set of target rooms,
+    together with the next room to step into on a shortest path.
+    Rooms that cannot reach any target are absent from both tables.
+    """
+
+    def __init__(self, distances, next_hops):
+        self.distances = distances
+        self.next_hops = next_hops
+
+    def distance(self, room):
+        return self.distances.get(room)
+
+    def next_room(self, room):
+        return self.next_hops.get(room)
+
+    def reachable(self, room):
+        return room in self.distances
+
+
+def connect_hallways(is_hallway, rows, cols):
+    """
+    Finds the cells to turn into hallways so that every hallway cell of a floor is
+    connected, in near-linear time on the floor size.
+
+    `is_hallway` is a flat, row-major list of booleans. Hallway components are found
+    with union-find, then a single multi-source BFS grows outwards from every hallway
+    cell at once. Whenever two fronts owned by different components meet, the two BFS
+    paths back to their hallways are carved as a corridor and the components merged.
+    Returns the flat indices of the carved cells.
+    """
+    size = rows * cols
+    parent = list(range(size))
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a == root_b:
+            return False
+        parent[root_b] = root_a
+        return True
+
+    def neighbours(cell):
+        r, c = divmod(cell, cols)
+        if r > 0:
+            yield cell - cols
+        if r < rows - 1:
+            yield cell + cols
+        if c > 0:
+            yield cell - 1
+        if c < cols - 1:
+            yield cell + 1
+
+    hallways = [cell for cell in range(size) if is_hallway[cell]]
+    components = len(hallways)
+    for cell in hallways:
+        r, c = divmod(cell, cols)
+        if c < cols - 1 and is_hallway[cell + 1] and union(cell, cell + 1):
+            components -= 1
+        if r < rows - 1 and is_hallway[cell + cols] and union(cell, cell + cols):
+            components -= 1
+    if components <= 1:
+        return []
+
+    is_hallway = list(is_hallway)
+    owner = [-1] * size  # Hallway cell whose BFS front reached this cell first
+    came_from = [-1] * size
+    for cell in hallways:
+        owner[cell] = cell
+    carved = []
+    queue = deque(hallways)
+    while queue and components > 1:
+        cell = queue.popleft()
+        for neighbour in neighbours(cell):
+            if owner[neighbour] == -1:
+                owner[neighbour] = owner[cell]
+                came_from[neighbour] = cell
+                queue.append(neighbour)
+            elif union(owner[cell], owner[neighbour]):
+                components -= 1
+                for end in (cell, neighbour):
+                    # Paths are carved all the way back, so stop at the first hallway
+                    while not is_hallway[end]:
+                        is_hallway[end] = True
+                        carved.append(end)
+                        end = came_from[end]
+    return carved
+
+
+class FreeRoomSet:
+    """
+    Indexable set of rooms: O(1) add, remove and uniform random pick. Rooms sit in
+    a list and a dict remembers each one's position; removal swaps in the last room.
+    """
+
+    def __init__(self, rooms=()):
+        self.rooms = []
+        self.positions = {}
+        for room in rooms:
+            self.add(room)
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __contains__(self, room):
+        return room in self.positions
+
+    def __iter__(self):
+        return iter(self.rooms)
+
+    def add(self, room):
+        if room not in self.positions:
+            self.positions[room] = len(self.rooms)
+            self.rooms.append(room)
+
+    def remove(self, room):
+        position = self.positions.pop(room, None)
+        if position is None:
+            return
+        last = self.rooms.pop()
+        if position < len(self.rooms):
+            self.rooms[position] = last
+            self.positions[last] = position
+
+    def choice(self, rng=random):
+        if not self.rooms:
+            raise IndexError("No free rooms left.")
+        return self.rooms[rng.randrange(len(self.rooms))]
+
+    def sample(self, k, rng=random):
+        """`k` distinct rooms (fewer if not enough are free), in O(k)."""
+        return [self.rooms[i] for i in rng.sample(range(len(self.rooms)), min(k, len(self.rooms)))]
+
+
+class OccupancyIndex:
+    """
+    Which agents are in which room, kept up to date by the agents' `location` setters.
+    Every move is O(1) and so are the "agents in room", "agents on floor", "is room
+    free" and per-floor count queries. `Room.is_occupied` is maintained from it.
+    """
+
+    def __init__(self, building):
+        self.building = building
+        self.rooms_by_floor = [{} for _ in range(building.floors)]  # room -> set of agents, per floor
+        self.floor_counts = [0] * building.floors
+        self._free_rooms = None
+        self.move_listeners = []
+
+    def add_move_listener(self, listener):
+        """Registers `listener(agent, room)`, called after every move (`room` is None once the agent left)."""
+        self.move_listeners.append(listener)
+
+    def move(self, agent, old_room, new_room):
+        if old_room is new_room:
+            return
+        if old_room is not None:
+            rooms = self.rooms_by_floor[old_room.floor]
+            agents = rooms[old_room]
+            agents.discard(agent)
+            if not agents:
+                del rooms[old_room]
+                old_room.is_occupied = False
+                if self._free_rooms is not None:
+                    self._free_rooms.add(old_room)
+            self.floor_counts[old_room.floor] -= 1
+        if new_room is not None:
+            self.rooms_by_floor[new_room.floor].setdefault(new_room, set()).add(agent)
+            new_room.is_occupied = True
+            if self._free_rooms is not None:
+                self._free_rooms.remove(new_room)
+            self.floor_counts[new_room.floor] += 1
+        for listener in self.move_listeners:
+            listener(agent, new_room)
+
+    def free_rooms(self):
+        """FreeRoomSet of unoccupied rooms, built on first use and then kept in sync by `move`."""
+        if self._free_rooms is None:
+            self._free_rooms = FreeRoomSet(room for room in self.building.rooms() if self.is_free(room))
+        return self._free_rooms
+
+    def agents_in_room(self, room):
+        return self.rooms_by_floor[room.floor].get(room, set())
+
+    def count(self, room):
+        """Agents in `room`, for capacity checks."""
+        return len(self.agents_in_room(room))
+
+    def occupied_rooms(self, floor):
+        """Occupied rooms of a floor mapped to the agents inside them."""
+        return self.rooms_by_floor[floor]
+
+    def agents_on_floor(self, floor):
+        return [agent for agents in self.rooms_by_floor[floor].values() for agent in agents]
+
+    def is_free(self, room):
+        return room not in self.rooms_by_floor[room.floor]
+
+    def floor_count(self, floor):
+        return self.floor_counts[floor]
+
+
 class Building:
-    def __init__(self, floors, rows, cols, building_type="shopping_mall"):
+    def __init__(self, floors, rows, cols, building_type="shopping_mall", seed=None):
         self.floors = floors
         self.rows = rows
         self.cols = cols
         self.building_type = building_type
+        self.seed = seed
+        self.random = random.Random(seed)  # Stairs, elevators and exits
+        self.rng = np.random.default_rng(seed)  # Room type grid
         self.layout = self.generate_building_layout()
         self.add_vertical_connections()
         self.add_exits_and_connections()
         self.update_room_connections()
-        self.lock_doors = True
-        self.lock_elevators = False
+        self.init_state(seed)
+
+    def init_state(self, seed=None):
+        """Building systems, fire spread and routing caches, shared by every storage mode."""
+        self.change_listeners = []
+        self.clock = SimulationClock()
+        self.fire_spread = FireSpread(seed=seed)
+        self.occupancy = OccupancyIndex(self)
+        self._lock_doors = True
+        self._lock_elevators = False
         self.lock_communications = False
+        self._predecessors = None
+        self._exit_field = None
+        self._exit_router = None
+        self._target_fields = {}
+        self._flow_control = None
+        self._change_waiters = []  # Futures of the agents sleeping in `wait_for_change`
+
+    @property
+    def lock_doors(self):
+        return self._lock_doors
+
+    @lock_doors.setter
+    def lock_doors(self, value):
+        if value != self._lock_doors:
+            self._lock_doors = value
+            self.room_changed(None)
+
+    @property
+    def lock_elevators(self):
+        return self._lock_elevators
+
+    @lock_elevators.setter
+    def lock_elevators(self, value):
+        if value != self._lock_elevators:
+            self._lock_elevators = value
+            self.room_changed(None)
+
+    def add_change_listener(self, listener):
+        """Registers `listener(room)`, called on every hazard change (`room` is None for lock changes)."""
+        self.change_listeners.append(listener)
+
+    def room_changed(self, room):
+        """Change hook for fire/unavailable flips and, with `room=None`, BMS lock changes."""
+        self.invalidate_routes(room)
+        for listener in self.change_listeners:
+            listener(room)
+        waiters, self._change_waiters = self._change_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(room)
+
+    async def wait_for_change(self, timeout=None):
+        """
+        Sleeps until the next hazard or lock change (returns True) or for `timeout`
+        seconds at most (returns False), for agents that can only act after one.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self._change_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if waiter in self._change_waiters:
+                self._change_waiters.remove(waiter)
 
     def generate_building_layout(self):
-        layout = []
-        for floor in range(self.floors):
-            floor_layout = [[None for _ in range(self.cols)] for _ in range(self.rows)]
-            self.place_rooms(floor_layout,floor)
-            layout.append(floor_layout)
-        return layout
-
-    def place_rooms(self, floor_layout,floor):
-        for i in range(self.rows):
-            for j in range(self.cols):
-                random_number=random.random()
-                if random_number < 0.6:  # 60% chance for Hallway
-                    floor_layout[i][j] = Room("H", i, j,floor)
-                elif random_number < 0.9:  # 30% chance for Store
-                    floor_layout[i][j] = Room("S", i, j,floor)
-                else:  # 10% chance for Restroom
-                    floor_layout[i][j] = Room("R", i, j,floor)
-
-        self.ensure_store_restroom_access(floor_layout,floor)
-        self.ensure_hallway_connectivity(floor_layout,floor)
-
-    def ensure_hallway_connectivity(self, floor_layout,floor):
+        room_types = self.generate_room_types()
+        return [
+            [[Room(ROOM_TYPES[code], i, j, floor, self) for j, code in enumerate(row)] for i, row in enumerate(floor_types)]
+            for floor, floor_types in enumerate(room_types.tolist())
+        ]
+
+    def generate_room_types(self):
+        """
+        Samples the type codes of every cell of every floor in one call
+        (60% hallway, 30% store, 10% restroom) and repairs them in bulk.
+        Room objects are only built afterwards, from the final array.
+        """
+        samples = self.rng.random((self.floors, self.rows, self.cols))
+        room_types = np.full(samples.shape, HALLWAY, dtype=np.uint8)
+        room_types[samples >= 0.6] = STORE  # 30% chance for Store
+        room_types[samples >= 0.9] = RESTROOM  # 10% chance for Restroom
+
+        self.ensure_store_restroom_access(room_types)
+        for floor_types in room_types:
+            self.ensure_hallway_connectivity(floor_types)
+        return room_types
+
+    def ensure_hallway_connectivity(self, floor_types):
         """
         Ensures all hallway ('H') tiles on a floor are connected.
         Any hallway tile must be reachable from any other hallway tile.
         """
-        rows = len(floor_layout)
-        cols = len(floor_layout[0])
-
-        # Helper: Find all connected hallways using BFS
-        def find_connected_hallways(start):
-            visited = set()
-            queue = deque([start])
-            while queue:
-                r, c = queue.popleft()
-                if (r, c) in visited:
-                    continue
-                visited.add((r, c))
-                # Explore neighbors
-                for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    nr, nc = r + dr, c + dc
-                    if (
-                        0 <= nr < rows
-                        and 0 <= nc < cols
-                        and floor_layout[nr][nc]
-                        and floor_layout[nr][nc].room_type == "H"
-                        and (nr, nc) not in visited
-                    ):
-                        queue.append((nr, nc))
-            return visited
-
-        # Find all hallway tiles
-        hallway_positions = [
-            (r, c) for r in range(rows) for c in range(cols) if floor_layout[r][c] and floor_layout[r][c].room_type == "H"
-        ]
-        if not hallway_positions:
-            return  # No hallways to connect
-
-        # Find all connected components
-        connected_components = []
-        unvisited = set(hallway_positions)
-        while unvisited:
-            start = next(iter(unvisited))  # Get any unvisited hallway tile
-            component = find_connected_hallways(start)
-            connected_components.append(component)
-            unvisited -= component
-
-        # If there's only one connected component, we're done
-        if len(connected_components) == 1:
-            return
+        rows, cols = floor_types.shape
+        carved = connect_hallways((floor_types.ravel() == HALLWAY).tolist(), rows, cols)
+        floor_types.flat[carved] = HALLWAY
 
-        # Otherwise, connect the components
-        largest_component = connected_components.pop(0)  # Start with the largest (or first) component
-        while connected_components:
-            # Find the closest component to the largest component
-            closest_component = None
-            closest_pair = None
-            min_distance = float("inf")
-
-            for component in connected_components:
-                for r1, c1 in largest_component:
-                    for r2, c2 in component:
-                        distance = abs(r1 - r2) + abs(c1 - c2)
-                        if distance < min_distance:
-                            min_distance = distance
-                            closest_pair = ((r1, c1), (r2, c2))
-                            closest_component = component
-
-            # Connect the two components
-            (r1, c1), (r2, c2) = closest_pair
-            while (r1, c1) != (r2, c2):
-                if r1 < r2:
-                    r1 += 1
-                elif r1 > r2:
-                    r1 -= 1
-                elif c1 < c2:
-                    c1 += 1
-                elif c1 > c2:
-                    c1 -= 1
-                floor_layout[r1][c1] = Room("H", r1, c1, floor)
-
-            # Merge the connected component into the largest component
-            largest_component.update(closest_component)
-            connected_components.remove(closest_component)
-
-    def ensure_store_restroom_access(self, floor_layout, floor):
+    def ensure_store_restroom_access(self, room_types):
         """
         Ensures every store ('S') and restroom ('R') is adjacent to at least one hallway ('H').
+        Works on a whole (floors, rows, cols) array: isolated rooms are found with shifted
+        hallway masks and each one gets its first in-bounds neighbour (up, down, left,
+        right) turned into a hallway.
         """
-        for i in range(self.rows):
-            for j in range(self.cols):
-                room = floor_layout[i][j]
-                if room and room.room_type in {"S", "R"}:
-                    # Check if adjacent to a hallway
-                    connected_to_hallway = any(
-                        0 <= i + dx < self.rows and 0 <= j + dy < self.cols and
-                        floor_layout[i + dx][j + dy] and
-                        floor_layout[i + dx][j + dy].room_type == "H"
-                        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]
-                    )
-                    if not connected_to_hallway:
-                        # Try to add a hallway next to it
-                        added_hallway = False
-                        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                            nx, ny = i + dx, j + dy
-                            if (
-                                0 <= nx < self.rows
-                                and 0 <= ny < self.cols
-                                and floor_layout[nx][ny] is None
-                            ):
-                                floor_layout[nx][ny] = Room("H", nx, ny, floor)
-                                added_hallway = True
-                                break
-
-                        # If no empty space, replace an adjacent non-hallway room
-                        if not added_hallway:
-                            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                                nx, ny = i + dx, j + dy
-                                if (
-                                    0 <= nx < self.rows
-                                    and 0 <= ny < self.cols
-                                    and floor_layout[nx][ny]
-                                    and floor_layout[nx][ny].room_type in {"S", "R"}
-                                ):
-                                    floor_layout[nx][ny] = Room("H", nx, ny, floor)
-                                    break
+        hallway = room_types == HALLWAY
+        adjacent = np.zeros_like(hallway)
+        adjacent[:, 1:, :] |= hallway[:, :-1, :]
+        adjacent[:, :-1, :] |= hallway[:, 1:, :]
+        adjacent[:, :, 1:] |= hallway[:, :, :-1]
+        adjacent[:, :, :-1] |= hallway[:, :, 1:]
+        floors, rows, cols = np.nonzero(~hallway & ~adjacent)
+
+        target_rows, target_cols = rows.copy(), cols.copy()
+        up, down = rows > 0, rows < self.rows - 1
+        left = ~up & ~down & (cols > 0)
+        right = ~up & ~down & ~left & (cols < self.cols - 1)
+        target_rows[up] -= 1
+        target_rows[~up & down] += 1
+        target_cols[left] -= 1
+        target_cols[right] += 1
+        room_types[floors, target_rows, target_cols] = np.where(
+            up | down | left | right, HALLWAY, room_types[floors, target_rows, target_cols]
+        )
 
 
     def add_vertical_connections(self):
@@ -236,11 +467,11 @@ class Building:
                 raise ValueError(f"No valid hallway positions for vertical connections on floor {floor_index}")
 
             # Select positions for normal stairs and emergency stairs
-            normal_stair_pos = random.choice(eligible_positions)
+            normal_stair_pos = self.random.choice(eligible_positions)
             if emergency_stair_pos is None:
-                emergency_stair_pos = random.choice(eligible_positions)
+                emergency_stair_pos = self.random.choice(eligible_positions)
             if elevator_pos is None:
-                elevator_pos = random.choice(eligible_positions)
+                elevator_pos = self.random.choice(eligible_positions)
                 
 
             # Create and connect normal stairs
@@ -285,8 +516,8 @@ class Building:
             raise ValueError("Not enough eligible positions for exits.")
 
         # Select positions for exits
-        normal_exit_pos = random.sample(eligible_positions, 2)
-        emergency_exit_pos = random.choice(eligible_positions)
+        normal_exit_pos = self.random.sample(eligible_positions, 2)
+        emergency_exit_pos = self.random.choice(eligible_positions)
 
         # Place exits on the ground floor
         for pos in normal_exit_pos:
@@ -307,11 +538,138 @@ class Building:
                             if 0 <= nx < self.rows and 0 <= ny < self.cols:
                                 neighbor = floor_layout[nx][ny]
                                 if neighbor:
-                                    if room.room_type == "H" or "E" or "N":  # Hallway
+                                    if room.room_type in ("H", "E", "N"):  # Hallway
                                         room.connection(neighbor)
-                                    elif neighbor.room_type == "H":  # Store/Restroom to Hallway
+                                    elif neighbor.room_type in ("H", "E", "N"):  # Store/Restroom to Hallway
                                         room.connection(neighbor)
 
+    def rooms(self):
+        """Iterates over every room of the building, floor by floor."""
+        for floor_layout in self.layout:
+            for row in floor_layout:
+                for room in row:
+                    if room:
+                        yield room
+
+    def exits(self):
+        return [room for room in self.rooms() if room.room_type in EXIT_TYPES]
+
+    def predecessors(self):
+        """
+        Reverse adjacency of the building graph: for every room, the rooms that can
+        step into it and the kind of link used ("connection", "staircase",
+        "emergency_staircase" or "elevator"). Built once, the layout links never change.
+        """
+        if self._predecessors is None:
+            predecessors = {room: [] for room in self.rooms()}
+            for room in predecessors:
+                for to_room in room.connections:
+                    predecessors[to_room].append((room, "connection"))
+                for to_room in room.staircases:
+                    predecessors[to_room].append((room, "staircase"))
+                for to_room in room.emergency_staircases:
+                    predecessors[to_room].append((room, "emergency_staircase"))
+                for to_room in room.elevators:
+                    predecessors[to_room].append((room, "elevator"))
+            self._predecessors = predecessors
+        return self._predecessors
+
+    def link_open(self, link):
+        """Whether a kind of link can currently be used, given the BMS locks."""
+        if link == "elevator":
+            return not self.lock_elevators
+        if link == "emergency_staircase":
+            return not self.lock_doors
+        return True
+
+    def build_distance_field(self, targets, ignore_hazards=False):
+        """
+        Multi-source reverse BFS from `targets` over connections, staircases,
+        emergency staircases and elevators, honouring `lock_doors`/`lock_elevators`.
+        Burning or unavailable rooms get a distance (whoever is inside can still
+        leave) but are never stepped into, unless `ignore_hazards` is set.
+        """
+        predecessors = self.predecessors()
+        distances = {}
+        next_hops = {}
+        queue = deque()
+        for target in targets:
+            if target not in distances and (ignore_hazards or target.is_passable()):
+                distances[target] = 0
+                queue.append(target)
+        while queue:
+            room = queue.popleft()
+            distance = distances[room] + 1
+            for previous, link in predecessors[room]:
+                if previous in distances or not self.link_open(link):
+                    continue
+                distances[previous] = distance
+                next_hops[previous] = room
+                if ignore_hazards or previous.is_passable():
+                    queue.append(previous)
+        return DistanceField(distances, next_hops)
+
+    def exit_distance_field(self):
+        """Distance field towards every `N`/`E` exit, fully rebuilt after any change."""
+        if self._exit_field is None:
+            self._exit_field = self.build_distance_field(self.exits())
+        return self._exit_field
+
+    def distance_field_to(self, target_room, ignore_hazards=False):
+        """Cached distance field towards a single room (used by responders)."""
+        key = (target_room, ignore_hazards)
+        field = self._target_fields.get(key)
+        if field is None:
+            field = self.build_distance_field([target_room], ignore_hazards)
+            self._target_fields[key] = field
+        return field
+
+    def exit_router(self):
+        """Shared IncrementalRouter towards the exits, repaired in place as hazards change."""
+        if self._exit_router is None:
+            self._exit_router = IncrementalRouter(self)
+        return self._exit_router
+
+    def exit_distance(self, room):
+        return self.exit_router().distance(room)
+
+    def next_room_to_exit(self, room, congestion=None):
+        """Next hop towards the nearest reachable exit, or None if trapped; see `IncrementalRouter.next_room`."""
+        return self.exit_router().next_room(room, congestion)
+
+    def flow_control(self):
+        """Shared FlowControl: room capacities and link queues for occupants moving one by one."""
+        if self._flow_control is None:
+            from congestion import FlowControl
+
+            self._flow_control = FlowControl(self)
+        return self._flow_control
+
+    def invalidate_routes(self, room=None):
+        """
+        Drops the fully rebuilt distance fields; the exit router repairs itself. A hazard
+        flip in `room` keeps the fields that ignore hazards, only a lock change (None)
+        can alter those.
+        """
+        self._exit_field = None
+        if room is None:
+            self._target_fields.clear()
+        else:
+            self._target_fields = {key: field for key, field in self._target_fields.items() if key[1]}
+
+    def save(self, path):
+        """Writes a binary snapshot of the building, see `CompactBuilding.save`."""
+        from compact_building import CompactBuilding
+
+        CompactBuilding.from_building(self).save(path)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """Loads a snapshot as a CompactBuilding, without building Room objects eagerly."""
+        from compact_building import CompactBuilding
+
+        return CompactBuilding.load(path, mmap)
+
     def display_building(self):
         for floor_index, floor_layout in enumerate(self.layout):
             print(f"\n--- Floor {floor_index} ---")
@@ -349,8 +707,32 @@ class Building:
                             print(f"  Exit ({room.row}, {room.col}) -> {exit_type}")
 
 
-# Example usage
-building = Building(floors=3, rows=5, cols=5)
-building.display_building()
-room=building.layout[0][0][0]
-print(room.connections)
+DEFAULT_SIZE = {"floors": 3, "rows": 5, "cols": 5}
+_default_building = None
+
+
+def create_building(floors=3, rows=5, cols=5, seed=None, compact=False, building_type="shopping_mall"):
+    """
+    Entry point for building a simulation layout with an explicit size and seed.
+    The same seed always produces the same layout; `compact` selects CompactBuilding.
+    """
+    if compact:
+        from compact_building import CompactBuilding
+
+        return CompactBuilding(floors, rows, cols, building_type, seed)
+    return Building(floors, rows, cols, building_type, seed)
+
+
+def default_building():
+    """The shared 3x5x5 building, generated on first use rather than at import time."""
+    global _default_building
+    if _default_building is None:
+        _default_building = create_building(**DEFAULT_SIZE)
+    return _default_building
+
+
+def __getattr__(name):
+    # Keeps `from building import building` working without generating anything on import
+    if name == "building":
+        return default_building()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,67 @@
+import asyncio
+import selectors
+
+
+class SimulationClock:
+    """Simulated seconds since `start()`, read from the running event loop's clock."""
+
+    def __init__(self):
+        self.started_at = None
+
+    def start(self):
+        self.started_at = asyncio.get_running_loop().time()
+
+    def now(self):
+        loop_time = asyncio.get_running_loop().time()
+        if self.started_at is None:
+            self.started_at = loop_time
+        return loop_time - self.started_at
+
+
+class VirtualClockSelector(selectors.DefaultSelector):
+    """
+    Selector that never blocks for a timeout: when nothing is ready it moves the
+    virtual clock forward by the timeout the loop asked for, i.e. to the next timer.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.time = 0.0
+
+    def select(self, timeout=None):
+        events = super().select(None if timeout is None else 0)
+        if not events and timeout:
+            self.time += timeout
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """
+    Discrete-event asyncio loop: `loop.time()` is virtual and jumps straight to the next
+    scheduled callback whenever every task is waiting. `asyncio.sleep`, `wait_for` and
+    SPADE's `receive(timeout=...)` therefore take no wall-clock time, while agents keep
+    their behaviour logic unchanged.
+    """
+
+    def __init__(self):
+        self.selector = VirtualClockSelector()
+        super().__init__(self.selector)
+
+    def time(self):
+        return self.selector.time
+
+
+def run_virtual(main):
+    """`asyncio.run` on a VirtualClockLoop: runs `main`, then cancels whatever is left."""
+    loop = VirtualClockLoop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,463 @@
+import random
+import struct
+
+import numpy as np
+
+from building import (
+    Building, DistanceField, Room, EXIT_TYPES, ROOM_TYPES, LINK_KINDS, HALLWAY, NORMAL_EXIT, EMERGENCY_EXIT,
+)
+from routing import CompactRouter
+
+CONNECTION, STAIRCASE, EMERGENCY_STAIRCASE, ELEVATOR = range(len(LINK_KINDS))
+EXIT_CODES = [ROOM_TYPES.index(room_type) for room_type in EXIT_TYPES]
+
+# Snapshot layout: a fixed header followed by raw little-endian arrays, each starting
+# on a 64-byte boundary so they can be memory-mapped in place.
+SNAPSHOT_MAGIC = b"MAESBLDG"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sHIIIQ???")
+SNAPSHOT_ALIGNMENT = 64
+
+
+class RoomView(Room):
+    """
+    Lightweight view of one cell of a CompactBuilding. It keeps the Room interface
+    (type, coordinates, hazard flags, link lists) so agents work unchanged, but every
+    attribute reads from or writes to the building arrays.
+    """
+
+    def __init__(self, building, index):
+        self.building = building
+        self.index = index
+
+    @property
+    def floor(self):
+        return self.index // (self.building.rows * self.building.cols)
+
+    @property
+    def row(self):
+        return self.index // self.building.cols % self.building.rows
+
+    @property
+    def col(self):
+        return self.index % self.building.cols
+
+    @property
+    def room_type(self):
+        return ROOM_TYPES[self.building.room_types.flat[self.index]]
+
+    @room_type.setter
+    def room_type(self, value):
+        self.building.room_types.flat[self.index] = ROOM_TYPES.index(value)
+
+    @property
+    def fire(self):
+        return bool(self.building.fire.flat[self.index])
+
+    @fire.setter
+    def fire(self, value):
+        if value != self.fire:
+            self.building.fire.flat[self.index] = value
+            self.hazard_changed()
+
+    @property
+    def unavailable(self):
+        return bool(self.building.unavailable.flat[self.index])
+
+    @unavailable.setter
+    def unavailable(self, value):
+        if value != self.unavailable:
+            self.building.unavailable.flat[self.index] = value
+            self.hazard_changed()
+
+    @property
+    def is_occupied(self):
+        return bool(self.building.is_occupied.flat[self.index])
+
+    @is_occupied.setter
+    def is_occupied(self, value):
+        self.building.is_occupied.flat[self.index] = value
+
+    def linked_rooms(self, kind):
+        building = self.building
+        start, end = building.indptr[self.index], building.indptr[self.index + 1]
+        targets = building.indices[start:end][building.link_kinds[start:end] == kind]
+        return [RoomView(building, int(index)) for index in targets]
+
+    @property
+    def connections(self):
+        return self.linked_rooms(CONNECTION)
+
+    @property
+    def staircases(self):
+        return self.linked_rooms(STAIRCASE)
+
+    @property
+    def emergency_staircases(self):
+        return self.linked_rooms(EMERGENCY_STAIRCASE)
+
+    @property
+    def elevators(self):
+        return self.linked_rooms(ELEVATOR)
+
+    def connection(self, to_room):
+        raise TypeError("CompactBuilding adjacency is fixed once built")
+
+    elevator = stairs = connection
+
+    def __eq__(self, other):
+        return isinstance(other, RoomView) and other.building is self.building and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.building), self.index))
+
+    def __repr__(self):
+        return f"RoomView({self.room_type}, {self.row}, {self.col}, {self.floor})"
+
+
+class CompactLayout:
+    """`layout[floor][row][col]` access to a CompactBuilding, creating room views on demand."""
+
+    def __init__(self, building, floor=None, row=None):
+        self.building = building
+        self.floor = floor
+        self.row = row
+
+    def __len__(self):
+        if self.floor is None:
+            return self.building.floors
+        if self.row is None:
+            return self.building.rows
+        return self.building.cols
+
+    def __getitem__(self, key):
+        if not -len(self) <= key < len(self):
+            raise IndexError(key)
+        key %= len(self)
+        if self.floor is None:
+            return CompactLayout(self.building, key)
+        if self.row is None:
+            return CompactLayout(self.building, self.floor, key)
+        building = self.building
+        return RoomView(building, (self.floor * building.rows + self.row) * building.cols + key)
+
+    def __iter__(self):
+        return (self[key] for key in range(len(self)))
+
+
+class CompactDistanceField(DistanceField):
+    """DistanceField stored as two arrays indexed by room index (-1 = unreachable)."""
+
+    def __init__(self, building, distances, next_hops):
+        self.building = building
+        self.distances = distances
+        self.next_hops = next_hops
+
+    def distance(self, room):
+        distance = self.distances[room.index]
+        return int(distance) if distance >= 0 else None
+
+    def next_room(self, room):
+        next_hop = self.next_hops[room.index]
+        return RoomView(self.building, int(next_hop)) if next_hop >= 0 else None
+
+    def reachable(self, room):
+        return self.distances[room.index] >= 0
+
+
+def csr_edges(indptr, nodes):
+    """Positions in the CSR edge arrays of every edge leaving `nodes`, and their source."""
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    sources = np.repeat(nodes, lengths)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum()), sources
+
+
+def build_csr(sources, targets, kinds, size):
+    """Sorts an edge list by source into (indptr, indices, link_kinds)."""
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32), kinds[order].astype(np.uint8)
+
+
+def grid_csr(room_types, vertical_links):
+    """
+    Builds the CSR adjacency from a (floors, rows, cols) array of type codes and an
+    (n, 3) array of (from index, to index, link kind) vertical links. Rooms on the
+    same floor follow `Building.update_room_connections`: hallways and exits connect
+    to every neighbour, stores and restrooms only to neighbouring hallways or exits.
+    """
+    index = np.arange(room_types.size).reshape(room_types.shape)
+    opens = np.isin(room_types, [HALLWAY] + EXIT_CODES)
+    sources, targets = [], []
+    for here, there in (
+        (np.s_[:, 1:, :], np.s_[:, :-1, :]),
+        (np.s_[:, :-1, :], np.s_[:, 1:, :]),
+        (np.s_[:, :, 1:], np.s_[:, :, :-1]),
+        (np.s_[:, :, :-1], np.s_[:, :, 1:]),
+    ):
+        linked = opens[here] | opens[there]
+        sources.append(index[here][linked])
+        targets.append(index[there][linked])
+    sources = np.concatenate(sources + [vertical_links[:, 0]]).astype(np.int64)
+    targets = np.concatenate(targets + [vertical_links[:, 1]])
+    kinds = np.concatenate([np.full(len(sources) - len(vertical_links), CONNECTION), vertical_links[:, 2]])
+    return build_csr(sources, targets, kinds, room_types.size)
+
+
+def border_hallways(floor_types):
+    """Hallway cells on the outer ring of a floor; corners count twice, as in `Building.add_vertical_connections`."""
+    rows, cols = floor_types.shape
+    return [
+        (i, j) for i in [0, rows - 1] for j in np.flatnonzero(floor_types[i] == HALLWAY).tolist()
+    ] + [
+        (i, j) for i in range(rows) for j in [0, cols - 1] if floor_types[i, j] == HALLWAY
+    ]
+
+
+class CompactBuilding(Building):
+    """
+    Array-backed Building. Room types and the fire/unavailable/is_occupied flags are
+    NumPy arrays indexed by (floor, row, col); adjacency is a CSR edge array over the
+    flat room index `(floor * rows + row) * cols + col`, each edge tagged with its
+    LINK_KINDS code. `layout` hands out RoomView objects, so agents keep working.
+    Generation follows the same rules as `Building` but never creates Room objects.
+    """
+
+    def __init__(self, floors, rows, cols, building_type="shopping_mall", seed=None):
+        self.floors = floors
+        self.rows = rows
+        self.cols = cols
+        self.building_type = building_type
+        self.seed = seed
+        self.random = random.Random(seed)  # Stairs, elevators and exits
+        self.rng = np.random.default_rng(seed)  # Room type grid
+        room_types = self.generate_room_types()
+        vertical_links = self.add_vertical_links(room_types)
+        self.add_exits(room_types)
+        self.set_arrays(room_types, *grid_csr(room_types, vertical_links))
+        self.init_state(seed)
+
+    def set_arrays(self, room_types, indptr, indices, link_kinds, fire=None, unavailable=None):
+        self.floors, self.rows, self.cols = room_types.shape
+        self.room_types = room_types
+        self.fire = np.zeros(room_types.shape, dtype=bool) if fire is None else fire
+        self.unavailable = np.zeros(room_types.shape, dtype=bool) if unavailable is None else unavailable
+        self.is_occupied = np.zeros(room_types.shape, dtype=bool)
+        self.indptr = indptr
+        self.indices = indices
+        self.link_kinds = link_kinds
+        self._reverse = None
+        self.layout = CompactLayout(self)
+
+    @classmethod
+    def from_arrays(cls, room_types, vertical_links, building_type="shopping_mall"):
+        """Wraps an existing type grid and (from, to, kind) vertical links, see `grid_csr`."""
+        compact = cls.__new__(cls)
+        compact.building_type = building_type
+        compact.set_arrays(room_types, *grid_csr(room_types, vertical_links))
+        compact.init_state()
+        return compact
+
+    @classmethod
+    def from_building(cls, building):
+        """Copies the layout and links of an object-graph Building into arrays."""
+        def index(room):
+            return (room.floor * building.rows + room.row) * building.cols + room.col
+
+        room_types = np.zeros((building.floors, building.rows, building.cols), dtype=np.uint8)
+        sources, targets, kinds = [], [], []
+        for room in building.rooms():
+            room_types[room.floor, room.row, room.col] = ROOM_TYPES.index(room.room_type)
+            for kind, linked in enumerate((room.connections, room.staircases, room.emergency_staircases, room.elevators)):
+                for to_room in linked:
+                    sources.append(index(room))
+                    targets.append(index(to_room))
+                    kinds.append(kind)
+        compact = cls.__new__(cls)
+        compact.building_type = building.building_type
+        compact.set_arrays(
+            room_types,
+            *build_csr(np.array(sources, dtype=np.int64), np.array(targets), np.array(kinds), room_types.size),
+        )
+        compact.init_state()
+        for room in building.rooms():
+            compact.fire[room.floor, room.row, room.col] = room.fire
+            compact.unavailable[room.floor, room.row, room.col] = room.unavailable
+            compact.is_occupied[room.floor, room.row, room.col] = room.is_occupied
+        compact.lock_doors = building.lock_doors
+        compact.lock_elevators = building.lock_elevators
+        compact.lock_communications = building.lock_communications
+        return compact
+
+    def add_vertical_links(self, room_types):
+        """
+        Array version of `Building.add_vertical_connections`: returns the (from, to, kind)
+        rows of the normal stairs, emergency stairs and elevators between every floor pair.
+        """
+        links = []
+        emergency_stair_pos = None
+        elevator_pos = None
+        floor_size = self.rows * self.cols
+        for floor_index in range(self.floors - 1):
+            eligible_positions = border_hallways(room_types[floor_index])
+            if not eligible_positions:
+                raise ValueError(f"No valid hallway positions for vertical connections on floor {floor_index}")
+
+            normal_stair_pos = self.random.choice(eligible_positions)
+            if emergency_stair_pos is None:
+                emergency_stair_pos = self.random.choice(eligible_positions)
+            if elevator_pos is None:
+                elevator_pos = self.random.choice(eligible_positions)
+
+            for (i, j), kind in (
+                (normal_stair_pos, STAIRCASE),
+                (emergency_stair_pos, EMERGENCY_STAIRCASE),
+                (elevator_pos, ELEVATOR),
+            ):
+                lower = (floor_index * self.rows + i) * self.cols + j
+                links.append((lower, lower + floor_size, kind))
+                links.append((lower + floor_size, lower, kind))
+        return np.array(links, dtype=np.int64).reshape(-1, 3)
+
+    def add_exits(self, room_types):
+        """Array version of `Building.add_exits_and_connections`."""
+        eligible_positions = border_hallways(room_types[0])
+        if len(eligible_positions) < 3:
+            raise ValueError("Not enough eligible positions for exits.")
+
+        normal_exit_pos = self.random.sample(eligible_positions, 2)
+        emergency_exit_pos = self.random.choice(eligible_positions)
+        for i, j in normal_exit_pos:
+            room_types[0, i, j] = NORMAL_EXIT
+        room_types[0, emergency_exit_pos[0], emergency_exit_pos[1]] = EMERGENCY_EXIT
+
+    @staticmethod
+    def snapshot_sections(size, edges):
+        """Name, dtype and length of every array of a snapshot, in file order."""
+        return [
+            ("room_types", np.uint8, size),
+            ("fire", np.bool_, size),
+            ("unavailable", np.bool_, size),
+            ("indptr", np.dtype("<i8"), size + 1),
+            ("indices", np.dtype("<i4"), edges),
+            ("link_kinds", np.uint8, edges),
+        ]
+
+    @staticmethod
+    def snapshot_offsets(sections):
+        offsets, offset = [], SNAPSHOT_HEADER.size
+        for _, dtype, length in sections:
+            offset = -(-offset // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+            offsets.append(offset)
+            offset += np.dtype(dtype).itemsize * length
+        return offsets
+
+    def save(self, path):
+        """
+        Writes room types, hazard flags, BMS locks and the CSR adjacency (which holds the
+        stairs, emergency stairs and elevators) to a compact binary snapshot.
+        """
+        sections = self.snapshot_sections(self.room_types.size, len(self.indices))
+        with open(path, "wb") as snapshot:
+            snapshot.write(SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.floors, self.rows, self.cols, len(self.indices),
+                self.lock_doors, self.lock_elevators, self.lock_communications,
+            ))
+            for (name, dtype, _), offset in zip(sections, self.snapshot_offsets(sections)):
+                snapshot.write(b"\0" * (offset - snapshot.tell()))
+                snapshot.write(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Opens a snapshot written by `save`. With `mmap`, nothing is copied: the layout
+        arrays are mapped read-only and the hazard flags copy-on-write, so any number of
+        worker processes loading the same file share its pages until they set a flag.
+        Rooms are only materialised as RoomView objects when they are looked up.
+        """
+        with open(path, "rb") as snapshot:
+            header = snapshot.read(SNAPSHOT_HEADER.size)
+        magic, version, floors, rows, cols, edges, lock_doors, lock_elevators, lock_communications = (
+            SNAPSHOT_HEADER.unpack(header)
+        )
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} building snapshot.")
+
+        sections = cls.snapshot_sections(floors * rows * cols, edges)
+        arrays = {}
+        for (name, dtype, length), offset in zip(sections, cls.snapshot_offsets(sections)):
+            if mmap:
+                mode = "c" if name in ("fire", "unavailable") else "r"
+                arrays[name] = np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(length,))
+            else:
+                arrays[name] = np.fromfile(path, dtype=dtype, count=length, offset=offset)
+        shape = (floors, rows, cols)
+        compact = cls.__new__(cls)
+        compact.building_type = "shopping_mall"
+        compact.set_arrays(
+            arrays["room_types"].reshape(shape), arrays["indptr"], arrays["indices"], arrays["link_kinds"],
+            arrays["fire"].reshape(shape), arrays["unavailable"].reshape(shape),
+        )
+        compact.init_state()
+        compact.lock_doors = lock_doors
+        compact.lock_elevators = lock_elevators
+        compact.lock_communications = lock_communications
+        return compact
+
+    def room(self, index):
+        return RoomView(self, int(index))
+
+    def rooms(self):
+        return (RoomView(self, index) for index in range(self.room_types.size))
+
+    def exits(self):
+        return [self.room(index) for index in np.flatnonzero(np.isin(self.room_types, EXIT_CODES))]
+
+    def exit_router(self):
+        """Shared CompactRouter towards the exits, over the CSR arrays rather than room views."""
+        if self._exit_router is None:
+            self._exit_router = CompactRouter(self)
+        return self._exit_router
+
+    def reverse_adjacency(self):
+        """CSR of the reversed graph, the analogue of `Building.predecessors`."""
+        if self._reverse is None:
+            sources = np.repeat(np.arange(self.room_types.size), np.diff(self.indptr))
+            self._reverse = build_csr(self.indices.astype(np.int64), sources, self.link_kinds, self.room_types.size)
+        return self._reverse
+
+    def open_link_kinds(self):
+        return np.array([self.link_open(kind) for kind in LINK_KINDS])
+
+    def build_distance_field(self, targets, ignore_hazards=False):
+        """
+        Level-synchronous, vectorised version of `Building.build_distance_field`: each
+        BFS level gathers the predecessors of the whole frontier from the reverse CSR.
+        """
+        indptr, indices, link_kinds = self.reverse_adjacency()
+        passable = np.ones(self.room_types.size, dtype=bool)
+        if not ignore_hazards:
+            passable &= ~(self.fire.ravel() | self.unavailable.ravel())
+        open_kinds = self.open_link_kinds()
+
+        distances = np.full(self.room_types.size, -1, dtype=np.int32)
+        next_hops = np.full(self.room_types.size, -1, dtype=np.int32)
+        frontier = np.unique(np.array([room.index for room in targets], dtype=np.int64))
+        frontier = frontier[passable[frontier]]
+        distances[frontier] = 0
+        level = 0
+        while frontier.size:
+            level += 1
+            edges, sources = csr_edges(indptr, frontier)
+            previous = indices[edges]
+            keep = open_kinds[link_kinds[edges]] & (distances[previous] < 0)
+            previous, first = np.unique(previous[keep], return_index=True)
+            if not previous.size:
+                break
+            distances[previous] = level
+            next_hops[previous] = sources[keep][first]
+            frontier = previous[passable[previous]].astype(np.int64)
+        return CompactDistanceField(self, distances, next_hops)
@@ -0,0 +1,168 @@
+import asyncio
+from collections import deque
+
+import numpy as np
+
+from building import ROOM_TYPES, LINK_KINDS, EXIT_TYPES
+
+# Quantas pessoas cabem em cada tipo de sala
+ROOM_CAPACITY = {"H": 40, "S": 60, "R": 10, "N": 20, "E": 20}
+# Pessoas por segundo que passam em cada tipo de ligação
+LINK_THROUGHPUT = {"connection": 4.0, "staircase": 2.0, "emergency_staircase": 1.5, "elevator": 1.0}
+# Pessoas por segundo que saem por cada tipo de saída (limita as ligações que entram nela)
+EXIT_THROUGHPUT = {"N": 3.0, "E": 2.0}
+# Credit short of a whole crossing that still counts as one: the refill timer of a
+# waiting agent must not be defeated by float rounding
+CREDIT_SLACK = 1e-9
+
+
+def link_kind(room, to_room):
+    """Kind of the first link from `room` into `to_room`, or None if they are not linked."""
+    for kind, linked in (
+        ("connection", room.connections),
+        ("staircase", room.staircases),
+        ("emergency_staircase", room.emergency_staircases),
+        ("elevator", room.elevators),
+    ):
+        if to_room in linked:
+            return kind
+    return None
+
+
+def link_throughput(kind, to_room_type):
+    throughput = LINK_THROUGHPUT[kind]
+    if to_room_type in EXIT_THROUGHPUT:
+        throughput = min(throughput, EXIT_THROUGHPUT[to_room_type])
+    return throughput
+
+
+def capacity_array(room_type_codes):
+    """Room capacities for an array of compact room type codes."""
+    return np.array([ROOM_CAPACITY[room_type] for room_type in ROOM_TYPES])[room_type_codes]
+
+
+def throughput_array(link_kinds, target_type_codes):
+    """People per second on each CSR edge, from its link kind and the type of the room it enters."""
+    table = np.array([[link_throughput(kind, room_type) for room_type in ROOM_TYPES] for kind in LINK_KINDS])
+    return table[link_kinds, target_type_codes]
+
+
+class FlowControl:
+    """
+    Room capacities and per-link throughput for occupants moved one by one. Every
+    link has a FIFO queue of the agents waiting to cross it and a fractional crossing
+    credit that refills at its throughput, as in CrowdEngine, so 1.5 people per second
+    lets three through every two seconds; `request` is O(1). Room counts come from the
+    building's OccupancyIndex. `waiting(room)` (queued agents heading into a room)
+    is what routing uses as a live congestion cost, through `congestion(agent)`.
+
+    A refused agent sleeps in `wait_turn` until what refused it changes: the agent
+    ahead of it crossed, its link's credit refilled (a timer) or someone
+    crossed out of the full room it heads into. Hazard and lock changes wake every
+    waiting agent, since its route may have changed.
+    """
+
+    def __init__(self, building):
+        self.building = building
+        self.queues = {}  # (room, to_room) -> deque of waiting agents
+        self.queued = {}  # agent -> the link it is queued on
+        self.credit = {}  # (room, to_room) -> [simulated time of the last refill, crossings left, throughput]
+        self.waiting_into = {}  # to_room -> agents queued on links into it
+        self.waits = 0  # Refused requests, over the simulation
+        self.turns = {}  # agent -> future set when its refused request may succeed
+        self.room_waits = {}  # room -> queue heads waiting for space in it
+        building.add_change_listener(self.building_changed)
+
+    def waiting(self, room):
+        return self.waiting_into.get(room, 0)
+
+    def congestion(self, agent):
+        """`waiting` as seen by `agent`: its own place in a queue does not count against the room it heads into."""
+        edge = self.queued.get(agent)
+        if edge is None:
+            return self.waiting
+        return lambda room: self.waiting(room) - (room == edge[1])
+
+    def request(self, agent, room, to_room, now):
+        """
+        Whether `agent` may step from `room` into `to_room` at simulated time `now`.
+        A refused agent keeps its place in the link's queue until it crosses or leaves.
+        """
+        edge = (room, to_room)
+        queue = self.queues.get(edge)
+        if queue is None:
+            queue = self.queues[edge] = deque()
+        if self.queued.get(agent) != edge:
+            if agent in self.queued:
+                self.leave(agent)  # The route changed while it waited
+            queue.append(agent)
+            self.queued[agent] = edge
+            self.waiting_into[to_room] = self.waiting(to_room) + 1
+        credit = self.credit.get(edge)
+        if credit is None:
+            throughput = link_throughput(link_kind(room, to_room) or "connection", to_room.room_type)
+            credit = self.credit[edge] = [now, max(throughput, 1.0), throughput]
+        elif credit[0] != now:
+            # Refills at the link's throughput, without banking more than a second's worth
+            credit[1] = min(credit[1] + credit[2] * (now - credit[0]), max(credit[2], 1.0))
+            credit[0] = now
+        if (
+            queue[0] is not agent
+            or credit[1] < 1 - CREDIT_SLACK
+            or (to_room.room_type not in EXIT_TYPES
+                and self.building.occupancy.count(to_room) >= ROOM_CAPACITY[to_room.room_type])
+        ):
+            self.waits += 1
+            return False
+        queue.popleft()
+        del self.queued[agent]
+        self.waiting_into[to_room] -= 1
+        credit[1] -= 1
+        if queue:
+            self.wake(queue[0])
+        for waiter in self.room_waits.pop(room, ()):  # One place fewer taken in `room`
+            self.wake(waiter)
+        return True
+
+    def leave(self, agent):
+        """Drops `agent` from the queue it waits in (O(queue length), only on a route change)."""
+        edge = self.queued.pop(agent, None)
+        if edge is not None:
+            self.queues[edge].remove(agent)
+            self.waiting_into[edge[1]] -= 1
+
+    async def wait_turn(self, agent, timeout=None):
+        """
+        Sleeps until `agent`, just refused by `request`, may ask again, or for `timeout`
+        seconds at most, so that it still notices the queues changing on other routes.
+        """
+        loop = asyncio.get_running_loop()
+        turn = self.turns[agent] = loop.create_future()
+        edge = self.queued.get(agent)
+        if edge is None:
+            turn.set_result(None)
+        elif self.queues[edge][0] is agent:
+            last_refill, credit, throughput = self.credit[edge]
+            if credit < 1 - CREDIT_SLACK:
+                loop.call_later((1 - credit) / throughput, self.wake, agent, turn)
+            else:  # The room it heads into is full
+                self.room_waits.setdefault(edge[1], set()).add(agent)
+        try:
+            await asyncio.wait_for(turn, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if self.turns.get(agent) is turn:
+                del self.turns[agent]
+
+    def wake(self, agent, turn=None):
+        """Ends the `wait_turn` of `agent`; with `turn`, only if it is still that wait."""
+        waiting = self.turns.get(agent)
+        if waiting is not None and (turn is None or waiting is turn):
+            del self.turns[agent]
+            if not waiting.done():
+                waiting.set_result(None)
+
+    def building_changed(self, room):
+        for agent in list(self.turns):
+            self.wake(agent)
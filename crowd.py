@@ -0,0 +1,248 @@
+import numpy as np
+
+from building import ROOM_TYPES, LINK_KINDS
+from compact_building import EXIT_CODES, build_csr
+from congestion import capacity_array, throughput_array
+
+
+class CrowdEngine:
+    """
+    Struct-of-arrays crowd: one row per occupant holding its room index, pace (seconds
+    per room), next step time, evacuated flag and finish time. `tick` advances every
+    active occupant at once through a next-hop table towards the nearest exit, built
+    over the building's CSR adjacency and rebuilt only after a hazard or lock change.
+
+    With `limits` (the default) rooms have a capacity and every link a throughput, see
+    `congestion.py`. Occupants due to cross a link line up in FIFO order of the time
+    they have been waiting, and per tick only as many as the link's accumulated
+    throughput and the free space of the room behind it go through. Every
+    `reroute_interval` simulated seconds the next-hop table is re-chosen among the
+    equally short routes, preferring the links with the shortest queue.
+
+    Rooms are indexed like `CompactBuilding` (floor, row, col order); an object
+    `Building` works too. Rows added with `active=False` are moved by their owner
+    (an `OccupantAgent` backed by the table) rather than by `tick`. Crowd moves are
+    not mirrored into the building's OccupancyIndex, see `counts`.
+    """
+
+    def __init__(self, building, limits=True, reroute_interval=5.0):
+        self.building = building
+        if hasattr(building, "room_types"):
+            self.room_list = None
+            room_types = building.room_types.ravel()
+            self.indptr, self.indices, self.link_kinds = building.indptr, building.indices, building.link_kinds
+        else:
+            self.room_list = list(building.rooms())
+            self.index = {room: i for i, room in enumerate(self.room_list)}
+            room_types = np.array([ROOM_TYPES.index(room.room_type) for room in self.room_list])
+            self.indptr, self.indices, self.link_kinds = self.object_csr()
+        self.size = room_types.size
+        self.is_exit = np.isin(room_types, EXIT_CODES)
+        self.sources = np.repeat(np.arange(self.size), np.diff(self.indptr))
+        self.limits = limits
+        self.capacity = capacity_array(room_types)
+        self.throughput = throughput_array(self.link_kinds, room_types[self.indices])
+        self.link_capacity = self.capacity[self.indices]  # Capacity of the room each link leads into
+        self.into_exit = self.is_exit[self.indices]
+        self.credit = np.zeros(self.indices.size)  # Crossings each link can still take
+        self.room_count = np.zeros(self.size, dtype=np.int64)  # Occupants inside, per room
+        self.waiting_into = np.zeros(self.size, dtype=np.int64)  # Blocked at the last tick, per room ahead
+        self.reroute_interval = reroute_interval
+        self.rerouted_at = 0.0
+        self.now = 0.0
+        self.count = 0
+        self.position = np.empty(0, dtype=np.int32)
+        self.pace = np.empty(0, dtype=np.float32)
+        self.next_step = np.empty(0, dtype=np.float64)
+        self.active = np.empty(0, dtype=bool)
+        self.evacuated = np.empty(0, dtype=bool)
+        self.finish_time = np.empty(0, dtype=np.float64)
+        self._distances = None
+        self._candidates = None
+        self._next_edge = None
+        building.add_change_listener(self.routes_changed)
+
+    def object_csr(self):
+        """CSR adjacency of an object Building, in `room_list` order."""
+        sources, targets, kinds = [], [], []
+        for i, room in enumerate(self.room_list):
+            for kind, linked in enumerate((room.connections, room.staircases, room.emergency_staircases, room.elevators)):
+                for to_room in linked:
+                    sources.append(i)
+                    targets.append(self.index[to_room])
+                    kinds.append(kind)
+        return build_csr(np.array(sources, dtype=np.int64), np.array(targets), np.array(kinds), len(self.room_list))
+
+    def room_index(self, room):
+        return room.index if self.room_list is None else self.index[room]
+
+    def room(self, index):
+        return self.building.room(index) if self.room_list is None else self.room_list[index]
+
+    def add(self, rooms, paces, active=True):
+        """Appends occupants (room indices and paces, arrays or scalars); returns their row numbers."""
+        rooms = np.atleast_1d(np.asarray(rooms, dtype=np.int32))
+        paces = np.broadcast_to(np.asarray(paces, dtype=np.float32), rooms.shape)
+        rows = np.arange(self.count, self.count + rooms.size)
+        out = self.is_exit[rooms] & active  # Agent-owned rows get out through their agent
+        self.position = np.concatenate([self.position, rooms])
+        self.pace = np.concatenate([self.pace, paces])
+        self.next_step = np.concatenate([self.next_step, self.now + paces])
+        self.active = np.concatenate([self.active, np.full(rooms.size, active)])
+        self.evacuated = np.concatenate([self.evacuated, out])
+        self.finish_time = np.concatenate([self.finish_time, np.where(out, self.now, np.nan)])
+        self.room_count += np.bincount(rooms[~out], minlength=self.size)
+        self.count += rooms.size
+        return rows
+
+    def place(self, row, index):
+        """Moves one occupant, for rows owned by an agent."""
+        self.room_count[self.position[row]] -= 1
+        self.room_count[index] += 1
+        self.position[row] = index
+
+    def routes_changed(self, room):
+        """Building change hook: a hazard or a lock changed, the next-hop table is stale."""
+        self._distances = None
+        self._candidates = None
+        self._next_edge = None
+
+    def distances(self):
+        """Hops to the nearest exit per room index, -1 where there is none."""
+        if self._distances is None:
+            field = self.building.build_distance_field(self.building.exits())
+            if self.room_list is None:
+                self._distances = np.asarray(field.distances)
+            else:
+                distances = np.full(self.size, -1, dtype=np.int32)
+                for room, distance in field.distances.items():
+                    distances[self.index[room]] = distance
+                self._distances = distances
+        return self._distances
+
+    def passable(self):
+        if self.room_list is None:
+            return ~(self.building.fire | self.building.unavailable).ravel()
+        return np.array([room.is_passable() for room in self.room_list])
+
+    def route_candidates(self):
+        """CSR positions of the open links into a passable room one hop closer to an exit, grouped by source."""
+        if self._candidates is None:
+            distances = self.distances()
+            open_kinds = np.array([self.building.link_open(kind) for kind in LINK_KINDS])
+            targets = self.indices
+            self._candidates = np.flatnonzero(
+                open_kinds[self.link_kinds] & self.passable()[targets]
+                & (distances[targets] >= 0) & (distances[targets] == distances[self.sources] - 1)
+            )
+        return self._candidates
+
+    def next_edge(self):
+        """
+        CSR position of the link each room's occupants take next, -1 where there is none.
+        Among the route candidates of a room, the link with the shortest queue (blocked
+        occupants over throughput) wins.
+        """
+        if self._next_edge is None:
+            candidates = self.route_candidates()
+            next_edge = np.full(self.size, -1, dtype=np.int64)
+            if candidates.size:
+                sources = self.sources[candidates]
+                cost = self.waiting_into[self.indices[candidates]] / self.throughput[candidates]
+                starts = np.flatnonzero(np.diff(sources, prepend=-1))
+                lowest = np.repeat(np.minimum.reduceat(cost, starts), np.diff(np.append(starts, candidates.size)))
+                best = candidates[cost == lowest]
+                first = np.diff(self.sources[best], prepend=-1) != 0
+                next_edge[self.sources[best[first]]] = best[first]
+            self._next_edge = next_edge
+        return self._next_edge
+
+    def next_hop(self):
+        """Room index to step into towards the nearest exit, -1 where there is none."""
+        next_edge = self.next_edge()
+        return np.where(next_edge >= 0, self.indices[next_edge], -1)
+
+    def tick(self, dt):
+        """
+        Advances time by `dt` seconds; every active occupant due to move steps one room
+        if its link and the room ahead let it through (trapped and blocked ones wait in
+        place). Returns how many occupants got out in this tick.
+        """
+        self.now += dt
+        if self.limits:
+            # A link's credit refills at its throughput, without banking more than one tick's worth
+            np.add(self.credit, self.throughput * dt, out=self.credit)
+            np.minimum(self.credit, np.maximum(self.throughput * dt, 1.0), out=self.credit)
+            if self.now - self.rerouted_at >= self.reroute_interval:
+                self._next_edge = None  # Re-chosen with the current queues
+                self.rerouted_at = self.now
+        due = np.flatnonzero(self.active & ~self.evacuated & (self.next_step <= self.now))
+        if not due.size:
+            return 0
+        edges = self.next_edge()[self.position[due]]
+        moving = edges >= 0
+        due, edges = due[moving], edges[moving]
+        if self.limits:
+            due, edges = self.admit(due, edges)
+        next_rooms = self.indices[edges]
+        out = self.is_exit[next_rooms]
+        self.room_count -= np.bincount(self.position[due], minlength=self.size)
+        self.room_count += np.bincount(next_rooms[~out], minlength=self.size)
+        self.position[due] = next_rooms
+        # Someone who queued steps on from now, not from when it started waiting
+        self.next_step[due] = np.maximum(self.next_step[due], self.now - dt) + self.pace[due]
+        self.evacuated[due[out]] = True
+        self.finish_time[due[out]] = self.now
+        return int(out.sum())
+
+    def admit(self, due, edges):
+        """
+        FIFO admission: each link lets through its oldest waiters (earliest due time),
+        as many as its credit, picked in rounds of one per link rather than by sorting
+        everyone queued; those are then kept, oldest first, within the free space of the
+        room ahead (exits have no capacity limit).
+        """
+        indices = self.indices
+        # Links with no credit or a full room ahead take nobody: most of a long queue stops here
+        open_links = (self.credit >= 1) & ((self.room_count[indices] < self.link_capacity) | self.into_exit)
+        left = np.flatnonzero(open_links[edges])
+        waiting_since = self.next_step[due[left]]
+        picked = []
+        round_ = 0
+        while left.size:
+            left_edges = edges[left]
+            oldest = np.full(self.credit.size, np.inf)
+            np.minimum.at(oldest, left_edges, waiting_since)
+            tied = np.flatnonzero(waiting_since == oldest[left_edges])
+            first = np.full(self.credit.size, due.size)
+            np.minimum.at(first, left_edges[tied], left[tied])  # One per link: ties go to the lowest row
+            chosen = tied[first[left_edges[tied]] == left[tied]]
+            picked.append(left[chosen])
+            round_ += 1
+            keep = np.ones(left.size, dtype=bool)
+            keep[chosen] = False
+            keep &= self.credit[left_edges] >= round_ + 1
+            left, waiting_since = left[keep], waiting_since[keep]
+        picked = np.concatenate(picked) if picked else np.empty(0, dtype=np.int64)
+        rooms = indices[edges[picked]]
+        order = np.lexsort((self.next_step[due[picked]], rooms))
+        picked, rooms = picked[order], rooms[order]
+        fits = (rank_in_groups(rooms) < self.capacity[rooms] - self.room_count[rooms]) | self.is_exit[rooms]
+        admitted = np.zeros(due.size, dtype=bool)
+        admitted[picked[fits]] = True
+        self.waiting_into = np.bincount(indices[edges[~admitted]], minlength=self.size)
+        self.credit -= np.bincount(edges[admitted], minlength=self.credit.size)
+        return due[admitted], edges[admitted]
+
+    def remaining(self):
+        return int(np.count_nonzero(~self.evacuated))
+
+    def counts(self):
+        """Occupants still inside, per room index."""
+        return np.bincount(self.position[~self.evacuated], minlength=self.size)
+
+
+def rank_in_groups(keys):
+    """Position of each element within its run of equal keys (`keys` must be grouped)."""
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[:1] - 1))
+    return np.arange(keys.size) - np.repeat(starts, np.diff(np.append(starts, keys.size)))
@@ -0,0 +1,201 @@
+import numpy as np
+
+# Emergências que cada tipo de responder trata
+ROLE_EMERGENCIES = {
+    "fireman": ("Fire", "Earthquake"),
+    "earthquake_responder": ("Earthquake",),
+    "cop": ("Security Threat",),
+    "gas_responder": ("Gas Leak",),
+    "it_responder": ("Informatic Attack",),
+}
+# Seconds knocked off a responder's current incident, so that equally good solutions
+# do not send responders back and forth between incidents
+STICKINESS = 1e-3
+
+
+class TravelTimes:
+    """
+    Hops from every room to each incident room, for responders: they cross burning
+    and damaged rooms but not locked links. One column per incident room, from a
+    reverse BFS (`Building.build_distance_field`), kept until the BMS locks change;
+    `hops` gathers the columns into a responders x incidents matrix.
+    """
+
+    def __init__(self, building):
+        self.building = building
+        self.index = {room: i for i, room in enumerate(building.rooms())}
+        self.columns = {}  # incident room -> hops from every room, inf if it cannot get there
+        building.add_change_listener(self.building_changed)
+
+    def building_changed(self, room):
+        if room is None:
+            self.columns.clear()  # A lock change; hazards do not stop responders
+
+    def column(self, target):
+        column = self.columns.get(target)
+        if column is None:
+            distances = self.building.build_distance_field([target], ignore_hazards=True).distances
+            if isinstance(distances, dict):
+                column = np.full(len(self.index), np.inf)
+                column[[self.index[room] for room in distances]] = list(distances.values())
+            else:  # A CompactBuilding field: an array in room index order, -1 if unreachable
+                column = np.where(distances >= 0, distances, np.inf)
+            self.columns[target] = column
+        return column
+
+    def hops(self, rooms, targets):
+        """Hops from each of `rooms` to each of `targets`; a None target (no room) costs 0."""
+        rows = np.array([self.index[room] for room in rooms], dtype=np.int64)
+        matrix = np.zeros((len(rooms), len(targets)))
+        for j, target in enumerate(targets):
+            if target is not None:
+                matrix[:, j] = self.column(target)[rows]
+        return matrix
+
+
+class Incident:
+    """An open emergency waiting for, or being handled by, a responder."""
+
+    def __init__(self, emergency, room=None):
+        self.emergency = emergency
+        self.room = room  # Building Room, or None for emergencies handled remotely
+
+    def __repr__(self):
+        where = f" at ({self.room.floor}, {self.room.row}, {self.room.col})" if self.room else ""
+        return f"Incident({self.emergency}{where})"
+
+
+class Dispatcher:
+    """
+    Pool of responders and queue of open incidents. Every `solve` re-computes the
+    assignment with the lowest total travel time (hops times each responder's pace)
+    over all responders, busy ones included, so a closer responder that frees up can
+    take over. A responder only gets incidents of its role; incidents left without a
+    responder stay queued until the next `solve`.
+    """
+
+    def __init__(self, building, responders=()):
+        self.travel_times = TravelTimes(building)
+        self.responders = list(responders)  # Agents with `role`, `pace` and `location`
+        self.incidents = []  # Open incidents, oldest first
+        self.assignment = {}  # responder -> incident
+
+    def add_responder(self, responder):
+        self.responders.append(responder)
+
+    def open(self, emergency, room=None):
+        incident = Incident(emergency, room)
+        self.incidents.append(incident)
+        return incident
+
+    def find(self, emergency, room=None):
+        """The oldest open incident of that kind in `room`, or None."""
+        for incident in self.incidents:
+            if incident.emergency == emergency and incident.room == room:
+                return incident
+        return None
+
+    def close(self, emergency, room=None):
+        """
+        Closes the oldest open incident of that kind in `room`; returns the responders
+        it released, as responder -> incident.
+        """
+        incident = self.find(emergency, room)
+        if incident is None:
+            return {}
+        self.incidents.remove(incident)
+        return self.release(incident)
+
+    def release(self, incident):
+        """Frees the responders assigned to `incident`, which stays open; returns them, as responder -> incident."""
+        released = {responder: assigned for responder, assigned in self.assignment.items() if assigned is incident}
+        for responder in released:
+            del self.assignment[responder]
+        return released
+
+    def costs(self):
+        """Responders x incidents travel times in seconds, inf where a responder cannot take an incident."""
+        responders, incidents = self.responders, self.incidents
+        travel = self.travel_times.hops([responder.location for responder in responders],
+                                        [incident.room for incident in incidents])
+        travel *= np.array([responder.pace for responder in responders])[:, None]
+        handles = {role: np.array([incident.emergency in emergencies for incident in incidents])
+                   for role, emergencies in ROLE_EMERGENCIES.items()}
+        no_role = np.zeros(len(incidents), dtype=bool)
+        allowed = np.array([handles.get(responder.role, no_role) for responder in responders])
+        return np.where(allowed, travel, np.inf)
+
+    def solve(self):
+        """Re-solves the assignment; returns the (responder, incident or None) pairs that changed."""
+        assignment = {}
+        if self.responders and self.incidents:
+            cost = self.costs()
+            column = {incident: j for j, incident in enumerate(self.incidents)}
+            for i, responder in enumerate(self.responders):
+                current = self.assignment.get(responder)
+                if current in column:
+                    cost[i, column[current]] -= STICKINESS
+            for i, j in enumerate(solve_assignment(cost)):
+                if j >= 0:
+                    assignment[self.responders[i]] = self.incidents[j]
+        changes = [(responder, assignment.get(responder)) for responder in self.responders
+                   if assignment.get(responder) is not self.assignment.get(responder)]
+        self.assignment = assignment
+        return changes
+
+
+def solve_assignment(cost):
+    """
+    Minimum-cost assignment of the rows of `cost` to distinct columns: the Hungarian
+    algorithm in its shortest-augmenting-path form with row and column potentials,
+    O(n^2 m) for n <= m, with the scan over columns vectorized. `cost` may be
+    rectangular and holds inf for forbidden pairs. Returns the column of each row,
+    -1 for rows left unassigned.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.shape[0] > cost.shape[1]:
+        columns = solve_assignment(cost.T)
+        rows = np.full(cost.shape[0], -1, dtype=np.int64)
+        assigned = np.flatnonzero(columns >= 0)
+        rows[columns[assigned]] = assigned
+        return rows
+    n, m = cost.shape
+    allowed = np.isfinite(cost)
+    if not allowed.any():
+        return np.full(n, -1, dtype=np.int64)
+    # Forbidden pairs cost more than any assignment made of allowed ones
+    forbidden = (np.abs(cost[allowed]).max() + 1) * (n + 1)
+    cost = np.where(allowed, cost, forbidden)
+    u = np.zeros(n + 1)  # Row potentials, 1-based
+    v = np.zeros(m + 1)  # Column potentials, column 0 is the virtual start
+    owner = np.zeros(m + 1, dtype=np.int64)  # Row matched to each column, 0 for none
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        owner[0] = row
+        column = 0
+        slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while owner[column]:
+            used[column] = True
+            current = owner[column]
+            reduced = cost[current - 1] - u[current] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < slack[1:])
+            slack[1:][better] = reduced[better]
+            way[1:][better] = column
+            candidates = np.where(free, slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            slack[1:][free] -= delta
+            column = next_column
+        while column:  # Flips the augmenting path
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    rows = np.full(n, -1, dtype=np.int64)
+    matched = np.flatnonzero(owner[1:]) + 1
+    rows[owner[matched] - 1] = matched - 1
+    rows[(rows >= 0) & ~allowed[np.arange(n), np.maximum(rows, 0)]] = -1
+    return rows
@@ -0,0 +1,77 @@
+import heapq
+import random
+
+
+class FireSpread:
+    """
+    Event-driven fire spread owned by a Building.
+
+    Each burning room gets one chance, when it ignites, to spread to each of its
+    connections (`spread_probability`, 5% by default). A successful roll schedules the
+    neighbour's ignition `spread_delay` simulated seconds later on average, in a
+    priority queue of ignition times. `advance(until)` pops every ignition due by
+    `until` and returns the newly burning rooms as one batch. Spread is iterative,
+    each room is queued at most once per burning neighbour, and all rolls come from
+    the scheduler's own seeded generator, so a run is reproducible.
+    """
+
+    def __init__(self, spread_probability=0.05, spread_delay=10.0, seed=None):
+        self.spread_probability = spread_probability
+        self.spread_delay = spread_delay
+        self.random = random.Random(seed)
+        self.now = 0.0
+        self.queue = []  # (ignition time, order, room)
+        self.scheduled = {}  # room -> earliest pending ignition time
+        self.counter = 0
+
+    def schedule(self, room, at):
+        if room.fire or self.scheduled.get(room, float("inf")) <= at:
+            return
+        self.scheduled[room] = at
+        self.counter += 1
+        heapq.heappush(self.queue, (at, self.counter, room))
+
+    def burn(self, room, at):
+        """Sets `room` on fire and rolls its spread into each connection."""
+        room.fire = True
+        for connection in room.connections:
+            if not connection.fire and self.random.random() < self.spread_probability:
+                self.schedule(connection, at + self.random.expovariate(1 / self.spread_delay))
+
+    def ignite(self, room, now=None):
+        """
+        Starts a fire in `room` at simulated time `now`, by default the time of the
+        last `advance`, which lags behind the clock between spread events.
+        """
+        self.scheduled.pop(room, None)
+        if not room.fire:
+            self.burn(room, self.now if now is None else now)
+
+    def ignite_many(self, rooms, now=None):
+        """Starts several simultaneous fires, sharing one queue for their spread."""
+        for room in rooms:
+            self.ignite(room, now)
+
+    def advance(self, until):
+        """Moves simulation time to `until` and returns the rooms that caught fire meanwhile."""
+        newly_burning = []
+        while self.queue and self.queue[0][0] <= until:
+            at, _, room = heapq.heappop(self.queue)
+            if self.scheduled.get(room) != at:
+                continue  # Superseded by an earlier ignition or already burning
+            del self.scheduled[room]
+            self.now = at
+            if not room.fire:
+                self.burn(room, at)
+                newly_burning.append(room)
+        self.now = max(self.now, until)
+        return newly_burning
+
+    def next_ignition(self):
+        """Time of the earliest pending ignition, inf if none is scheduled."""
+        while self.queue and self.scheduled.get(self.queue[0][2]) != self.queue[0][0]:
+            heapq.heappop(self.queue)  # Superseded entry
+        return self.queue[0][0] if self.queue else float("inf")
+
+    def pending(self):
+        return len(self.scheduled)
@@ -1,11 +1,17 @@
+import queue
+
+import numpy as np
 import pygame
-from building import Building
 
 # Constants for visualization
 WINDOW_WIDTH = 1000
 WINDOW_HEIGHT = 800
-GRID_SIZE = 50  # Room size in pixels
+GRID_SIZE = 50  # Largest room size in pixels; big floors get smaller cells to fit the window
 SIDEBAR_WIDTH = 300
+FPS = 30  # Frame cap of `run`
+MIN_LABEL_SIZE = 20  # Cells smaller than this are drawn without their room type label
+SEEK_STEP = 10  # Seconds skipped by the arrow keys in replays
+TIMELINE = pygame.Rect(WINDOW_WIDTH - SIDEBAR_WIDTH + 20, WINDOW_HEIGHT - 60, SIDEBAR_WIDTH - 40, 16)
 
 # Colors for various room types and agents
 COLORS = {
@@ -22,131 +28,194 @@ COLORS = {
     "agent_occupant": (0, 255, 255),  # Cyan for Occupants
     "agent_responder": (255, 0, 0),  # Red for Emergency Responders
 }
+ROOM_COLORS = {
+    "H": COLORS["hallway"],
+    "S": COLORS["store"],
+    "R": COLORS["restroom"],
+    "N": COLORS["normal_exit"],
+    "E": COLORS["emergency_exit"],
+}
+
+def cells(mask):
+    """(row, col) of the True cells of a floor mask."""
+    return [(int(row), int(col)) for row, col in zip(*np.nonzero(mask))]
+
 
 class PygameInterface:
-    def __init__(self, building, agents):
+    """
+    Pygame view of one floor at a time, drawn from `viewer.Snapshot`s rather than from
+    the live building, so it can run in its own process (see `viewer.Viewer`). Each
+    floor's static look (room colours, grid and labels) is drawn once into a cached
+    surface, and rendered text is cached too. A frame only repaints the cells whose
+    fire flag or occupants changed since the previous one, plus the sidebar when its
+    counts changed, and hands just those rectangles to `pygame.display.update`. `run`
+    is capped at `fps` frames per second.
+    """
+
+    def __init__(self, layout, fps=FPS):
         """
         Initialize the Pygame interface.
         Args:
-            building: Instance of the Building class.
-            agents: List of agent objects with `location` attributes pointing to a Room.
+            layout: `viewer.Layout` of the building: its size and the room type of every cell.
+            fps: Frame cap of `run`.
         """
-        self.building = building
-        self.agents = agents
+        self.layout = layout
+        self.fps = fps
         self.current_floor = 0
+        self.cell = max(1, min(GRID_SIZE, (WINDOW_WIDTH - SIDEBAR_WIDTH) // layout.cols, WINDOW_HEIGHT // layout.rows))
         pygame.init()
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Building Emergency Simulation")
         self.font = pygame.font.Font(None, 24)
+        self.small_font = pygame.font.Font(None, 20)
+        self.clock = pygame.time.Clock()
         self.running = True
+        self.texts = {}  # Rendered text surfaces, by string
+        self.floor_surfaces = {}  # Static look of each floor, drawn on first view
+        self.shown = {}  # (row, col) -> what the cell currently shows, for the cells not in their static look
+        self.previous = None  # Snapshot of the last frame
+        self.sidebar_state = None
+        self.full_redraw = True
+
+    def text(self, string):
+        surface = self.texts.get(string)
+        if surface is None:
+            surface = self.texts[string] = self.font.render(string, True, COLORS["text"])
+        return surface
+
+    def floor_surface(self, floor):
+        """Cached surface with the room colours, borders and labels of a floor."""
+        surface = self.floor_surfaces.get(floor)
+        if surface is None:
+            surface = pygame.Surface((self.layout.cols * self.cell, self.layout.rows * self.cell))
+            surface.fill(COLORS["background"])
+            room_types = self.layout.room_types[floor]
+            for cell in cells(room_types != ""):
+                self.draw_room(surface, cell, ROOM_COLORS.get(str(room_types[cell]), COLORS["background"]), floor)
+            self.floor_surfaces[floor] = surface
+        return surface
+
+    def cell_rect(self, cell):
+        row, col = cell
+        return pygame.Rect(col * self.cell, row * self.cell, self.cell, self.cell)
+
+    def draw_room(self, surface, cell, color, floor):
+        """Room rectangle, grid border and, if the cell is big enough, the room type label of `floor`."""
+        rect = self.cell_rect(cell)
+        pygame.draw.rect(surface, color, rect)
+        if self.cell > 2:
+            pygame.draw.rect(surface, (0, 0, 0), rect, 1)  # Grid border
+        if self.cell >= MIN_LABEL_SIZE:
+            room_type = str(self.layout.room_types[floor][cell])
+            surface.blit(self.text(room_type), (rect.x + self.cell // 4, rect.y + self.cell // 4))
 
-    def draw_grid(self):
-        """Draw the building layout for the current floor."""
-        floor_layout = self.building.layout[self.current_floor]
-        for row_index, row in enumerate(floor_layout):
-            for col_index, room in enumerate(row):
-                if room:
-                    # Room rectangle
-                    x = col_index * GRID_SIZE
-                    y = row_index * GRID_SIZE
-                    rect = pygame.Rect(x, y, GRID_SIZE, GRID_SIZE)
-                    color = self.get_room_color(room)
-                    pygame.draw.rect(self.screen, color, rect)
-                    pygame.draw.rect(self.screen, (0, 0, 0), rect, 1)  # Grid border
-
-                    # Room type label
-                    text_surface = self.font.render(room.room_type, True, COLORS["text"])
-                    self.screen.blit(
-                        text_surface,
-                        (x + GRID_SIZE // 4, y + GRID_SIZE // 4),
-                    )
-
-    def draw_agents(self):
-        """Draw agents as dots in their current rooms, handling multiple agents per room."""
-        agent_positions = {"occupants": {}, "responders": {}}  # Dictionary to track agents by type
-
-        # Group agents by their types and locations (rooms)
-        for agent in self.agents:
-            if agent.location and agent.location.floor == self.current_floor:
-                floor = agent.location.floor
-                row = agent.location.row
-                col = agent.location.col
-                key = (row, col)
-                if agent.type=="Occupant":
-                    agent_positions["occupants"].setdefault(key, []).append(agent)
-                elif agent.type=="Responder":
-                    agent_positions["responders"].setdefault(key, []).append(agent)
-
-        # Draw Occupant agents as dots
-        for (row, col), agents in agent_positions["occupants"].items():
-            x = col * GRID_SIZE + GRID_SIZE // 2
-            y = row * GRID_SIZE + GRID_SIZE // 2
-
-            # Spread out dots slightly for multiple agents in the same room
-            for index, agent in enumerate(agents):
-                offset_x = (index % 3 - 1) * GRID_SIZE // 6  # Offset in X direction
-                offset_y = (index // 3 - 1) * GRID_SIZE // 6  # Offset in Y direction
-                pygame.draw.circle(self.screen, COLORS["agent_occupant"], (x + offset_x, y + offset_y), GRID_SIZE // 8)
-
-        # Draw Emergency Responder agents as dots
-        for (row, col), agents in agent_positions["responders"].items():
-            x = col * GRID_SIZE + GRID_SIZE // 2
-            y = row * GRID_SIZE + GRID_SIZE // 2
-
-            # Spread out dots slightly for multiple agents in the same room
-            for index, agent in enumerate(agents):
-                offset_x = (index % 3 - 1) * GRID_SIZE // 6  # Offset in X direction
-                offset_y = (index // 3 - 1) * GRID_SIZE // 6  # Offset in Y direction
-                pygame.draw.circle(self.screen, COLORS["agent_responder"], (x + offset_x, y + offset_y), GRID_SIZE // 8)
-
-    def draw_sidebar(self):
-        """Draw the sidebar with controls and information."""
+    def cell_state(self, snapshot, cell):
+        """What a cell shows: fire, occupied and its occupants and responders."""
+        occupants, responders = snapshot.cells[self.current_floor].get(cell, (0, 0))
+        return bool(snapshot.fire[self.current_floor][cell]), occupants + responders > 0, occupants, responders
+
+    def draw_cell(self, cell, state):
+        fire, occupied, occupants, responders = state
+        rect = self.cell_rect(cell)
+        if not fire and not occupied:
+            self.screen.blit(self.floor_surfaces[self.current_floor], rect, rect)
+            return rect
+        self.draw_room(self.screen, cell, COLORS["fire"] if fire else COLORS["occupied"], self.current_floor)
+        # Spread out dots slightly for multiple agents in the same room, responders after occupants
+        x, y = rect.centerx, rect.centery
+        radius = max(1, self.cell // 8)
+        for index in range(occupants + responders):
+            offset_x = (index % 3 - 1) * self.cell // 6  # Offset in X direction
+            offset_y = (index // 3 - 1) * self.cell // 6  # Offset in Y direction
+            color = COLORS["agent_occupant"] if index < occupants else COLORS["agent_responder"]
+            pygame.draw.circle(self.screen, color, (x + offset_x, y + offset_y), radius)
+        return rect
+
+    def draw_floor(self, snapshot):
+        """
+        Repaints the cells of the current floor whose state changed since the previous
+        snapshot (every cell after a floor switch) and returns their rectangles.
+        """
+        floor = self.current_floor
+        fire = snapshot.fire[floor]
+        if self.full_redraw or self.previous is None:
+            self.screen.fill(COLORS["background"], (0, 0, WINDOW_WIDTH - SIDEBAR_WIDTH, WINDOW_HEIGHT))
+            self.screen.blit(self.floor_surface(floor), (0, 0))
+            self.shown = {}
+            changed_fire = fire
+        else:
+            changed_fire = fire != self.previous.fire[floor]
+        candidates = set(self.shown) | set(snapshot.cells[floor])
+        candidates.update(cells(changed_fire))
+
+        rects = []
+        for cell in candidates:
+            state = self.cell_state(snapshot, cell)
+            if state == self.shown.get(cell, (False, False, 0, 0)):
+                continue
+            rects.append(self.draw_cell(cell, state))
+            if state[0] or state[1]:
+                self.shown[cell] = state
+            else:
+                self.shown.pop(cell, None)
+        if self.full_redraw:
+            self.full_redraw = False
+            return [pygame.Rect(0, 0, WINDOW_WIDTH - SIDEBAR_WIDTH, WINDOW_HEIGHT)]
+        return rects
+
+    def draw_sidebar(self, snapshot):
+        """Draw the sidebar with controls and information, when the floor counts, metrics or selection changed."""
+        counts = snapshot.floor_counts
+        if (counts, snapshot.metrics, self.current_floor) == self.sidebar_state:
+            return []
+        self.sidebar_state = (counts, snapshot.metrics, self.current_floor)
         sidebar_rect = pygame.Rect(WINDOW_WIDTH - SIDEBAR_WIDTH, 0, SIDEBAR_WIDTH, WINDOW_HEIGHT)
         pygame.draw.rect(self.screen, COLORS["sidebar"], sidebar_rect)
 
         # Floor buttons
-        for i in range(self.building.floors):
-            button_rect = pygame.Rect(WINDOW_WIDTH - SIDEBAR_WIDTH + 20, 20 + i * 50, 100, 30)
+        for i in range(self.layout.floors):
+            button_rect = pygame.Rect(WINDOW_WIDTH - SIDEBAR_WIDTH + 20, 20 + i * 50, 140, 30)
             pygame.draw.rect(self.screen, COLORS["hallway"], button_rect)
-            text_surface = self.font.render(f"Floor {i}", True, COLORS["text"])
-            self.screen.blit(text_surface, (button_rect.x + 10, button_rect.y + 5))
-
-        # Placeholder for messages
-        message_surface = self.font.render("Agent Messages:", True, COLORS["text"])
-        self.screen.blit(message_surface, (WINDOW_WIDTH - SIDEBAR_WIDTH + 20, 200))
-
-        # Placeholder for performance metrics
-        metrics_surface = self.font.render("Performance Metrics:", True, COLORS["text"])
-        self.screen.blit(metrics_surface, (WINDOW_WIDTH - SIDEBAR_WIDTH + 20, 400))
-
-    def get_room_color(self, room):
-        """Get the color for a room based on its type or state."""
-        if room.fire:
-            return COLORS["fire"]
-        elif room.is_occupied:
-            return COLORS["occupied"]
-        elif room.room_type == "H":
-            return COLORS["hallway"]
-        elif room.room_type == "S":
-            return COLORS["store"]
-        elif room.room_type == "R":
-            return COLORS["restroom"]
-        elif room.room_type == "N":
-            return COLORS["normal_exit"]
-        elif room.room_type == "E":
-            return COLORS["emergency_exit"]
-        return COLORS["background"]
-
-    def update(self):
-        """Main update loop for the interface."""
-        self.screen.fill(COLORS["background"])
-        self.draw_grid()
-        self.draw_agents()
-        self.draw_sidebar()
-        pygame.display.flip()
-
-    def run(self):
-        """Run the Pygame interface."""
+            self.screen.blit(self.text(f"Floor {i} ({counts[i]})"), (button_rect.x + 10, button_rect.y + 5))
+
+        # Live metrics, below the last floor button; their text changes all the time,
+        # so it is rendered without the cache
+        message_lines, performance_lines = snapshot.metrics
+        y = max(200, 30 + self.layout.floors * 50)
+        for title, lines in (("Agent Messages:", message_lines), ("Performance Metrics:", performance_lines)):
+            self.screen.blit(self.text(title), (WINDOW_WIDTH - SIDEBAR_WIDTH + 20, y))
+            for i, line in enumerate(lines):
+                self.screen.blit(self.small_font.render(line, True, COLORS["text"]),
+                                 (WINDOW_WIDTH - SIDEBAR_WIDTH + 20, y + 26 + i * 20))
+            y += 40 + len(lines) * 20
+        return [sidebar_rect]
+
+    def update(self, snapshot):
+        """Draws one snapshot, pushing only the changed rectangles to the display; returns them."""
+        rects = self.draw_floor(snapshot) + self.draw_sidebar(snapshot)
+        self.previous = snapshot
+        if rects:
+            pygame.display.update(rects)
+        return rects
+
+    def latest(self, snapshots):
+        """
+        Drains `snapshots` without blocking and returns the newest one, the last frame's
+        if none arrived, or None once the simulation sent its end marker.
+        """
+        snapshot = self.previous
+        while True:
+            try:
+                received = snapshots.get_nowait()
+            except queue.Empty:
+                return snapshot
+            if received is None:
+                self.running = False
+                return None
+            snapshot = received
+
+    def run(self, snapshots):
+        """Run the Pygame interface on the snapshots read from the `snapshots` queue."""
         while self.running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -157,13 +226,63 @@ class PygameInterface:
                     if x > WINDOW_WIDTH - SIDEBAR_WIDTH:
                         self.handle_sidebar_click(x, y)
 
-            self.update()
+            snapshot = self.latest(snapshots)
+            if snapshot is not None and (snapshot is not self.previous or self.full_redraw):
+                self.update(snapshot)
+            self.clock.tick(self.fps)
+        pygame.quit()
+
+    def draw_timeline(self, time, start, end):
+        """Replay position: the time and a bar from the trace start to its end."""
+        area = pygame.Rect(TIMELINE.x, TIMELINE.y - 30, TIMELINE.width, TIMELINE.height + 30)
+        pygame.draw.rect(self.screen, COLORS["sidebar"], area)
+        self.screen.blit(self.font.render(f"{time:.1f} s / {end:.1f} s", True, COLORS["text"]), area.topleft)
+        pygame.draw.rect(self.screen, COLORS["hallway"], TIMELINE, 1)
+        progress = (time - start) / (end - start) if end > start else 1
+        pygame.draw.rect(self.screen, COLORS["hallway"], (TIMELINE.x, TIMELINE.y, int(TIMELINE.width * progress),
+                                                          TIMELINE.height))
+        return area
+
+    def replay(self, trace, speed=1.0):
+        """
+        Plays a recorded run (a `tracing.TraceReader`) back at `speed` times real time.
+        Space pauses, the arrow keys seek SEEK_STEP seconds and a click on the timeline
+        seeks to that time; every seek is a binary search over the trace's chunks.
+        """
+        time, playing, shown = trace.start, True, None
+        while self.running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        playing = not playing
+                    elif event.key == pygame.K_LEFT:
+                        time -= SEEK_STEP
+                    elif event.key == pygame.K_RIGHT:
+                        time += SEEK_STEP
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    x, y = event.pos
+                    if TIMELINE.collidepoint(x, y):
+                        time = trace.start + (x - TIMELINE.x) / TIMELINE.width * (trace.end - trace.start)
+                    elif x > WINDOW_WIDTH - SIDEBAR_WIDTH:
+                        self.handle_sidebar_click(x, y)
+
+            time = min(max(time, trace.start), trace.end)
+            if time != shown or self.full_redraw:
+                self.update(trace.snapshot(time))
+                pygame.display.update(self.draw_timeline(time, trace.start, trace.end))
+                shown = time
+            elapsed = self.clock.tick(self.fps) / 1000
+            if playing:
+                time += elapsed * speed
         pygame.quit()
 
     def handle_sidebar_click(self, x, y):
         """Handle clicks on the sidebar."""
-        for i in range(self.building.floors):
+        for i in range(self.layout.floors):
             if 20 + i * 50 <= y <= 50 + i * 50:
-                self.current_floor = i
+                if i != self.current_floor:
+                    self.current_floor = i
+                    self.full_redraw = True
                 break
-
@@ -2,63 +2,161 @@ from Agents.OccupantAgent import OccupantAgent
 from Agents.BMSAgent import BMSAgent
 from Agents.EmergencyResponderAgent import EmergencyResponderAgent
 from Agents.EmergencyAgent import EmergencyAgent
+from Agents.SimulationAgent import SimulationAgent
+import argparse
 import asyncio
 import random
-from building import building  # Ensure this is the correct import
-from interface import PygameInterface
-async def main():
+from spade.container import Container
+from building import create_building, DEFAULT_SIZE
+from clock import run_virtual
+from dispatch import ROLE_EMERGENCIES
+from metrics import MetricsRegistry
+from transport import InMemoryTransport
+
+SIMULATION_TIME = 200  # Segundos simulados até a simulação terminar
+
+
+async def main(floors=DEFAULT_SIZE["floors"], rows=DEFAULT_SIZE["rows"], cols=DEFAULT_SIZE["cols"], seed=None, headless=False,
+               num_occupants=None, functional_share=0.84, emergency_weights=None, spread_probability=None,
+               trace=None, metrics_path=None, outcomes=False):
+    """
+    Runs one simulation and returns the occupants' finish times in simulated seconds
+    (None for anyone still inside). A headless run has no interface and ends as soon
+    as every occupant is out. The scenario arguments left as None are drawn at random.
+    With `trace`, the run is recorded to that file (see `tracing.py`); with
+    `metrics_path`, its metrics are exported there every few seconds and at the end.
+    With `outcomes`, returns (finish time, alert latency) per occupant instead; the
+    latency is None for anyone never ordered to evacuate.
+    """
+    if headless:
+        # Sem XMPP: as mensagens circulam em memória, entre as filas dos agentes deste processo
+        SimulationAgent.transport = InMemoryTransport()
+        Container().reset()
+    metrics = SimulationAgent.metrics = MetricsRegistry()
+
+    building = create_building(floors, rows, cols, seed)
+    building.clock.start()
+    if spread_probability is not None:
+        building.fire_spread.spread_probability = spread_probability
+    recorder = None
+    if trace is not None:
+        from tracing import TraceRecorder
+
+        recorder = TraceRecorder(building, trace, SimulationAgent.transport)
+    rng = random.Random(seed)
     # Número de ocupantes a ser criado
-    num_occupants = random.randint(1, 10)
+    if num_occupants is None:
+        num_occupants = rng.randint(1, 10)
+    metrics.gauge("occupants", "Occupants in the simulation.").set(num_occupants)
     occupant_agents = []
-    occupied_locations = set()
     for i in range(1, num_occupants + 1):
-        condition = "functional" if random.random() < 0.84 else "disabled"
-        while True:
-            # Cria uma sala inicial aleatória
-            agent = OccupantAgent(
-                jid=f"occupant{i}@localhost",
-                password="isiapassword",
-                agent_name=f"Agent {i}",
-                condition=condition,
-                building=building,
-            )
-            # Verifica se a localização é única
-            if agent.location not in occupied_locations:
-                occupied_locations.add(agent.location)
-                occupant_agents.append(agent)
-                break
-
-    # Pass building as an argument to EmergencyResponderAgent and BMSAgent
-    cop_agent = EmergencyResponderAgent("cop@localhost", "isiapassword", role="cop", building=building)
-    fireman_agent = EmergencyResponderAgent("fireman@localhost", "isiapassword", role="fireman", building=building)
+        condition = "functional" if rng.random() < functional_share else "disabled"
+        # Cada ocupante começa numa sala livre diferente, sorteada do conjunto de salas livres
+        occupant_agents.append(OccupantAgent(
+            jid=f"occupant{i}@localhost",
+            password="isiapassword",
+            agent_name=f"Agent {i}",
+            condition=condition,
+            building=building,
+        ))
+
+    # Um responder de cada tipo; o BMS decide qual vai a cada emergência
+    responder_agents = [EmergencyResponderAgent(f"{role}@localhost", "isiapassword", role=role, building=building)
+                        for role in ROLE_EMERGENCIES]
 
     # Ensure building is passed to BMSAgent
-    bms_agent = BMSAgent("bms@localhost", "isiapassword", num_occupants, "BMS Agent", building=building)
+    bms_agent = BMSAgent("bms@localhost", "isiapassword", num_occupants, "BMS Agent", building=building,
+                         occupant_jids=[str(agent.jid) for agent in occupant_agents], responders=responder_agents)
 
-    emergency_agent = EmergencyAgent("emergency@localhost", "isiapassword", building)
+    emergency_agent = EmergencyAgent("emergency@localhost", "isiapassword", building, emergency_weights, seed)
 
     # Start all agents
     for agent in occupant_agents:
         await agent.start()
-    await cop_agent.start()
-    await fireman_agent.start()
+    for agent in responder_agents:
+        await agent.start()
     await bms_agent.start()
     await emergency_agent.start()
-    
-    agents=occupant_agents.append(cop_agent, fireman_agent)
+    exporter = asyncio.ensure_future(metrics.export_every(metrics_path)) if metrics_path else None
 
-    PygameInterface(building,agents)
+    if headless:
+        while building.clock.now() < SIMULATION_TIME and not all(agent.evacuated for agent in occupant_agents):
+            await asyncio.sleep(1)
+    else:
+        from viewer import Viewer  # pygame is only loaded by the viewer process
 
-    await asyncio.sleep(200)
+        # A janela corre noutro processo; fechá-la termina a simulação mais cedo
+        viewer = Viewer(building, metrics=metrics)
+        viewer.start()
+        while building.clock.now() < SIMULATION_TIME and viewer.is_open():
+            await asyncio.sleep(1)
+        viewer.close()
 
     # Stop all agents after the simulation
     for agent in occupant_agents:
         await agent.stop()
-    await cop_agent.stop()
-    await fireman_agent.stop()
+    for agent in responder_agents:
+        await agent.stop()
     await bms_agent.stop()
     await emergency_agent.stop()
+    if recorder is not None:
+        recorder.close()
+    if exporter is not None:
+        exporter.cancel()
+        metrics.export(metrics_path)
+
+    finish_times = [agent.finish_time for agent in occupant_agents]
+    alert_latencies = [agent.alert_latency for agent in occupant_agents]
+    report(finish_times, alert_latencies)
+    return list(zip(finish_times, alert_latencies)) if outcomes else finish_times
+
+
+def report(finish_times, alert_latencies):
+    """Prints how many occupants got out, when the last one did and how fast the BMS alert reached them."""
+    evacuated = [t for t in finish_times if t is not None]
+    print(f"Evacuated {len(evacuated)}/{len(finish_times)} occupants"
+          + (f", last one out after {max(evacuated):.1f} simulated seconds." if evacuated else "."))
+    latencies = sorted(latency * 1000 for latency in alert_latencies if latency is not None)
+    if latencies:
+        print(f"BMS alert latency over {len(latencies)} occupants: median {latencies[len(latencies) // 2]:.2f} ms, "
+              f"max {latencies[-1]:.2f} ms.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-agent building evacuation simulation.")
+    parser.add_argument("--floors", type=int, default=DEFAULT_SIZE["floors"])
+    parser.add_argument("--rows", type=int, default=DEFAULT_SIZE["rows"])
+    parser.add_argument("--cols", type=int, default=DEFAULT_SIZE["cols"])
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the layout and the scenario.")
+    parser.add_argument("--headless", action="store_true",
+                        help="No interface and no XMPP server: run on a virtual clock, as fast as the CPU allows.")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="No interface: split the occupants over this many processes (0 = one per core), in real time.")
+    parser.add_argument("--occupants", type=int, default=None, help="Number of occupants (random 1-10 by default).")
+    parser.add_argument("--trace", default=None, help="Record the run to this trace file.")
+    parser.add_argument("--replay", default=None, help="Play back a trace file instead of running a simulation.")
+    parser.add_argument("--metrics", default=None,
+                        help="Export live metrics to this file: Prometheus text for .prom, JSON otherwise.")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.replay is not None:
+        from interface import PygameInterface
+        from tracing import TraceReader
+
+        trace = TraceReader(args.replay)
+        PygameInterface(trace.layout).replay(trace)
+        raise SystemExit
+    if args.shards is not None:
+        from sharding import run_sharded
+
+        run_sharded(args.floors, args.rows, args.cols, args.seed, args.shards or None, args.occupants)
+        raise SystemExit
+    simulation = main(args.floors, args.rows, args.cols, args.seed, args.headless, args.occupants,
+                      trace=args.trace, metrics_path=args.metrics)
+    if args.headless:
+        run_virtual(simulation)
+    else:
+        asyncio.run(simulation)
@@ -0,0 +1,167 @@
+"""
+Live metrics of a simulation: counters, gauges and histograms, fed by the agents
+through `SimulationAgent.metrics`, shown in the interface's sidebar and exported
+as JSON or in the Prometheus text format.
+"""
+import asyncio
+import json
+import math
+import os
+
+EXPORT_INTERVAL = 5  # Seconds between exports of `export_every`
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def as_dict(self):
+        return {"value": self.value}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Histogram:
+    """
+    Fixed-size histogram with logarithmic buckets, `per_decade` of them per power of
+    ten between `low` and `high`, plus one for values up to `low` and one for values
+    above `high`. `observe` is O(1) (the bucket comes from a logarithm, not a search)
+    and memory does not grow with the number of observations. Percentiles are read
+    from the buckets, within one bucket width (about 26% with 10 per decade).
+    """
+
+    kind = "histogram"
+
+    def __init__(self, low=1e-6, high=1e3, per_decade=10):
+        self.low = low
+        self.per_decade = per_decade
+        self.size = round(math.log10(high / low) * per_decade)
+        self.bounds = [low * 10 ** (i / per_decade) for i in range(self.size + 1)]  # Upper bound of each bucket
+        self.counts = [0] * (self.size + 2)  # The last bucket has no upper bound
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value):
+        index = 0 if value <= self.low else min(self.size + 1, math.ceil(math.log10(value / self.low) * self.per_decade))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Value below which `q` percent of the observations fall, None before the first one."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                break
+        if index == 0:
+            estimate = self.min
+        elif index > self.size:
+            estimate = self.max
+        else:
+            estimate = math.sqrt(self.bounds[index - 1] * self.bounds[index])  # Geometric middle of the bucket
+        return min(max(estimate, self.min), self.max)
+
+    def as_dict(self):
+        return {"count": self.count, "sum": self.sum, "min": self.min if self.count else None,
+                "max": self.max if self.count else None,
+                **{f"p{q}": self.percentile(q) for q in (50, 90, 99)}}
+
+
+class MetricsRegistry:
+    """
+    Metrics by name and labels. `counter`, `gauge` and `histogram` return the metric,
+    creating it on first use, so call sites need no set-up; keep the returned object
+    on hot paths to skip the lookup.
+    """
+
+    def __init__(self):
+        self.metrics = {}  # (name, labels) -> metric, labels a sorted tuple of (key, value)
+        self.help = {}  # name -> description
+
+    def get(self, factory, name, help, labels, **options):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            metric = self.metrics[key] = factory(**options)
+            self.help.setdefault(name, help)
+        return metric
+
+    def counter(self, name, help="", **labels):
+        return self.get(Counter, name, help, labels)
+
+    def gauge(self, name, help="", **labels):
+        return self.get(Gauge, name, help, labels)
+
+    def histogram(self, name, help="", low=1e-6, high=1e3, **labels):
+        return self.get(Histogram, name, help, labels, low=low, high=high)
+
+    def find(self, name, **labels):
+        """The metric, or None if nothing recorded it yet."""
+        return self.metrics.get((name, tuple(sorted(labels.items()))))
+
+    def as_dict(self):
+        """{name: [{"labels": ..., values...}]}, as exported to JSON."""
+        exported = {}
+        for (name, labels), metric in sorted(self.metrics.items()):
+            exported.setdefault(name, []).append({"type": metric.kind, "labels": dict(labels), **metric.as_dict()})
+        return exported
+
+    def prometheus(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines, described = [], set()
+        for (name, labels), metric in sorted(self.metrics.items()):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind != "histogram":
+                lines.append(f"{name}{label_text(labels)} {metric.value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.bounds + ["+Inf"], metric.counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:.6g}"
+                lines.append(f"{name}_bucket{label_text(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{label_text(labels)} {metric.sum}")
+            lines.append(f"{name}_count{label_text(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes the metrics to `path`, in the Prometheus format for .prom files and as JSON otherwise."""
+        text = self.prometheus() if path.endswith(".prom") else json.dumps(self.as_dict(), indent=1)
+        partial = f"{path}.partial"
+        with open(partial, "w") as file:
+            file.write(text)
+        os.replace(partial, path)  # Readers never see a half-written file
+
+    async def export_every(self, path, interval=EXPORT_INTERVAL):
+        while True:
+            self.export(path)
+            await asyncio.sleep(interval)
+
+
+def label_text(labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}" if labels else ""
@@ -0,0 +1,164 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from Agents.EmergencyAgent import EMERGENCY_WEIGHTS
+from building import DEFAULT_SIZE
+
+# Intervalos de onde cada cenário sorteia os seus parâmetros
+MAX_OCCUPANTS = 10
+FUNCTIONAL_SHARE = (0.6, 1.0)
+SPREAD_PROBABILITY = (0.0, 0.2)
+PERCENTILES = (50, 90, 95, 99)
+
+
+def sample_scenario(seed, floors=DEFAULT_SIZE["floors"], rows=DEFAULT_SIZE["rows"], cols=DEFAULT_SIZE["cols"]):
+    """Scenario parameters drawn from `seed` alone, so a batch is the same on every machine."""
+    rng = random.Random(seed)
+    weights = {emergency: weight * rng.uniform(0.5, 1.5) for emergency, weight in EMERGENCY_WEIGHTS.items()}
+    total = sum(weights.values())
+    return {
+        "seed": seed,
+        "floors": floors,
+        "rows": rows,
+        "cols": cols,
+        "num_occupants": rng.randint(1, MAX_OCCUPANTS),
+        "functional_share": rng.uniform(*FUNCTIONAL_SHARE),
+        "emergency_weights": {emergency: weight / total for emergency, weight in weights.items()},
+        "spread_probability": rng.uniform(*SPREAD_PROBABILITY),
+    }
+
+
+def run_scenario(scenario):
+    """Worker: one headless run on a virtual clock, agent output discarded."""
+    from clock import run_virtual
+    from main import main  # Imported in the worker, SPADE is heavy
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        outcomes = run_virtual(main(
+            scenario["floors"], scenario["rows"], scenario["cols"], scenario["seed"], headless=True,
+            num_occupants=scenario["num_occupants"],
+            functional_share=scenario["functional_share"],
+            emergency_weights=scenario["emergency_weights"],
+            spread_probability=scenario["spread_probability"],
+            outcomes=True,
+        ))
+    evacuated = [t for t, _ in outcomes if t is not None]
+    alerted = [t for t, latency in outcomes if latency is not None]  # Ordered out; a NOTICE orders nobody out
+    return {
+        "scenario": scenario,
+        "evacuation_time": max(evacuated) if evacuated else None,
+        "evacuated": len(evacuated),
+        "alerted": len(alerted),
+        "trapped": sum(1 for t in alerted if t is None),
+        "wall_time": time.perf_counter() - started,
+    }
+
+
+class Aggregator:
+    """Collects results as they stream in and summarises them as percentiles."""
+
+    def __init__(self):
+        self.evacuation_times = []
+        self.trapped = []
+        self.runs = 0
+
+    def add(self, result):
+        self.runs += 1
+        self.trapped.append(result["trapped"])
+        if result["evacuation_time"] is not None:
+            self.evacuation_times.append(result["evacuation_time"])
+
+    def summary(self):
+        summary = {"runs": self.runs}
+        for name, values in (("evacuation_time", self.evacuation_times), ("trapped", self.trapped)):
+            if values:
+                summary[name] = dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(values, PERCENTILES).tolist()))
+                summary[name]["mean"] = float(np.mean(values))
+        summary["runs_with_trapped"] = sum(1 for trapped in self.trapped if trapped)
+        return summary
+
+
+def load_results(path):
+    """Results already in `path` (one JSON object per line); unreadable lines are skipped."""
+    results = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return results
+
+
+def drop_partial_line(path):
+    """Truncates `path` after its last newline, so appended results never continue a half-written one."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+
+
+def run_batch(runs, first_seed=0, workers=None, output=None, floors=DEFAULT_SIZE["floors"], rows=DEFAULT_SIZE["rows"], cols=DEFAULT_SIZE["cols"]):
+    """
+    Runs the scenarios seeded `first_seed .. first_seed + runs - 1` over a process pool.
+    Results are appended to `output` as they arrive, and the seeds already there are
+    skipped, so an interrupted batch resumes where it stopped.
+    """
+    aggregator = Aggregator()
+    done = set()
+    if output:
+        drop_partial_line(output)  # An interrupted write; its seed is run again
+        for result in load_results(output):
+            done.add(result["scenario"]["seed"])
+            aggregator.add(result)
+    scenarios = [sample_scenario(seed, floors, rows, cols) for seed in range(first_seed, first_seed + runs) if seed not in done]
+    print(f"{len(done)} scenarios already done, {len(scenarios)} to run on {workers or os.cpu_count()} processes.")
+
+    out = open(output, "a") if output else None
+    started = time.perf_counter()
+    try:
+        # Processos novos a cada lote: o container do SPADE é um singleton por processo
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            for result in pool.imap_unordered(run_scenario, scenarios):
+                aggregator.add(result)
+                if out:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - started
+    if scenarios:
+        print(f"{len(scenarios)} scenarios in {elapsed:.1f}s ({len(scenarios) / elapsed:.1f}/s)")
+    return aggregator.summary()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo batch of headless evacuation scenarios.")
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (all cores by default).")
+    parser.add_argument("--output", default=None, help="JSON-lines results file, resumed if it exists.")
+    parser.add_argument("--floors", type=int, default=DEFAULT_SIZE["floors"])
+    parser.add_argument("--rows", type=int, default=DEFAULT_SIZE["rows"])
+    parser.add_argument("--cols", type=int, default=DEFAULT_SIZE["cols"])
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = run_batch(args.runs, args.first_seed, args.workers, args.output, args.floors, args.rows, args.cols)
+    print(json.dumps(summary, indent=2))
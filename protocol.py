@@ -0,0 +1,151 @@
+"""
+Messages exchanged by the agents. Every body is one fixed-size binary record:
+
+    version u8 | kind u8 | emergency u8 | floor i16 | row i16 | col i16 | sent_at f64
+
+little-endian, 17 bytes. `room` is (floor, row, col), or None when the record
+carries -1s. `sent_at` is the sender's `time.time()`, so receivers can measure
+delivery latency. Receivers dispatch on `kind`; a record with another `version` is
+rejected rather than misread.
+
+`make_message` builds a RecordMessage that carries the raw record: the in-memory
+transports hand the message object itself to the receiver, which `read`s the record
+without any text step. Only a message that goes out over XMPP, whose bodies are text,
+has its `body` base64-encoded, on first access.
+"""
+
+import binascii
+import functools
+import struct
+from collections import namedtuple
+
+from slixmpp import JID
+from spade.message import Message
+from spade.template import Template
+
+PROTOCOL_VERSION = 1
+
+# Kinds of message
+EMERGENCY_REPORT = 1  # EmergencyAgent -> BMS: an emergency started, maybe in a room
+EVACUATION_ALERT = 2  # BMS -> occupants: evacuate
+NOTICE = 3  # BMS -> occupants: informational, no evacuation (e.g. informatic attack)
+RESPONDER_DISPATCH = 4  # BMS -> responder: go and handle an emergency (replaces any earlier one)
+EMERGENCY_RESOLVED = 5  # Responder -> BMS: emergency handled
+ELEVATORS_LOCKED = 6  # BMS -> occupants: elevators locked because of the emergency
+ELEVATORS_UNLOCKED = 7  # BMS -> occupants: elevators available again
+RESPONDER_RECALLED = 8  # BMS -> responder: the incident went to another responder
+RESPONDER_RELEASED = 9  # Responder -> BMS: cannot reach its incident, free for another one
+KINDS = (EMERGENCY_REPORT, EVACUATION_ALERT, NOTICE, RESPONDER_DISPATCH, EMERGENCY_RESOLVED, ELEVATORS_LOCKED,
+         ELEVATORS_UNLOCKED, RESPONDER_RECALLED, RESPONDER_RELEASED)
+KIND_SET = frozenset(KINDS)
+
+# Position in the tuple is the code on the wire
+EMERGENCY_TYPES = ("Fire", "Earthquake", "Gas Leak", "Security Threat", "Informatic Attack")
+EMERGENCY_CODES = {emergency: code for code, emergency in enumerate(EMERGENCY_TYPES)}
+
+RECORD = struct.Struct("<BBBhhhd")
+NO_ROOM = (-1, -1, -1)
+_text_buffer = bytearray(RECORD.size)  # Reused by `encode`: the base64 text is the only copy kept
+
+Payload = namedtuple("Payload", "kind emergency room sent_at")
+
+
+def pack(kind, emergency, room=None, sent_at=0.0):
+    """Binary record of a message, as bytes. `room` is (floor, row, col) or None."""
+    floor, row, col = NO_ROOM if room is None else room
+    return RECORD.pack(PROTOCOL_VERSION, kind, EMERGENCY_CODES[emergency], floor, row, col, sent_at)
+
+
+def encode(kind, emergency, room=None, sent_at=0.0):
+    """Binary record of a message as base64 text, for XMPP bodies."""
+    floor, row, col = NO_ROOM if room is None else room
+    RECORD.pack_into(_text_buffer, 0, PROTOCOL_VERSION, kind, EMERGENCY_CODES[emergency], floor, row, col, sent_at)
+    return binascii.b2a_base64(_text_buffer, newline=False).decode("ascii")
+
+
+def decode(body):
+    """
+    Payload of a record, given as raw bytes or as base64 text; ValueError if it is not
+    a record of this protocol version.
+    """
+    try:
+        record = binascii.a2b_base64(body) if type(body) is str else body
+        version, kind, emergency, floor, row, col, sent_at = RECORD.unpack(record)
+    except (binascii.Error, struct.error, TypeError) as error:
+        raise ValueError(f"Not a protocol record: {body!r}") from error
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version {version}, expected {PROTOCOL_VERSION}")
+    if kind not in KIND_SET or emergency >= len(EMERGENCY_TYPES):
+        raise ValueError(f"Unknown message kind {kind} or emergency {emergency}")
+    # tuple.__new__ skips the namedtuple's Python-level constructor
+    return tuple.__new__(Payload, (kind, EMERGENCY_TYPES[emergency], None if floor < 0 else (floor, row, col), sent_at))
+
+
+class RecordMessage(Message):
+    """SPADE Message carrying a raw record; its text `body` is only base64-encoded when read."""
+
+    def __init__(self, to=None, sender=None, record=b"", thread=None):
+        self.record = record
+        super().__init__(to, sender, None, thread)
+
+    @property
+    def body(self):
+        if self._body is None:
+            self._body = binascii.b2a_base64(self.record, newline=False).decode("ascii")
+        return self._body
+
+    @body.setter
+    def body(self, body):
+        if body is not None and not isinstance(body, str):
+            raise TypeError("'body' MUST be a string")
+        self._body = body
+
+
+@functools.lru_cache(maxsize=65536)
+def address(jid):
+    """JID of an address, parsed once; parsing dominates the cost of building a message."""
+    return JID(jid)
+
+
+def make_message(to, kind, emergency, room=None, sent_at=0.0, sender=None):
+    """RecordMessage holding the record of the message."""
+    return RecordMessage(to=address(str(to)), sender=address(sender or ""), record=pack(kind, emergency, room, sent_at))
+
+
+def read(message):
+    """Payload of a received message: its raw record if it never left the process, else its base64 body."""
+    record = getattr(message, "record", None)
+    return decode(message.body if record is None else record)
+
+
+class NoMessages(Template):
+    """Template of a behaviour that never reads messages, so none pile up in its queue."""
+
+    def match(self, message):
+        return False
+
+
+def room_ref(room):
+    """(floor, row, col) of a building Room, for `encode`."""
+    return None if room is None else (room.floor, room.row, room.col)
+
+
+def room_at(building, ref):
+    """The building Room a (floor, row, col) reference points to."""
+    floor, row, col = ref
+    return building.layout[floor][row][col]
+
+
+async def dispatch(handlers, message, owner):
+    """
+    Decodes `message` and awaits the coroutine registered for its kind with the payload.
+    Malformed messages are reported and ignored, as are kinds without a handler.
+    """
+    try:
+        payload = read(message)
+    except ValueError as error:
+        print(f"{owner}: message ignored, {error}")
+        return
+    handler = handlers.get(payload.kind)
+    if handler is not None:
+        await handler(payload)
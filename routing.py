@@ -0,0 +1,201 @@
+import heapq
+
+import numpy as np
+
+INFINITY = float("inf")
+LOCKABLE_LINKS = ("emergency_staircase", "elevator")
+
+
+class IncrementalRouter:
+    """
+    Distance/route table towards a set of target rooms (the exits by default) that is
+    repaired incrementally, Lifelong Planning A* style, instead of being rebuilt.
+
+    Every room keeps `g` (its current distance) and `rhs` (the one-step lookahead
+    `1 + min g(next room)` over open links into passable rooms, 0 for a passable target).
+    Rooms where the two disagree sit in a priority queue keyed by `min(g, rhs)`. The
+    router registers itself as a Building change listener: a room whose hazard flags
+    change only re-queues the rooms that can step into it, and a BMS lock change only
+    re-queues rooms with stairs or elevators. Queued rooms are repaired lazily on the
+    next query, so a burst of hazard events costs a single repair.
+    """
+
+    def __init__(self, building, targets=None):
+        self.building = building
+        self.rooms = list(building.rooms())
+        self.index = {room: i for i, room in enumerate(self.rooms)}
+        self.successors = [[] for _ in self.rooms]
+        self.predecessors = [[] for _ in self.rooms]
+        for i, room in enumerate(self.rooms):
+            for link, linked in (
+                ("connection", room.connections),
+                ("staircase", room.staircases),
+                ("emergency_staircase", room.emergency_staircases),
+                ("elevator", room.elevators),
+            ):
+                for to_room in linked:
+                    j = self.index[to_room]
+                    self.successors[i].append((j, link))
+                    self.predecessors[j].append(i)
+        self.lockable = [i for i, links in enumerate(self.successors) if any(link in LOCKABLE_LINKS for _, link in links)]
+        self.targets = {self.index[room] for room in (building.exits() if targets is None else targets)}
+        self.passable = [room.is_passable() for room in self.rooms]
+        self.open_links = self.current_open_links()
+
+        self.g = [INFINITY] * len(self.rooms)
+        self.rhs = [INFINITY] * len(self.rooms)
+        self.queue = []
+        self.counter = 0
+        self.repairs = 0  # Rooms whose distance was settled, over the router's lifetime
+        for i in self.targets:
+            self.update_room(i)
+        building.add_change_listener(self.room_changed)
+
+    def room_index(self, room):
+        return self.index[room]
+
+    def current_open_links(self):
+        return {link for link in ("connection", "staircase") + LOCKABLE_LINKS if self.building.link_open(link)}
+
+    def lookahead(self, i):
+        if i in self.targets and self.passable[i]:
+            return 0
+        best = INFINITY
+        for j, link in self.successors[i]:
+            if self.passable[j] and link in self.open_links and self.g[j] < best:
+                best = self.g[j]
+        return best + 1
+
+    def update_room(self, i):
+        self.rhs[i] = self.lookahead(i)
+        if self.g[i] != self.rhs[i]:
+            self.counter += 1
+            heapq.heappush(self.queue, (min(self.g[i], self.rhs[i]), self.counter, i))
+
+    def repair(self):
+        """Settles every queued room; stale queue entries are skipped."""
+        queue = self.queue
+        while queue:
+            key, _, i = heapq.heappop(queue)
+            g, rhs = self.g[i], self.rhs[i]
+            if g == rhs or key != min(g, rhs):
+                continue
+            self.repairs += 1
+            if g > rhs:
+                self.g[i] = rhs
+            else:
+                self.g[i] = INFINITY
+                self.update_room(i)
+            for p in self.predecessors[i]:
+                self.update_room(p)
+
+    def room_changed(self, room):
+        """Building change hook: `room` had its fire/unavailable flag flipped, None means locks changed."""
+        if room is None:
+            self.open_links = self.current_open_links()
+            for i in self.lockable:
+                self.update_room(i)
+            return
+        i = self.room_index(room)
+        passable = room.is_passable()
+        if passable == self.passable[i]:
+            return
+        self.passable[i] = passable
+        self.update_room(i)
+        for p in self.predecessors[i]:
+            self.update_room(p)
+
+    def distance(self, room):
+        self.repair()
+        distance = self.g[self.room_index(room)]
+        return None if distance == INFINITY else distance
+
+    def next_room(self, room, congestion=None):
+        """
+        Neighbour on a shortest path to the nearest target, or None if there is none.
+        `congestion(room)`, if given, breaks ties between equally short paths in favour
+        of the least congested room.
+        """
+        self.repair()
+        best, best_room = (INFINITY, 0), None
+        for j, link in self.successors[self.index[room]]:
+            if self.passable[j] and link in self.open_links and self.g[j] <= best[0]:
+                key = (self.g[j], congestion(self.rooms[j]) if congestion else 0)
+                if key < best:
+                    best, best_room = key, self.rooms[j]
+        return best_room
+
+
+class CsrRows:
+    """`rows[i]`: the targets of the edges leaving node `i` in a CSR (indptr, indices)."""
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    def __getitem__(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]].tolist()
+
+
+class CompactRouter(IncrementalRouter):
+    """
+    IncrementalRouter over the arrays of a CompactBuilding. Rooms are flat room indices,
+    successors and predecessors are read from the CSR and its reverse, link kinds are
+    LINK_KINDS codes and g/rhs/passable are NumPy arrays, so no RoomView or per-room
+    list is created. g and rhs start from the vectorised BFS of
+    `CompactBuilding.build_distance_field` instead of a first repair from the targets.
+    """
+
+    def __init__(self, building, targets=None):
+        from building import LINK_KINDS  # building imports this module
+
+        self.building = building
+        self.indptr, self.indices, self.link_kinds = building.indptr, building.indices, building.link_kinds
+        self.predecessors = CsrRows(*building.reverse_adjacency()[:2])
+        sources = np.repeat(np.arange(building.room_types.size), np.diff(self.indptr))
+        lockable_kinds = [LINK_KINDS.index(link) for link in LOCKABLE_LINKS]
+        self.lockable = np.unique(sources[np.isin(self.link_kinds, lockable_kinds)]).tolist()
+        targets = building.exits() if targets is None else targets
+        self.targets = {room.index for room in targets}
+        self.passable = ~(building.fire | building.unavailable).ravel()
+        self.open_links = self.current_open_links()
+
+        distances = building.build_distance_field(targets).distances
+        self.g = np.where(distances >= 0, distances, INFINITY)
+        self.rhs = self.g.copy()
+        self.queue = []
+        self.counter = 0
+        self.repairs = 0
+        building.add_change_listener(self.room_changed)
+
+    def room_index(self, room):
+        return room.index
+
+    def current_open_links(self):
+        return self.building.open_link_kinds()  # Indexed by link kind code
+
+    def usable(self, i):
+        """Successors of `i` reachable through an open link into a passable room."""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        successors = self.indices[start:end]
+        return successors[self.passable[successors] & self.open_links[self.link_kinds[start:end]]]
+
+    def lookahead(self, i):
+        if i in self.targets and self.passable[i]:
+            return 0
+        return self.g[self.usable(i)].min(initial=INFINITY) + 1
+
+    def distance(self, room):
+        distance = super().distance(room)
+        return None if distance is None else int(distance)
+
+    def next_room(self, room, congestion=None):
+        self.repair()
+        best, best_room = (INFINITY, 0), None
+        for j in self.usable(room.index).tolist():
+            if self.g[j] <= best[0]:
+                candidate = self.building.room(j)
+                key = (self.g[j], congestion(candidate) if congestion else 0)
+                if key < best:
+                    best, best_room = key, candidate
+        return best_room
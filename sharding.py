@@ -0,0 +1,365 @@
+"""
+Sharded runs: the occupants are split over worker processes ("shards") on one host,
+each with its own asyncio loop, so a large scenario uses every core. Shard 0 also
+runs the BMS, the EmergencyAgent and the responders.
+
+Every shard generates the same CompactBuilding from the seed, then points its
+fire/unavailable arrays at one `multiprocessing.shared_memory` block: a hazard set
+by any shard is visible to all without copies. What shared memory cannot do is run
+the route-cache hooks of the other processes, so a writer bumps a shared generation
+counter and every shard, every SYNC_INTERVAL seconds, diffs the flags against its
+last view and replays the changes through `Building.room_changed`. The BMS locks
+and the per-room occupant counts (for room capacities) are shared the same way.
+
+Messages between shards go through `ShardTransport`, an InMemoryTransport that
+hands messages for other shards' agents to a multiprocessing queue per shard.
+
+Shards run in real time: one virtual clock cannot be shared between processes.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import random
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+from spade.container import Container
+from spade.message import Message
+
+from Agents.BMSAgent import BMSAgent
+from Agents.EmergencyAgent import EmergencyAgent
+from Agents.EmergencyResponderAgent import EmergencyResponderAgent
+from Agents.OccupantAgent import OccupantAgent
+from Agents.SimulationAgent import SimulationAgent
+from building import OccupancyIndex, create_building
+from dispatch import ROLE_EMERGENCIES
+import protocol
+from transport import InMemoryTransport, OCCUPANTS_GROUP
+
+SYNC_INTERVAL = 0.05  # Seconds between two checks for changes made by other shards
+START_TIMEOUT = 120  # Seconds a shard waits at the start barrier for the others to be ready
+RESULT_POLL = 1.0  # Seconds between two checks for dead shards while waiting for results
+SHARED_GROUPS = (OCCUPANTS_GROUP,)  # Groups with members in every shard
+
+
+class SharedBuildingState:
+    """
+    Hazard flags, occupant counts and BMS locks of a building in one shared memory
+    block: fire and unavailable flags and an int32 occupant count per room index,
+    the doors/elevators locks, the change generation and each shard's number of
+    occupants still inside. Writes to the counters take `lock`.
+    """
+
+    def __init__(self, memory, size, shards, lock, owner=False):
+        self.memory = memory
+        self.lock = lock
+        self.owner = owner  # The coordinator unlinks the block at the end
+        self.building = None
+        self.applying = False  # Replaying another shard's changes, not to be published again
+        offset = 0
+        for name, dtype, length in self.fields(size, shards):
+            setattr(self, name, np.ndarray(length, dtype=dtype, buffer=memory.buf, offset=offset))
+            offset += np.dtype(dtype).itemsize * length
+        self.fire_seen = self.fire.copy()
+        self.unavailable_seen = self.unavailable.copy()
+        self.seen = int(self.generation[0])
+
+    @staticmethod
+    def fields(size, shards):
+        """Name, dtype and length of every array in the block, 8-byte fields first."""
+        return [
+            ("generation", np.int64, 1),
+            ("remaining", np.int64, shards),
+            ("occupants", np.int32, size),
+            ("fire", np.bool_, size),
+            ("unavailable", np.bool_, size),
+            ("locks", np.bool_, 2),
+        ]
+
+    @classmethod
+    def create(cls, building, shards, lock):
+        size = building.room_types.size
+        nbytes = sum(np.dtype(dtype).itemsize * length for _, dtype, length in cls.fields(size, shards))
+        state = cls(shared_memory.SharedMemory(create=True, size=nbytes), size, shards, lock, owner=True)
+        state.fire[:] = building.fire.ravel()
+        state.unavailable[:] = building.unavailable.ravel()
+        state.locks[:] = (building.lock_doors, building.lock_elevators)
+        state.fire_seen[:] = state.fire
+        state.unavailable_seen[:] = state.unavailable
+        return state
+
+    @classmethod
+    def attach(cls, name, size, shards, lock):
+        return cls(shared_memory.SharedMemory(name=name), size, shards, lock)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def bind(self, building):
+        """Makes a CompactBuilding keep its hazard flags and occupant counts in the shared block."""
+        self.building = building
+        building.fire = self.fire.reshape(building.room_types.shape)
+        building.unavailable = self.unavailable.reshape(building.room_types.shape)
+        building.occupancy = SharedOccupancyIndex(building, self)
+        building.add_change_listener(self.publish)
+        self.sync()
+
+    def publish(self, room):
+        """Building change hook: tells the other shards that something changed here."""
+        if self.applying:
+            return
+        if room is None:
+            self.locks[:] = (self.building.lock_doors, self.building.lock_elevators)
+        else:
+            self.fire_seen[room.index] = self.fire[room.index]  # Already applied here
+            self.unavailable_seen[room.index] = self.unavailable[room.index]
+        with self.lock:
+            self.generation[0] += 1
+            generation = int(self.generation[0])
+        if generation == self.seen + 1:
+            self.seen = generation  # Nobody else changed anything since the last sync
+
+    def sync(self):
+        """Replays the changes of the other shards through the building's change hooks."""
+        generation = int(self.generation[0])
+        if generation == self.seen:
+            return
+        fire, unavailable = self.fire.copy(), self.unavailable.copy()
+        changed = np.flatnonzero((fire != self.fire_seen) | (unavailable != self.unavailable_seen))
+        self.fire_seen, self.unavailable_seen, self.seen = fire, unavailable, generation
+        building = self.building
+        self.applying = True
+        try:
+            for index in changed:
+                building.room_changed(building.room(index))
+            building.lock_doors, building.lock_elevators = (bool(lock) for lock in self.locks)
+        finally:
+            self.applying = False
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(SYNC_INTERVAL)
+            self.sync()
+
+    def close(self):
+        if self.building is not None:
+            self.building.fire = self.building.fire.copy()
+            self.building.unavailable = self.building.unavailable.copy()
+        for name, _, _ in self.fields(0, 0):
+            setattr(self, name, None)  # No views may outlive the mapping
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class SharedOccupancyIndex(OccupancyIndex):
+    """OccupancyIndex of one shard's agents whose `count` sees the agents of every shard."""
+
+    def __init__(self, building, state):
+        super().__init__(building)
+        self.state = state
+
+    def move(self, agent, old_room, new_room):
+        super().move(agent, old_room, new_room)
+        if old_room == new_room:
+            return
+        with self.state.lock:
+            if old_room is not None:
+                self.state.occupants[old_room.index] -= 1
+            if new_room is not None:
+                self.state.occupants[new_room.index] += 1
+
+    def count(self, room):
+        return int(self.state.occupants[room.index])
+
+
+class ShardTransport(InMemoryTransport):
+    """
+    InMemoryTransport of one shard. A message for an agent of another shard (looked
+    up in `directory`, jid -> shard) is put in that shard's inbox, a multiprocessing
+    queue drained by a thread that hands each message to the event loop. A message
+    to a shared group also goes to every other shard, which delivers it to its own
+    members.
+    """
+
+    def __init__(self, shard, inboxes, directory):
+        super().__init__()
+        self.shard = shard
+        self.inboxes = inboxes
+        self.directory = directory
+        self.forwarded = 0
+
+    def has_group(self, group):
+        return str(group) in SHARED_GROUPS or super().has_group(group)
+
+    async def send(self, msg, behaviour=None):
+        to = str(msg.to)
+        if to in SHARED_GROUPS:
+            for shard in range(len(self.inboxes)):
+                if shard != self.shard:
+                    self.forward(shard, msg)
+            if to in self.groups:
+                await super().send(msg)
+        elif to not in self.agents and self.directory.get(to, self.shard) != self.shard:
+            self.forward(self.directory[to], msg)
+        else:
+            await super().send(msg)
+
+    def forward(self, shard, msg):
+        self.forwarded += 1
+        sender = None if msg.sender is None else str(msg.sender)
+        body = getattr(msg, "record", None) or msg.body  # Raw records cross the queue as bytes, no base64
+        self.inboxes[shard].put((str(msg.to), sender, body, msg.thread))  # The agents set no metadata
+
+    def start(self, loop):
+        """Starts handing this shard's inbox over to `loop`."""
+        inbox = self.inboxes[self.shard]
+
+        def pump():
+            for record in iter(inbox.get, None):
+                loop.call_soon_threadsafe(self.arrived, record)
+
+        threading.Thread(target=pump, daemon=True).start()
+
+    def stop(self):
+        self.inboxes[self.shard].put(None)
+
+    def arrived(self, record):
+        to, sender, body, thread = record
+        if isinstance(body, bytes):
+            msg = protocol.RecordMessage(to=to, sender=sender, record=body, thread=thread)
+        else:
+            msg = Message(to=to, sender=sender, body=body, thread=thread)
+        for member in self.groups.get(to, [to]):
+            self.deliver(msg, member)
+
+
+def run_sharded(floors, rows, cols, seed=None, shards=None, num_occupants=None, functional_share=0.84,
+                emergency_weights=None, spread_probability=None):
+    """
+    Runs one simulation over `shards` processes (one per core by default) and returns
+    the occupants' finish times in simulated seconds, like `main.main`.
+    """
+    from main import report
+
+    shards = shards or os.cpu_count()
+    building = create_building(floors, rows, cols, seed, compact=True)
+    rng = random.Random(seed)
+    if num_occupants is None:
+        num_occupants = rng.randint(1, 10)
+    # The coordinator picks every start room, so that shards never place two occupants together
+    rooms = building.occupancy.free_rooms().sample(num_occupants, building.random)
+    if len(rooms) < num_occupants:
+        raise ValueError("Não há lugares disponíveis no edifício para posicionar os agentes.")
+    occupants = []
+    for i, room in enumerate(rooms, start=1):
+        condition = "functional" if rng.random() < functional_share else "disabled"
+        occupants.append((i, condition, room.index))
+    directory = {f"occupant{i}@localhost": (i - 1) % shards for i, _, _ in occupants}
+    scenario = {
+        "floors": floors, "rows": rows, "cols": cols, "seed": seed, "shards": shards,
+        "occupants": occupants, "directory": directory,
+        "emergency_weights": emergency_weights, "spread_probability": spread_probability,
+    }
+
+    context = multiprocessing.get_context("spawn")
+    lock = context.Lock()
+    state = SharedBuildingState.create(building, shards, lock)
+    state.remaining[:] = np.bincount([directory[jid] for jid in directory], minlength=shards)
+    inboxes = [context.Queue() for _ in range(shards)]
+    results = context.Queue()
+    barrier = context.Barrier(shards)
+    processes = [
+        context.Process(target=run_shard, args=(shard, scenario, state.name, inboxes, lock, barrier, results))
+        for shard in range(shards)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        outcomes, received = {}, 0
+        while received < len(processes):
+            try:
+                outcomes.update(results.get(timeout=RESULT_POLL))
+                received += 1
+            except queue.Empty:
+                failed = {shard: process.exitcode for shard, process in enumerate(processes)
+                          if process.exitcode not in (None, 0)}
+                if failed:
+                    raise RuntimeError(f"Shard(s) died before returning their results (exit codes {failed}).")
+        for process in processes:
+            process.join()
+    except BaseException:
+        # The others would wait forever at the barrier or for their messages
+        barrier.abort()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            if process.pid is not None:
+                process.join()
+        raise
+    finally:
+        state.close()
+    finish_times = [outcomes[i][0] for i, _, _ in occupants]
+    report(finish_times, [outcomes[i][1] for i, _, _ in occupants])
+    return finish_times
+
+
+def run_shard(shard, scenario, state_name, inboxes, lock, barrier, results):
+    """Worker process: runs one shard and puts {occupant: (finish time, alert latency)} in `results`."""
+    results.put(asyncio.run(shard_main(shard, scenario, state_name, inboxes, lock, barrier)))
+
+
+async def shard_main(shard, scenario, state_name, inboxes, lock, barrier):
+    from main import SIMULATION_TIME
+
+    transport = ShardTransport(shard, inboxes, scenario["directory"])
+    SimulationAgent.transport = transport
+    Container().reset()
+    building = create_building(scenario["floors"], scenario["rows"], scenario["cols"], scenario["seed"], compact=True)
+    state = SharedBuildingState.attach(state_name, building.room_types.size, scenario["shards"], lock)
+    state.bind(building)
+    if scenario["spread_probability"] is not None:
+        building.fire_spread.spread_probability = scenario["spread_probability"]
+
+    occupants = {}
+    for i, condition, room_index in scenario["occupants"]:
+        jid = f"occupant{i}@localhost"
+        if scenario["directory"][jid] == shard:
+            occupants[i] = OccupantAgent(jid, "isiapassword", f"Agent {i}", condition, building,
+                                         start_room=building.room(room_index))
+    agents = list(occupants.values())
+    if shard == 0:
+        responders = [EmergencyResponderAgent(f"{role}@localhost", "isiapassword", role=role, building=building)
+                      for role in ROLE_EMERGENCIES]
+        bms = BMSAgent("bms@localhost", "isiapassword", len(scenario["occupants"]), "BMS Agent", building=building,
+                       occupant_jids=list(scenario["directory"]), responders=responders)
+        emergency = EmergencyAgent("emergency@localhost", "isiapassword", building, scenario["emergency_weights"],
+                                   scenario["seed"])
+        agents += responders + [bms, emergency]
+
+    loop = asyncio.get_running_loop()
+    transport.start(loop)
+    watcher = asyncio.ensure_future(state.watch())
+    # Every shard has its agents: the clocks start together. A shard that died breaks the barrier
+    await loop.run_in_executor(None, barrier.wait, START_TIMEOUT)
+    building.clock.start()
+    for agent in agents:
+        await agent.start()
+
+    while building.clock.now() < SIMULATION_TIME:
+        state.remaining[shard] = sum(not agent.evacuated for agent in occupants.values())
+        if not state.remaining.any():
+            break
+        await asyncio.sleep(1)
+
+    for agent in agents:
+        await agent.stop()
+    watcher.cancel()
+    transport.stop()
+    outcomes = {i: (agent.finish_time, agent.alert_latency) for i, agent in occupants.items()}
+    state.close()
+    return outcomes
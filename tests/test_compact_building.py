@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+from compact_building import CompactBuilding  # noqa: E402
+
+
+def edges(building):
+    """(from, to, kind) of every link, in a canonical order."""
+    sources = np.repeat(np.arange(building.room_types.size), np.diff(building.indptr))
+    return sorted(zip(sources.tolist(), building.indices.tolist(), building.link_kinds.tolist()))
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("size", [(3, 5, 5), (4, 8, 12)])
+def test_same_seed_same_layout(seed, size):
+    """A seed gives the same room types, stairs, elevators and exits in both storage modes."""
+    compact = create_building(*size, seed=seed, compact=True)
+    objects = CompactBuilding.from_building(create_building(*size, seed=seed))
+    assert np.array_equal(compact.room_types, objects.room_types)
+    assert edges(compact) == edges(objects)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compact_router_matches_incremental_router(seed):
+    """The CSR router gives the distances and next hops of IncrementalRouter as hazards and locks change."""
+    from routing import IncrementalRouter
+
+    building = create_building(3, 9, 11, seed=seed, compact=True)
+    rooms = list(building.rooms())
+    rng = np.random.default_rng(seed)
+    for room in rng.choice(rooms, 15, replace=False):
+        room.fire = True
+    reference, router = IncrementalRouter(building), building.exit_router()
+    for step in range(100):
+        if step % 25 == 0:
+            building.lock_elevators = not building.lock_elevators
+        room = rooms[rng.integers(len(rooms))]
+        room.unavailable = not room.unavailable
+        for room in rooms:
+            assert router.distance(room) == reference.distance(room)
+            assert router.next_room(room, building.occupancy.count) == reference.next_room(room, building.occupancy.count)
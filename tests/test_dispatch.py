@@ -0,0 +1,62 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+from dispatch import Dispatcher, solve_assignment  # noqa: E402
+
+
+def score(cost, rows):
+    """(pairs left unassigned or forbidden, total cost of the allowed ones) of an assignment."""
+    n, m = cost.shape
+    pairs = [(i, j) for i, j in enumerate(rows) if j >= 0 and np.isfinite(cost[i, j])]
+    return min(n, m) - len(pairs), sum(cost[i, j] for i, j in pairs)
+
+
+def brute_force(cost):
+    n, m = cost.shape
+    if n > m:
+        return min(score(cost.T, columns) for columns in itertools.permutations(range(n), m))
+    return min(score(cost, rows) for rows in itertools.permutations(range(m), n))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_solve_assignment_matches_brute_force(seed):
+    """As many pairs as possible, then the lowest total, on rectangular matrices with forbidden pairs."""
+    rng = np.random.default_rng(seed)
+    n, m = rng.integers(1, 6, size=2)
+    cost = rng.integers(0, 20, size=(n, m)).astype(float)
+    cost[rng.random((n, m)) < 0.3] = np.inf
+    rows = solve_assignment(cost)
+    assert rows.shape == (n,)
+    assigned = rows[rows >= 0]
+    assert len(set(assigned.tolist())) == len(assigned)
+    assert all(np.isfinite(cost[i, j]) for i, j in enumerate(rows) if j >= 0)
+    found, best = score(cost, rows), brute_force(cost)
+    assert found[0] == best[0]
+    assert found[1] == pytest.approx(best[1])
+
+
+class Responder:
+    def __init__(self, location, role="fireman"):
+        self.location, self.role, self.pace = location, role, 0.5
+
+
+def test_close_and_release_return_the_freed_responders():
+    """`close` and `release` free the responders of an incident and report them."""
+    building = create_building(2, 5, 5, seed=0)
+    near, far = Responder(building.layout[0][0][0]), Responder(building.layout[1][4][4])
+    dispatcher = Dispatcher(building, [near, far])
+    fire = dispatcher.open("Fire", building.layout[0][0][1])
+    assert dispatcher.solve() == [(near, fire)]
+    assert dispatcher.release(fire) == {near: fire}
+    assert dispatcher.incidents == [fire] and dispatcher.assignment == {}
+    dispatcher.solve()
+    assert dispatcher.close("Fire", building.layout[0][0][1]) == {near: fire}
+    assert dispatcher.incidents == [] and dispatcher.assignment == {}
+    assert dispatcher.close("Fire", building.layout[0][0][1]) == {}
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rooms_ignite_in_time_order(seed):
+    """`advance` hands out each room once, never before a burning neighbour could have reached it."""
+    building = create_building(3, 6, 6, seed=seed)
+    spread = building.fire_spread
+    spread.spread_probability = 1.0
+    spread.ignite(building.layout[0][0][0], 0.0)
+    ignited_at = {building.layout[0][0][0]: 0.0}
+    for until in range(5, 300, 5):
+        before = spread.next_ignition()
+        for room in spread.advance(until):
+            assert room not in ignited_at
+            assert before <= spread.now <= until
+            assert any(neighbour in ignited_at for neighbour in room.connections)
+            ignited_at[room] = spread.now
+    times = list(ignited_at.values())
+    assert times == sorted(times)
+    assert all(room.fire for room in ignited_at)
+
+
+def test_ignite_schedules_spread_from_now():
+    """A fire started at `now` spreads from `now`, not from the last `advance`."""
+    building = create_building(2, 5, 5, seed=1)
+    spread = building.fire_spread
+    spread.spread_probability = 1.0
+    spread.advance(10.0)
+    room = building.layout[1][2][2]
+    spread.ignite(room, 100.0)
+    assert room.fire
+    assert spread.pending() == sum(1 for connection in room.connections if not connection.fire)
+    assert spread.next_ignition() > 100.0
+    assert spread.advance(99.0) == []
+
+
+def test_ignite_cancels_a_pending_ignition():
+    """A room set on fire directly is not handed out again by `advance`."""
+    building = create_building(2, 5, 5, seed=2)
+    spread = building.fire_spread
+    spread.spread_probability = 1.0
+    first = building.layout[0][2][2]
+    spread.ignite(first, 0.0)
+    neighbour = next(iter(first.connections))
+    spread.ignite(neighbour, 0.0)
+    assert neighbour not in spread.advance(1000.0)
@@ -0,0 +1,45 @@
+import os
+import sys
+from collections import deque
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import connect_hallways  # noqa: E402
+
+
+def components(is_hallway, rows, cols):
+    """Number of 4-connected hallway components, by plain BFS."""
+    seen, count = set(), 0
+    for start in range(rows * cols):
+        if not is_hallway[start] or start in seen:
+            continue
+        count += 1
+        seen.add(start)
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            row, col = divmod(cell, cols)
+            for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                neighbour = r * cols + c
+                if 0 <= r < rows and 0 <= c < cols and is_hallway[neighbour] and neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+    return count
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("size", [(1, 9), (6, 6), (12, 17)])
+def test_connect_hallways_leaves_one_component(seed, size):
+    """Carving only turns other cells into hallways and leaves a single hallway component."""
+    rows, cols = size
+    rng = np.random.default_rng(seed)
+    is_hallway = (rng.random(rows * cols) < rng.uniform(0.05, 0.5)).tolist()
+    carved = connect_hallways(is_hallway, rows, cols)
+    assert not any(is_hallway[cell] for cell in carved)
+    repaired = list(is_hallway)
+    for cell in carved:
+        repaired[cell] = True
+    assert components(repaired, rows, cols) == min(1, sum(is_hallway))
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Histogram, MetricsRegistry  # noqa: E402
+
+
+def test_histogram_buckets():
+    """Each value lands in the bucket whose bounds hold it; the ends catch everything outside."""
+    histogram = Histogram(low=1e-3, high=1e2)
+    assert histogram.size == 50 and len(histogram.counts) == 52
+    rng = np.random.default_rng(0)
+    for value in 10 ** rng.uniform(-5, 4, 2000):
+        before = list(histogram.counts)
+        histogram.observe(value)
+        index = next(i for i, (old, new) in enumerate(zip(before, histogram.counts)) if new != old)
+        if value <= histogram.low:
+            assert index == 0
+        elif index > histogram.size:
+            assert value > histogram.bounds[-1] * (1 - 1e-9)
+        else:
+            assert histogram.bounds[index - 1] * (1 - 1e-9) < value <= histogram.bounds[index] * (1 + 1e-9)
+    assert sum(histogram.counts) == histogram.count == 2000
+
+
+@pytest.mark.parametrize("q", [50, 90, 99])
+def test_histogram_percentiles_within_a_bucket(q):
+    """Percentiles are off by less than one bucket width, about 26% with 10 buckets per decade."""
+    histogram = Histogram()
+    values = np.random.default_rng(q).lognormal(-4, 1.5, 5000)
+    for value in values:
+        histogram.observe(value)
+    exact = np.percentile(values, q)
+    assert exact / 10 ** 0.1 <= histogram.percentile(q) <= exact * 10 ** 0.1
+    assert Histogram().percentile(q) is None
+
+
+def test_export(tmp_path):
+    """JSON and Prometheus exports carry the same counts; histogram buckets are cumulative."""
+    registry = MetricsRegistry()
+    registry.counter("messages_total", "Messages sent.", kind="alert").inc(3)
+    latency = registry.histogram("latency_seconds", "Delivery latency.", low=1e-3, high=1.0)
+    for value in (0.0005, 0.002, 0.05, 0.05, 3.0):
+        latency.observe(value)
+    registry.export(str(tmp_path / "metrics.json"))
+    exported = json.loads((tmp_path / "metrics.json").read_text())
+    assert exported["messages_total"] == [{"type": "counter", "labels": {"kind": "alert"}, "value": 3}]
+    assert exported["latency_seconds"][0]["count"] == 5
+    assert exported["latency_seconds"][0]["max"] == 3.0
+
+    registry.export(str(tmp_path / "metrics.prom"))
+    lines = (tmp_path / "metrics.prom").read_text().splitlines()
+    assert 'messages_total{kind="alert"} 3' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    buckets = [int(line.rsplit(" ", 1)[1]) for line in lines if line.startswith("latency_seconds_bucket")]
+    assert buckets == sorted(buckets) and buckets[-1] == 5
+    assert 'latency_seconds_bucket{le="+Inf"} 5' in lines
+    assert "latency_seconds_count 5" in lines
+    assert not list(tmp_path.glob("*.partial"))
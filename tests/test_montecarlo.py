@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from montecarlo import drop_partial_line, load_results  # noqa: E402
+
+
+def result(seed):
+    return json.dumps({"scenario": {"seed": seed}, "evacuation_time": 10.0, "trapped": 0}) + "\n"
+
+
+def test_resume_after_partial_line(tmp_path):
+    """An interrupted write is cut off before appending, so the next result starts on its own line."""
+    path = str(tmp_path / "results.jsonl")
+    with open(path, "w") as f:
+        f.write(result(0) + result(1) + result(2)[:15])
+    drop_partial_line(path)
+    with open(path, "a") as f:
+        f.write(result(2) + result(3))
+    assert [r["scenario"]["seed"] for r in load_results(path)] == [0, 1, 2, 3]
+
+
+def test_bad_lines_are_skipped(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    with open(path, "w") as f:
+        f.write(result(0) + "{not json\n" + result(1))
+    assert [r["scenario"]["seed"] for r in load_results(path)] == [0, 1]
+
+
+def test_complete_file_is_untouched(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    with open(path, "w") as f:
+        f.write(result(0))
+    drop_partial_line(path)
+    drop_partial_line(str(tmp_path / "missing.jsonl"))
+    with open(path) as f:
+        assert f.read() == result(0)
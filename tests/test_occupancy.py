@@ -0,0 +1,63 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import FreeRoomSet, create_building  # noqa: E402
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_free_room_set_swap_remove(seed):
+    """Random adds and removes keep the list and the positions in step with a plain set."""
+    rng = random.Random(seed)
+    free, expected = FreeRoomSet(range(50)), set(range(50))
+    for _ in range(2000):
+        room = rng.randrange(60)
+        if rng.random() < 0.5:
+            free.add(room)
+            expected.add(room)
+        else:
+            free.remove(room)
+            expected.discard(room)
+        assert len(free) == len(expected)
+        assert all(free.rooms[position] == room for room, position in free.positions.items())
+    assert set(free) == expected
+    if expected:
+        assert free.choice(rng) in expected
+        assert set(free.sample(10, rng)) <= expected
+
+
+def test_free_room_set_empty_choice():
+    """Picking from an empty set raises IndexError."""
+    with pytest.raises(IndexError):
+        FreeRoomSet().choice()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_occupancy_index_tracks_moves(seed):
+    """Counts, free rooms, `is_occupied` and move listeners follow random moves, exits included."""
+    building = create_building(3, 5, 5, seed=seed)
+    occupancy = building.occupancy
+    rooms = list(building.rooms())
+    free = occupancy.free_rooms()
+    heard = []
+    occupancy.add_move_listener(lambda agent, room: heard.append((agent, room)))
+    rng = random.Random(seed)
+    where = {}
+    for _ in range(1000):
+        agent = rng.randrange(40)
+        room = None if rng.random() < 0.1 else rng.choice(rooms)
+        occupancy.move(agent, where.get(agent), room)
+        if where.get(agent) is not room:
+            assert heard[-1] == (agent, room)
+        where[agent] = room
+    for room in rooms:
+        inside = {agent for agent, at in where.items() if at is room}
+        assert occupancy.agents_in_room(room) == inside
+        assert room.is_occupied == bool(inside)
+        assert (room in free) == (not inside) == occupancy.is_free(room)
+    for floor in range(building.floors):
+        assert occupancy.floor_count(floor) == sum(1 for at in where.values() if at is not None and at.floor == floor)
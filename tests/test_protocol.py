@@ -0,0 +1,46 @@
+import os
+import struct
+import sys
+
+import pytest
+from spade.message import Message
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import protocol  # noqa: E402
+
+CASES = [(kind, emergency, room, sent_at)
+         for kind in protocol.KINDS
+         for emergency in protocol.EMERGENCY_TYPES
+         for room, sent_at in ((None, 0.0), ((2, 7, 11), 1712345678.125))]
+
+
+@pytest.mark.parametrize("kind, emergency, room, sent_at", CASES)
+def test_round_trip(kind, emergency, room, sent_at):
+    """Raw records, base64 text and messages all decode to what was packed."""
+    payload = (kind, emergency, room, sent_at)
+    assert protocol.decode(protocol.pack(*payload)) == payload
+    assert protocol.decode(protocol.encode(*payload)) == payload
+    message = protocol.make_message("bms@localhost", *payload)
+    assert protocol.read(message) == payload
+    assert message.body == protocol.encode(*payload)  # What XMPP would carry
+    assert protocol.read(Message(to="bms@localhost", body=message.body)) == payload
+
+
+def test_record_size():
+    """A record is the documented 17 bytes."""
+    assert len(protocol.pack(protocol.NOTICE, "Fire")) == protocol.RECORD.size == 17
+
+
+@pytest.mark.parametrize("body", [
+    "not base64!",
+    b"short",
+    protocol.pack(protocol.NOTICE, "Fire") + b"x",
+    struct.pack("<BBBhhhd", protocol.PROTOCOL_VERSION + 1, protocol.NOTICE, 0, -1, -1, -1, 0.0),
+    struct.pack("<BBBhhhd", protocol.PROTOCOL_VERSION, 200, 0, -1, -1, -1, 0.0),
+    struct.pack("<BBBhhhd", protocol.PROTOCOL_VERSION, protocol.NOTICE, 200, -1, -1, -1, 0.0),
+])
+def test_malformed_records_are_rejected(body):
+    """Bad base64, wrong sizes, other versions and unknown codes raise ValueError."""
+    with pytest.raises(ValueError):
+        protocol.decode(body)
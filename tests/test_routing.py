@@ -0,0 +1,35 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from building import create_building  # noqa: E402
+from routing import IncrementalRouter  # noqa: E402
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_router_matches_full_rebuild(seed):
+    """After every hazard or lock change, the repaired distances equal a fresh BFS from the exits."""
+    building = create_building(3, 7, 7, seed=seed)
+    router = IncrementalRouter(building)
+    rooms = list(building.rooms())
+    rng = random.Random(seed)
+    for step in range(60):
+        if step % 20 == 0:
+            building.lock_elevators = not building.lock_elevators
+        room = rng.choice(rooms)
+        if rng.random() < 0.5:
+            room.fire = not room.fire
+        else:
+            room.unavailable = not room.unavailable
+        field = building.build_distance_field(building.exits())
+        for room in rooms:
+            distance = field.distances.get(room)
+            assert router.distance(room) == distance
+            if distance:  # Not an exit: the next hop is one room closer and can be stepped into
+                next_room = router.next_room(room)
+                assert next_room.is_passable()
+                assert field.distances[next_room] == distance - 1
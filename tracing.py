@@ -0,0 +1,349 @@
+"""
+Binary traces of a run, and their replay.
+
+`TraceRecorder` follows a building (agent moves, hazard flags and BMS locks) and,
+optionally, a transport (messages), and appends them to a file in chunks:
+
+    header  | magic "MAESTRCE" | version u16 | floors, rows, cols u32 | room types, 1 byte per cell
+    chunk   | tag "CHNK" | start, end f64 | names, payload bytes u32 | compressed u8
+            | names: JSON list of the [name, type] first seen in this chunk (ids follow on)
+            | payload (zlib when compressed): counts, then one column at a time
+    ...
+
+A chunk starts with a keyframe, the full state at its start time (where every agent
+is, the hazard flags of every cell, the locks), followed by the events of up to
+`chunk_seconds` of simulated time as columns. Times are delta-encoded milliseconds
+since the chunk start and a move is stored as the step from the agent's previous
+cell (-1 outside), so a neighbour move is one of a handful of small numbers; zlib
+then squeezes an event to a few bytes. Chunks are self-contained, so `TraceReader`
+indexes the file by reading the chunk headers only, finds the chunk of any time by
+binary search and rebuilds the state from that chunk alone: a seek costs O(log n)
+plus one chunk.
+"""
+import bisect
+import json
+import os
+import struct
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+import protocol
+from viewer import NO_METRICS, Layout, Snapshot
+
+TRACE_MAGIC = b"MAESTRCE"
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct("<8sHIII")
+CHUNK_TAG = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sddIIB")
+COUNTS = struct.Struct("<IIIIB")  # Keyframe agents, moves, hazard changes, messages, locks
+CHUNK_SECONDS = 10.0  # Simulated seconds per chunk
+MAX_CHUNK_EVENTS = 1 << 16
+
+# Hazard flags of a cell
+FIRE = 1
+UNAVAILABLE = 2
+# BMS lock flags, recorded as hazard changes of cell -1
+DOORS_LOCKED = 1
+ELEVATORS_LOCKED = 2
+LOCKS = -1
+
+# One decoded chunk; every array is in event order
+Chunk = namedtuple("Chunk", "start end agents cells flags locks move_times move_agents move_cells "
+                            "hazard_times hazard_cells hazard_flags message_times message_columns")
+# Message columns after the time, in this order
+MESSAGE_COLUMNS = ("sender", "receiver", "kind", "emergency", "cell")
+
+
+def delta(column):
+    return np.diff(np.asarray(column, dtype=np.int64), prepend=0).astype(np.int32)
+
+
+def undelta_by_key(keys, steps, bases):
+    """Inverse of per-key delta encoding: the running sum of `steps` of each key, from `bases[key]`."""
+    order = np.argsort(keys, kind="stable")
+    keys, steps = keys[order], steps[order]
+    sums = np.cumsum(steps, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+    before = np.repeat((sums - steps)[starts], np.diff(np.r_[starts, len(keys)]))
+    values = np.empty(len(keys), dtype=np.int64)
+    values[order] = bases[keys] + sums - before
+    return values
+
+
+def undelta(column):
+    return np.cumsum(column, dtype=np.int64)
+
+
+class TraceRecorder:
+    """
+    Appends a trace of `building` (and of the messages sent through `transport`, e.g.
+    an `InMemoryTransport`) to `path`. Recording is a tuple append per event; encoding
+    and the write happen once per chunk. `close` writes the last chunk.
+    """
+
+    def __init__(self, building, path, transport=None, chunk_seconds=CHUNK_SECONDS, compress=True):
+        self.building = building
+        self.chunk_seconds = chunk_seconds
+        self.compress = compress
+        self.last_time = 0.0
+        self.ids = {}  # name -> id
+        self.new_names = []  # [name, type] of the ids given out since the last chunk
+        self.positions = {}  # agent id -> cell
+        self.flags = np.zeros(building.floors * building.rows * building.cols, dtype=np.uint8)
+        room_types = np.full(self.flags.shape, b" ", dtype="S1")
+        for room in building.rooms():
+            cell = self.cell(room)
+            room_types[cell] = room.room_type.encode("ascii")
+            self.flags[cell] = self.hazard_flags(room)
+        for floor in range(building.floors):
+            for room, agents in building.occupancy.occupied_rooms(floor).items():
+                for agent in agents:
+                    self.positions[self.agent_id(agent)] = self.cell(room)
+        self.locks = self.lock_flags()
+        self.file = open(path, "wb")
+        self.file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, building.floors, building.rows, building.cols))
+        self.file.write(room_types.tobytes())
+        self.start_chunk(self.now())
+        building.add_change_listener(self.room_changed)
+        building.occupancy.add_move_listener(self.agent_moved)
+        if transport is not None:
+            transport.add_send_listener(self.message_sent)
+
+    def now(self):
+        try:
+            return self.building.clock.now()
+        except RuntimeError:  # No running event loop, e.g. closing after the simulation
+            return self.last_time
+
+    def cell(self, room):
+        return (room.floor * self.building.rows + room.row) * self.building.cols + room.col
+
+    @staticmethod
+    def hazard_flags(room):
+        return (FIRE if room.fire else 0) | (UNAVAILABLE if room.unavailable else 0)
+
+    def lock_flags(self):
+        return ((DOORS_LOCKED if self.building.lock_doors else 0)
+                | (ELEVATORS_LOCKED if self.building.lock_elevators else 0))
+
+    def name_id(self, name, kind=""):
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.ids[name] = len(self.ids)
+            self.new_names.append([name, kind])
+        return name_id
+
+    def agent_id(self, agent):
+        return self.name_id(str(agent.jid), agent.type)
+
+    def start_chunk(self, time):
+        self.start = self.last_time = time
+        agents = sorted(self.positions)
+        self.keyframe = (np.array(agents, dtype=np.int32), np.array([self.positions[agent] for agent in agents],
+                                                                       dtype=np.int32), self.flags.copy(), self.locks)
+        self.moves = []
+        self.hazards = []
+        self.messages = []
+
+    def event_time(self):
+        """Simulated time of an event being recorded; starts a new chunk when the current one is full."""
+        time = self.now()
+        if (time - self.start >= self.chunk_seconds
+                or len(self.moves) + len(self.hazards) + len(self.messages) >= MAX_CHUNK_EVENTS):
+            self.write_chunk()
+            self.start_chunk(time)
+        self.last_time = time
+        return time
+
+    def agent_moved(self, agent, room):
+        time = self.event_time()
+        agent_id = self.agent_id(agent)
+        cell = -1 if room is None else self.cell(room)
+        previous = self.positions.pop(agent_id, -1) if cell < 0 else self.positions.get(agent_id, -1)
+        if cell >= 0:
+            self.positions[agent_id] = cell
+        self.moves.append((time, agent_id, cell - previous))
+
+    def room_changed(self, room):
+        time = self.event_time()
+        if room is None:
+            self.locks = self.lock_flags()
+            self.hazards.append((time, LOCKS, self.locks))
+        else:
+            cell = self.cell(room)
+            self.flags[cell] = self.hazard_flags(room)
+            self.hazards.append((time, cell, self.flags[cell]))
+
+    def message_sent(self, msg):
+        time = self.event_time()
+        try:
+            payload = protocol.read(msg)
+        except ValueError:
+            return
+        floor, row, col = payload.room or protocol.NO_ROOM
+        cell = -1 if floor < 0 else (floor * self.building.rows + row) * self.building.cols + col
+        self.messages.append((time, self.name_id(str(msg.sender)), self.name_id(str(msg.to)), payload.kind,
+                              protocol.EMERGENCY_CODES[payload.emergency], cell))
+
+    def columns(self, events, width):
+        """Columns of a list of (time, ...) events: delta-encoded milliseconds since the chunk start, then the rest."""
+        table = np.array(events, dtype=np.float64).reshape(len(events), width)
+        return [delta(np.round((table[:, 0] - self.start) * 1000))] + [table[:, i].astype(np.int32)
+                                                                        for i in range(1, width)]
+
+    def write_chunk(self):
+        agents, cells, flags, locks = self.keyframe
+        columns = [delta(agents), cells, flags, *self.columns(self.moves, 3), *self.columns(self.hazards, 3),
+                   *self.columns(self.messages, 1 + len(MESSAGE_COLUMNS))]
+        payload = COUNTS.pack(len(agents), len(self.moves), len(self.hazards), len(self.messages), locks)
+        payload += b"".join(column.tobytes() for column in columns)
+        if self.compress:
+            payload = zlib.compress(payload)
+        names = json.dumps(self.new_names).encode("utf-8")
+        self.new_names = []
+        self.file.write(CHUNK_HEADER.pack(CHUNK_TAG, self.start, self.last_time, len(names), len(payload),
+                                          self.compress))
+        self.file.write(names)
+        self.file.write(payload)
+
+    def close(self):
+        self.write_chunk()
+        self.file.close()
+
+
+class TraceReader:
+    """
+    Random access to a trace written by TraceRecorder. Opening it reads the header and
+    the chunk headers (and their few new names), not the payloads; `snapshot(time)`
+    then decodes the one chunk holding `time`, the last one decoded being cached, so
+    playing forward decodes each chunk once.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        magic, version, floors, rows, cols = TRACE_HEADER.unpack(self.file.read(TRACE_HEADER.size))
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} trace.")
+        room_types = np.frombuffer(self.file.read(floors * rows * cols), dtype="S1").astype("<U1")
+        room_types = np.where(room_types == " ", "", room_types).reshape(floors, rows, cols)
+        room_types.flags.writeable = False
+        self.layout = Layout(floors, rows, cols, room_types)
+        self.names = []  # (name, type) of every id
+        self.starts, self.ends, self.chunks = [], [], []  # chunks: (payload offset, size, compressed)
+        file_size = os.fstat(self.file.fileno()).st_size
+        while True:
+            header = self.file.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                break  # End of the trace, or a chunk cut short by a crash
+            tag, start, end, names_size, size, compressed = CHUNK_HEADER.unpack(header)
+            if tag != CHUNK_TAG:
+                raise ValueError(f"{path}: corrupt chunk at byte {self.file.tell() - CHUNK_HEADER.size}.")
+            names = self.file.read(names_size)
+            offset = self.file.tell()
+            if offset + size > file_size:
+                break
+            self.file.seek(offset + size)
+            self.names.extend(tuple(name) for name in json.loads(names))
+            self.starts.append(start)
+            self.ends.append(end)
+            self.chunks.append((offset, size, compressed))
+        if not self.chunks:
+            raise ValueError(f"{path} holds no chunks.")
+        self.start, self.end = self.starts[0], self.ends[-1]
+        self.occupant = np.array([kind == "Occupant" for _, kind in self.names] or [False])
+        self.cached = None
+
+    def chunk_index(self, time):
+        """Index of the chunk holding `time`, by binary search over the chunk start times."""
+        return max(0, bisect.bisect_right(self.starts, time) - 1)
+
+    def chunk(self, index):
+        if self.cached is not None and self.cached[0] == index:
+            return self.cached[1]
+        offset, size, compressed = self.chunks[index]
+        self.file.seek(offset)
+        payload = self.file.read(size)
+        if compressed:
+            payload = zlib.decompress(payload)
+        agents, moves, hazards, messages, locks = COUNTS.unpack_from(payload)
+        position = COUNTS.size
+
+        def column(count, dtype=np.int32):
+            nonlocal position
+            values = np.frombuffer(payload, dtype=dtype, count=count, offset=position)
+            position += values.nbytes
+            return values
+
+        def times(count):
+            return self.starts[index] + undelta(column(count)) / 1000
+
+        keyframe_agents, keyframe_cells = undelta(column(agents)), column(agents)
+        flags = column(self.layout.floors * self.layout.rows * self.layout.cols, np.uint8)
+        move_times, move_agents, move_steps = times(moves), column(moves), column(moves)
+        positions = np.full(len(self.names), -1, dtype=np.int64)
+        positions[keyframe_agents] = keyframe_cells
+        chunk = Chunk(self.starts[index], self.ends[index], keyframe_agents, keyframe_cells, flags, locks,
+                      move_times, move_agents, undelta_by_key(move_agents, move_steps, positions),
+                      times(hazards), column(hazards), column(hazards),
+                      times(messages), {name: column(messages) for name in MESSAGE_COLUMNS})
+        self.cached = (index, chunk)
+        return chunk
+
+    @staticmethod
+    def last_values(keys, values):
+        """The last value of every key, for keys and values in event order."""
+        keys, first = np.unique(keys[::-1], return_index=True)
+        return keys, values[::-1][first]
+
+    def state(self, time):
+        """(agent ids, cells) of the agents inside, hazard flags per cell and lock flags at `time`."""
+        chunk = self.chunk(self.chunk_index(time))
+        moved = np.searchsorted(chunk.move_times, time, side="right")
+        agents, cells = self.last_values(np.concatenate((chunk.agents, chunk.move_agents[:moved])),
+                                         np.concatenate((chunk.cells, chunk.move_cells[:moved])))
+        inside = cells >= 0
+        changed = np.searchsorted(chunk.hazard_times, time, side="right")
+        hazard_cells, hazard_flags = chunk.hazard_cells[:changed], chunk.hazard_flags[:changed]
+        flags = chunk.flags.copy()
+        lock_changes = hazard_flags[hazard_cells == LOCKS]
+        locks = int(lock_changes[-1]) if len(lock_changes) else chunk.locks
+        changed_cells, changed_flags = self.last_values(hazard_cells[hazard_cells != LOCKS],
+                                                        hazard_flags[hazard_cells != LOCKS])
+        flags[changed_cells] = changed_flags
+        return agents[inside], cells[inside], flags, locks
+
+    def snapshot(self, time):
+        """`viewer.Snapshot` of the building at `time`."""
+        floors, rows, cols = self.layout.floors, self.layout.rows, self.layout.cols
+        agents, cells, flags, _ = self.state(time)
+        fire = (flags & FIRE).astype(bool).reshape(floors, rows, cols)
+        fire.flags.writeable = False
+        floor, rest = np.divmod(cells, rows * cols)
+        floor_cells = [{} for _ in range(floors)]
+        for agent, floor_index, cell in zip(self.occupant[agents], floor.tolist(), rest.tolist()):
+            occupants, responders = floor_cells[floor_index].get(divmod(cell, cols), (0, 0))
+            floor_cells[floor_index][divmod(cell, cols)] = ((occupants + 1, responders) if agent
+                                                            else (occupants, responders + 1))
+        floor_counts = tuple(np.bincount(floor, minlength=floors).tolist())
+        return Snapshot(time, fire, tuple(floor_cells), floor_counts, NO_METRICS)
+
+    def messages(self, start, end):
+        """(time, sender, receiver, kind, emergency, room) of the messages sent in [start, end]."""
+        floor_size = self.layout.rows * self.layout.cols
+        records = []
+        for index in range(self.chunk_index(start), self.chunk_index(end) + 1):
+            chunk = self.chunk(index)
+            columns = chunk.message_columns
+            for i in np.flatnonzero((chunk.message_times >= start) & (chunk.message_times <= end)):
+                cell = int(columns["cell"][i])
+                room = None if cell < 0 else (cell // floor_size, cell % floor_size // self.layout.cols,
+                                              cell % self.layout.cols)
+                records.append((float(chunk.message_times[i]), self.names[columns["sender"][i]][0],
+                                self.names[columns["receiver"][i]][0], int(columns["kind"][i]),
+                                protocol.EMERGENCY_TYPES[columns["emergency"][i]], room))
+        return records
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,70 @@
+OCCUPANTS_GROUP = "occupants@localhost"  # Group address every occupant joins
+
+
+class InMemoryTransport:
+    """
+    Message transport for agents that all live in one process. `send` puts the message
+    straight into the mailbox (an asyncio queue) of every matching behaviour of the
+    recipient: no XMPP server, no serialisation and no extra asyncio task per message.
+    `receive` is untouched, so behaviours see the same semantics as over XMPP. Messages
+    to agents that are not registered are dropped and counted. A group address
+    (`join`) delivers one message to all its members.
+
+    It has the interface of SPADE's Container, which is what agents use (falling back
+    to XMPP for other processes) when no transport is set, see `SimulationAgent`.
+    """
+
+    def __init__(self):
+        self.agents = {}  # jid -> agent
+        self.groups = {}  # group jid -> member jids
+        self.sent = 0
+        self.dropped = 0
+        self.send_listeners = []
+
+    def add_send_listener(self, listener):
+        """Registers `listener(msg)`, called once per message sent, before it is delivered."""
+        self.send_listeners.append(listener)
+
+    def register(self, agent):
+        self.agents[str(agent.jid)] = agent
+
+    def unregister(self, jid):
+        self.agents.pop(str(jid), None)
+
+    def has_agent(self, jid):
+        return str(jid) in self.agents
+
+    def get_agent(self, jid):
+        return self.agents[str(jid)]
+
+    def join(self, group, jid):
+        self.groups.setdefault(str(group), []).append(str(jid))
+
+    def has_group(self, group):
+        return str(group) in self.groups
+
+    async def send(self, msg, behaviour=None):
+        for listener in self.send_listeners:
+            listener(msg)
+        to = str(msg.to)
+        if to in self.groups:
+            for member in self.groups[to]:
+                self.deliver(msg, member)
+        else:
+            self.deliver(msg, to)
+
+    async def send_many(self, messages):
+        """Delivers a batch of messages in one call, e.g. a broadcast fan-out."""
+        for msg in messages:
+            await self.send(msg)
+
+    def deliver(self, msg, jid):
+        agent = self.agents.get(jid)
+        if agent is None:
+            self.dropped += 1
+            print(f"{msg.sender}: no agent {jid} in this simulation, message dropped.")
+            return
+        self.sent += 1
+        for receiver in agent.behaviours:
+            if receiver.queue is not None and receiver.match(msg):
+                receiver.queue.put_nowait(msg)
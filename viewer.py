@@ -0,0 +1,149 @@
+"""
+The simulation's side of the interface. `Viewer` runs `PygameInterface` in its own
+process and feeds it immutable snapshots of the building at a bounded rate, so
+drawing never runs on, or blocks, the agents' event loop. This module does not
+import pygame; only the viewer process does.
+"""
+import asyncio
+import multiprocessing
+import queue
+import time
+from collections import namedtuple
+
+import numpy as np
+
+FPS = 30  # Snapshots published per second, and the viewer's frame cap
+METRICS_REFRESH = 0.5  # Seconds between updates of the sidebar metrics
+
+# What never changes: the room type of every cell ("" where there is no room)
+Layout = namedtuple("Layout", "floors rows cols room_types")
+# One frame: simulated time, fire flags per cell (read-only array), per floor
+# {(row, col): (occupants, responders)} of the occupied cells, occupants per floor and
+# the sidebar's metrics lines, (message lines, performance lines)
+Snapshot = namedtuple("Snapshot", "time fire cells floor_counts metrics")
+NO_METRICS = ((), ())
+
+
+def metric_lines(registry):
+    """Sidebar text for a MetricsRegistry: (message lines, performance lines)."""
+
+    def value(name, q, scale=1, unit=""):
+        histogram = registry.find(name)
+        return "-" if histogram is None or not histogram.count else f"{histogram.percentile(q) * scale:.3g}{unit}"
+
+    received = registry.find("messages_received_total")
+    messages = (f"received: {received.value if received else 0}",
+                f"latency p50 {value('message_latency_seconds', 50, 1000, ' ms')}, "
+                f"p99 {value('message_latency_seconds', 99, 1000, ' ms')}",
+                f"queue depth p99: {value('message_queue_depth', 99)}")
+    evacuated, occupants = registry.find("occupants_evacuated"), registry.find("occupants")
+    performance = [f"evacuated: {evacuated.value if evacuated else 0}/{occupants.value if occupants else '?'}",
+                   f"out after p50 {value('evacuation_time_seconds', 50, unit=' s')}, "
+                   f"p90 {value('evacuation_time_seconds', 90, unit=' s')}",
+                   "tick p99:"]
+    for (name, labels), histogram in sorted(registry.metrics.items()):
+        if name == "behaviour_tick_seconds" and histogram.count:
+            performance.append(f"  {dict(labels)['behaviour'][:20]} {histogram.percentile(99) * 1000:.3g} ms")
+    return messages, tuple(performance)
+
+
+class SnapshotPublisher:
+    """
+    Builds Snapshots of a building. The fire flags are mirrored into an array by a
+    building change listener, so a snapshot costs one array copy plus a pass over the
+    occupied rooms, never a pass over the whole building. With a MetricsRegistry, the
+    snapshots carry its sidebar lines, refreshed every METRICS_REFRESH seconds.
+    """
+
+    def __init__(self, building, metrics=None):
+        self.building = building
+        self.metrics = metrics
+        self.metric_lines, self.metrics_at = NO_METRICS, -METRICS_REFRESH
+        shape = (building.floors, building.rows, building.cols)
+        self.fire = np.zeros(shape, dtype=bool)
+        room_types = np.full(shape, "", dtype="<U1")
+        for room in building.rooms():
+            room_types[room.floor, room.row, room.col] = room.room_type
+            self.fire[room.floor, room.row, room.col] = room.fire
+        room_types.flags.writeable = False
+        self.layout = Layout(building.floors, building.rows, building.cols, room_types)
+        building.add_change_listener(self.room_changed)
+
+    def room_changed(self, room):
+        if room is not None:
+            self.fire[room.floor, room.row, room.col] = room.fire
+
+    def snapshot(self):
+        fire = self.fire.copy()
+        fire.flags.writeable = False
+        occupancy = self.building.occupancy
+        cells = []
+        for floor in range(self.building.floors):
+            floor_cells = {}
+            for room, agents in occupancy.occupied_rooms(floor).items():
+                occupants = sum(1 for agent in agents if agent.type == "Occupant")
+                floor_cells[(room.row, room.col)] = (occupants, len(agents) - occupants)
+            cells.append(floor_cells)
+        floor_counts = tuple(occupancy.floor_count(floor) for floor in range(self.building.floors))
+        if self.metrics is not None and time.monotonic() - self.metrics_at >= METRICS_REFRESH:
+            self.metric_lines, self.metrics_at = metric_lines(self.metrics), time.monotonic()
+        return Snapshot(self.building.clock.now(), fire, tuple(cells), floor_counts, self.metric_lines)
+
+
+class Viewer:
+    """
+    PygameInterface in a separate process. `start` launches it and a task that
+    publishes a snapshot every 1/`rate` seconds into a queue of two: when the viewer
+    falls behind, snapshots are dropped (and counted) rather than queued, so the
+    publishing task never waits on the viewer.
+    """
+
+    def __init__(self, building, rate=FPS, metrics=None):
+        self.publisher = SnapshotPublisher(building, metrics)
+        self.rate = rate
+        self.process = None
+        self.snapshots = None
+        self.task = None
+        self.published = 0
+        self.dropped = 0
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.snapshots = context.Queue(maxsize=2)
+        self.process = context.Process(target=run_viewer, args=(self.publisher.layout, self.snapshots, self.rate),
+                                       daemon=True)
+        self.process.start()
+        self.task = asyncio.ensure_future(self.publish())
+
+    def is_open(self):
+        """False once the window was closed."""
+        return self.process is not None and self.process.is_alive()
+
+    async def publish(self):
+        while self.is_open():
+            try:
+                self.snapshots.put_nowait(self.publisher.snapshot())
+                self.published += 1
+            except queue.Full:
+                self.dropped += 1
+            await asyncio.sleep(1 / self.rate)
+
+    def close(self, timeout=5):
+        """Stops publishing and closes the window."""
+        if self.task is not None:
+            self.task.cancel()
+        if self.is_open():
+            try:
+                self.snapshots.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+
+
+def run_viewer(layout, snapshots, fps=FPS):
+    """Viewer process: shows the snapshots read from `snapshots` until None or the window is closed."""
+    from interface import PygameInterface
+
+    PygameInterface(layout, fps).run(snapshots)